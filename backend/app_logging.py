@@ -0,0 +1,235 @@
+# Structured, non-blocking logging for the backend.
+# Loggers hand records to a queue; a background listener thread formats them and writes them out,
+# so a request never waits on stdout. Messages use %-style arguments, which are only formatted if the
+# record is actually emitted (and then on the listener thread):
+#     logger = get_logger(__name__)
+#     logger.info("[Agent Call] Invoking agent (%s)...", MAIN_LLM_MODEL)
+# Large payloads (checklists, history, write payloads) go to a module's payload logger, which is
+# DEBUG-level and sampled, and are wrapped in Truncated so they are cut off without building the full string:
+#     payload_logger.debug("Raw checklist_data from DB: %s", Truncated(checklist_data))
+#
+# Configuration (environment):
+#     OLIVIA_LOG_LEVEL                 level for the backend's loggers (default INFO)
+#     OLIVIA_LOG_LEVELS                per-module overrides, e.g. "chat.tools=WARNING,chat.agent.trace=DEBUG"
+#     OLIVIA_LOG_FORMAT                "text" (default) or "json" (one JSON object per line)
+#     OLIVIA_LOG_PAYLOAD_SAMPLE_RATE   share of payload records emitted when payload loggers are enabled (default 0.05)
+#     OLIVIA_LOG_PAYLOAD_MAX_CHARS     length payloads are truncated to (default 300)
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("OLIVIA_LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("OLIVIA_LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("OLIVIA_LOG_FORMAT", "text").lower()
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("OLIVIA_LOG_PAYLOAD_SAMPLE_RATE", "0.05"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("OLIVIA_LOG_PAYLOAD_MAX_CHARS", "300"))
+# Records waiting for the listener thread; when full, new records are dropped rather than blocking
+LOG_QUEUE_MAX_RECORDS = 10000
+
+PAYLOAD_LOGGER_SUFFIX = ".payload"
+# Third-party libraries (httpx logs every request at INFO) only show warnings
+THIRD_PARTY_LOG_LEVEL = logging.WARNING
+
+# LogRecord attributes that are not "extra" fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class Truncated:
+    """Wraps a value whose str() is computed only when the record is formatted, and cut to `max_chars`."""
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... ({len(text)} chars)"
+
+    __repr__ = __str__
+
+
+class PayloadSampler(logging.Filter):
+    """Lets through only a `rate` share of the records from payload loggers; other records pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.name.endswith(PAYLOAD_LOGGER_SUFFIX):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread (the stock one formats in the caller).
+    Drops the record if the queue is full instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text: # Tracebacks can't be rendered once the frame is gone
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """`<UTC time> <LEVEL> <logger> <message> key=value ...` with any `extra` fields appended."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+        line = f"{timestamp} {record.levelname:<7} {record.name} {record.getMessage()}"
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, any `extra` fields and the exception, if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class _LoggingState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configured = False
+        self.handler: Optional[_DeferredQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.default_level = LOG_LEVEL
+        self.module_levels = _parse_levels(LOG_LEVELS)
+        self.loggers: Dict[str, logging.Logger] = {}
+
+
+_state = _LoggingState()
+
+
+def configure_logging(stream=None, log_format: str = LOG_FORMAT, payload_sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE):
+    """
+    Installs the queue handler on the root logger and starts the listener thread writing to `stream`
+    (stdout by default). Called on first use of get_logger(); safe to call more than once.
+    """
+    with _state.lock:
+        if _state.configured:
+            return
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+        log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_MAX_RECORDS)
+        _state.handler = _DeferredQueueHandler(log_queue)
+        _state.handler.addFilter(PayloadSampler(payload_sample_rate))
+        _state.listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _state.listener.start()
+
+        root = logging.getLogger()
+        root.addHandler(_state.handler)
+        if root.level == logging.NOTSET or root.level > THIRD_PARTY_LOG_LEVEL:
+            root.setLevel(THIRD_PARTY_LOG_LEVEL)
+        _state.configured = True
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Stops the listener after writing out every queued record."""
+    with _state.lock:
+        listener, _state.listener = _state.listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def _level_for(name: str) -> str:
+    # The most specific configured prefix wins ("chat.agent.trace" over "chat.agent" over "chat")
+    parts = name.split(".")
+    for end in range(len(parts), 0, -1):
+        level = _state.module_levels.get(".".join(parts[:end]))
+        if level is not None:
+            return level
+    if name.endswith(PAYLOAD_LOGGER_SUFFIX):
+        return "DEBUG" if _state.default_level == "DEBUG" else "WARNING"
+    return _state.default_level
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns the logger for a backend module (pass __name__), at its configured level."""
+    configure_logging()
+    logger = logging.getLogger(name)
+    with _state.lock:
+        if name not in _state.loggers:
+            logger.setLevel(_level_for(name))
+            _state.loggers[name] = logger
+    return logger
+
+
+def get_payload_logger(name: str) -> logging.Logger:
+    """
+    Returns the payload logger for a module: for large values (wrap them in Truncated).
+    Off unless OLIVIA_LOG_LEVEL is DEBUG or the module's payload logger is enabled in OLIVIA_LOG_LEVELS,
+    and sampled at OLIVIA_LOG_PAYLOAD_SAMPLE_RATE when on.
+    """
+    return get_logger(name + PAYLOAD_LOGGER_SUFFIX)
+
+
+def set_log_level(level: str, name: Optional[str] = None):
+    """Changes the level of every backend logger (`name` None), or of one module and the loggers below it."""
+    level = level.upper()
+    with _state.lock:
+        if name is None:
+            _state.default_level = level
+            _state.module_levels = {}
+        else:
+            _state.module_levels[name] = level
+        for logger_name, logger in _state.loggers.items():
+            logger.setLevel(_level_for(logger_name))
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full."""
+    return _state.handler.dropped if _state.handler is not None else 0
@@ -0,0 +1,51 @@
+# Microbenchmark: per-turn cost of building Olivia's agent vs. reusing the prebuilt one.
+# No network calls are made; only object construction is measured.
+# Run from the backend directory:
+#   python -m benchmarks.bench_agent_construction [iterations]
+import os
+import sys
+import time
+import tracemalloc
+
+# Constructing the clients needs these to be set, but they are never used to connect here.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from chat.agent import _build_agent_executor, get_agent_executor
+
+
+def _measure(label: str, fn, iterations: int) -> float:
+    """Times `fn` over `iterations` calls and reports mean latency and allocated bytes per call."""
+    fn() # Warm up imports and lazy initialization outside the measurement
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    # Peak traced memory above the starting point approximates the bytes each call allocates
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(iterations):
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - baseline
+    tracemalloc.stop()
+
+    per_call_us = elapsed / iterations * 1e6
+    print(f"{label:<40} {per_call_us:>12.1f} us/turn {allocated / iterations:>12.0f} B/turn")
+    return per_call_us
+
+
+def main(iterations: int = 200):
+    print(f"Agent construction overhead per chat turn ({iterations} iterations)")
+    before = _measure("Before: build agent on every turn", lambda: _build_agent_executor(verbose=True), iterations)
+    after = _measure("After: reuse prebuilt agent", get_agent_executor, iterations)
+    print(f"Speedup: {before / after:,.0f}x" if after > 0 else "Speedup: n/a")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
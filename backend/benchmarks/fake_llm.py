@@ -0,0 +1,136 @@
+# Deterministic stand-in for the OpenAI chat models, for offline benchmarks.
+# Replies are derived from the prompt (same prompt, same reply and latency), latency is simulated with
+# asyncio.sleep/time.sleep, and when tools are bound it makes a real tool call for checklist requests,
+# so a turn exercises the same agent/tool path as with OpenAI.
+# Install it with chat.agent.use_chat_models(main=FakeChatModel(), summarizer=FakeChatModel(...)).
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_USER_ID_PATTERN = re.compile(r"Current User ID: (\S+)")
+_CHECKLIST_REQUEST = re.compile(r"\b(add|remind me to|put)\b.*\b(checklist|list|todo)\b", re.IGNORECASE)
+_FILLER_WORDS = (
+    "start by registering your address at the city office, then open a local bank account, compare student "
+    "housing options early, check the visa requirements for your nationality, and keep copies of every document"
+).split()
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers without any network access.
+    Latency per call is `latency_seconds` plus up to `jitter_seconds`, chosen deterministically from the prompt;
+    streamed replies also wait `token_latency_seconds` between chunks.
+    """
+
+    model_name: str = "fake-chat"
+    reply_words: int = 40
+    latency_seconds: float = 0.3
+    jitter_seconds: float = 0.2
+    token_latency_seconds: float = 0.0
+    tool_calls_enabled: bool = True
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    # --- Deterministic behaviour ---
+
+    def _latency(self, messages: List[BaseMessage]) -> float:
+        fraction = (_digest(str(messages[-1].content) if messages else "") % 1000) / 1000
+        return self.latency_seconds + self.jitter_seconds * fraction
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        self.calls += 1
+        prompt_text = "\n".join(str(message.content) for message in messages)
+        last = messages[-1] if messages else HumanMessage(content="")
+        tool_names = {tool["function"]["name"] for tool in tools or []}
+        usage = UsageMetadata(input_tokens=_estimate_tokens(prompt_text), output_tokens=0, total_tokens=0)
+
+        user_id = _USER_ID_PATTERN.search(prompt_text)
+        if (self.tool_calls_enabled and isinstance(last, HumanMessage) and "add_checklist_item" in tool_names
+                and user_id and _CHECKLIST_REQUEST.search(str(last.content))):
+            args = {"user_id": user_id.group(1), "category": "Relocation", "description": str(last.content)[:80]}
+            usage["output_tokens"] = 20
+            usage["total_tokens"] = usage["input_tokens"] + 20
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": "add_checklist_item", "args": args, "id": f"call_{_digest(prompt_text) % 10**8}"}],
+                usage_metadata=usage
+            )
+
+        if isinstance(last, ToolMessage):
+            content = "Done, I've added that to your checklist. Anything else you'd like to plan for your move?"
+        else:
+            start = _digest(str(last.content)) % len(_FILLER_WORDS)
+            words = [_FILLER_WORDS[(start + i) % len(_FILLER_WORDS)] for i in range(self.reply_words)]
+            content = " ".join(words).capitalize() + "."
+        usage["output_tokens"] = _estimate_tokens(content)
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=content, usage_metadata=usage)
+
+    # --- BaseChatModel implementation ---
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._latency(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, kwargs.get("tools")))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._latency(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, kwargs.get("tools")))])
+
+    def _chunks(self, message: AIMessage) -> List[ChatGenerationChunk]:
+        if message.tool_calls:
+            tool_call_chunks = [
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+                for call in message.tool_calls
+            ]
+            return [ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks,
+                                                               usage_metadata=message.usage_metadata))]
+        words = message.content.split(" ")
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + word)) for i, word in enumerate(words)]
+        chunks.append(ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata)))
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._latency(messages))
+        for i, chunk in enumerate(self._chunks(self._respond(messages, kwargs.get("tools")))):
+            if i and self.token_latency_seconds:
+                time.sleep(self.token_latency_seconds)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._latency(messages))
+        for i, chunk in enumerate(self._chunks(self._respond(messages, kwargs.get("tools")))):
+            if i and self.token_latency_seconds:
+                await asyncio.sleep(self.token_latency_seconds)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,276 @@
+# In-memory stand-in for the Supabase client, for offline benchmarks.
+# Implements the subset of the supabase-py/postgrest query builder the backend uses on `user_conversations`,
+# `user_checklists` and `profiles`, plus Python versions of the database functions in supabase/migrations
+# (get_conversation_context, compact_conversation_history, checklist_add_item, checklist_update_item).
+# Install it with chat.tools.use_supabase_client(InMemorySupabase()).
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+# Columns with a unique constraint, per table (user_checklists has one checklist per user)
+UNIQUE_COLUMNS = {"user_checklists": ("user_id",)}
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeResponse:
+    """Mirrors postgrest's APIResponse: `data` (rows, a row for single(), or an RPC result) and `count`."""
+
+    def __init__(self, data: Any):
+        self.data = data
+        self.count = len(data) if isinstance(data, list) else None
+
+
+class _Query:
+    """One chained table query. Filters are applied in Python when `execute()` is called."""
+
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self._db = db
+        self._table = table
+        self._operation = "select"
+        self._columns: Optional[List[str]] = None
+        self._payload: Any = None
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self._order: Optional[tuple] = None
+        self._limit: Optional[int] = None
+        self._single = False
+
+    def select(self, columns: str = "*", **kwargs):
+        self._columns = None if columns.strip() == "*" else [column.strip() for column in columns.split(",")]
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._operation, self._payload = "insert", payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self._operation, self._payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self._operation = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def lt(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def in_(self, column: str, values):
+        values = list(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int, **kwargs):
+        self._limit = count
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self) -> FakeResponse:
+        self._db._simulate_latency()
+        with self._db._lock:
+            self._db.requests += 1
+            rows = self._db.tables.setdefault(self._table, [])
+            if self._operation == "insert":
+                return FakeResponse(self._insert(rows))
+            matched = [row for row in rows if all(check(row) for check in self._filters)]
+            if self._operation == "delete":
+                rows[:] = [row for row in rows if row not in matched]
+                return FakeResponse(copy.deepcopy(matched))
+            if self._operation == "update":
+                for row in matched:
+                    row.update(copy.deepcopy(self._payload))
+                return FakeResponse(copy.deepcopy(matched))
+            return self._select(matched)
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        new_rows = self._payload if isinstance(self._payload, list) else [self._payload]
+        inserted = []
+        for new_row in new_rows:
+            row = copy.deepcopy(new_row)
+            if self._table == "user_conversations":
+                row.setdefault("message_id", str(uuid.uuid4()))
+                row.setdefault("timestamp", _now_iso())
+            if self._table == "user_checklists":
+                row.setdefault("version", 1)
+                row.setdefault("updated_at", _now_iso())
+            for column in UNIQUE_COLUMNS.get(self._table, ()):
+                if any(existing.get(column) == row.get(column) for existing in rows + inserted):
+                    raise APIError({"code": "23505", "message": f"duplicate key value violates unique constraint on {self._table}.{column}"})
+            inserted.append(row)
+        rows.extend(inserted)
+        return copy.deepcopy(inserted)
+
+    def _select(self, matched: List[Dict[str, Any]]) -> FakeResponse:
+        if self._order is not None:
+            column, desc = self._order
+            matched = sorted(matched, key=lambda row: (row.get(column) is not None, row.get(column) or ""), reverse=desc)
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        if self._columns is not None:
+            matched = [{column: row.get(column) for column in self._columns} for row in matched]
+        matched = copy.deepcopy(matched)
+        if self._single:
+            if len(matched) != 1:
+                raise APIError({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"})
+            return FakeResponse(matched[0])
+        return FakeResponse(matched)
+
+
+class _RpcCall:
+    def __init__(self, db: "InMemorySupabase", function: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]):
+        self._db = db
+        self._function = function
+        self._params = params
+
+    def execute(self) -> FakeResponse:
+        self._db._simulate_latency()
+        with self._db._lock:
+            self._db.requests += 1
+            return FakeResponse(copy.deepcopy(self._function(copy.deepcopy(self._params))))
+
+
+class InMemorySupabase:
+    """
+    Thread-safe in-memory database with the supabase-py client's `table()` and `rpc()` entry points.
+    `latency_seconds` is slept before every request (outside the lock), to simulate the network round trip.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests = 0
+        self._lock = threading.RLock()
+        self._functions: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "get_conversation_context": self._get_conversation_context,
+            "compact_conversation_history": self._compact_conversation_history,
+            "checklist_add_item": self._checklist_add_item,
+            "checklist_update_item": self._checklist_update_item,
+        }
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> _RpcCall:
+        if function not in self._functions:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{function}"})
+        return _RpcCall(self, self._functions[function], params or {})
+
+    def _simulate_latency(self):
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    # --- Database functions (see supabase/migrations); called with the lock held ---
+
+    def _get_conversation_context(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        user_id, session_id, max_messages = params["p_user_id"], params["p_session_id"], params.get("p_max_messages", 30)
+        rows = [row for row in self.tables.get("user_conversations", [])
+                if row.get("user_id") == user_id and row.get("session_id") == session_id]
+        synopses = sorted((row for row in rows if row["message_type"] == "ai_summary"), key=lambda row: row["timestamp"])
+        synopsis = synopses[-1] if synopses else None
+        chunks = sorted(
+            (row for row in rows if row["message_type"] == "ai_chunk_summary"
+             and (synopsis is None or row["timestamp"] > synopsis["timestamp"])),
+            key=lambda row: row["timestamp"]
+        )
+        covered = [row["timestamp"] for row in ([synopsis] if synopsis else []) + chunks]
+        watermark = max(covered) if covered else None
+        messages = sorted(
+            (row for row in rows if row["message_type"] in ("human", "ai") and (watermark is None or row["timestamp"] > watermark)),
+            key=lambda row: row["timestamp"]
+        )
+        messages = messages[-max_messages:] if max_messages > 0 else []
+        return {
+            "summary": synopsis["content"] if synopsis else None,
+            "summary_timestamp": watermark,
+            "chunk_summaries": [{field: row.get(field) for field in ("message_id", "content", "timestamp")} for row in chunks],
+            "messages": [
+                {field: row.get(field) for field in ("message_id", "session_id", "message_type", "content", "timestamp")}
+                for row in messages
+            ],
+        }
+
+    def _compact_conversation_history(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        days = int(str(params.get("p_retention", "30 days")).split()[0]) # Only "<n> days" intervals
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        dry_run, max_rows = params.get("p_dry_run", True), params.get("p_max_rows", 10000)
+        rows = self.tables.get("user_conversations", [])
+        sessions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            if row["message_type"] in ("ai_summary", "ai_chunk_summary"):
+                sessions.setdefault((row["user_id"], row["session_id"]), []).append(row)
+        archive, prune = [], []
+        for row in rows:
+            summaries = sessions.get((row["user_id"], row["session_id"]))
+            if not summaries or row["timestamp"] >= cutoff:
+                continue
+            synopses = [summary for summary in summaries if summary["message_type"] == "ai_summary"]
+            latest_synopsis = max(synopses, key=lambda summary: summary["timestamp"]) if synopses else None
+            if row["message_type"] in ("human", "ai"):
+                if row["timestamp"] <= max(summary["timestamp"] for summary in summaries):
+                    archive.append(row)
+            elif (row["session_id"].startswith("summary_for_")
+                  or (row["message_type"] == "ai_summary" and row is not latest_synopsis)
+                  or (row["message_type"] == "ai_chunk_summary" and latest_synopsis is not None and row["timestamp"] <= latest_synopsis["timestamp"])):
+                prune.append(row)
+        if dry_run:
+            return {"dry_run": True, "archived": len(archive), "pruned": len(prune)}
+        archive, prune = archive[:max_rows], prune[:max_rows]
+        removed = {id(row) for row in archive + prune}
+        self.tables["user_conversations"] = [row for row in rows if id(row) not in removed]
+        self.tables.setdefault("user_conversations_archive", []).extend({**row, "archived_at": _now_iso()} for row in archive)
+        return {"dry_run": False, "archived": len(archive), "pruned": len(prune)}
+
+    def _checklist_row(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return next((row for row in self.tables.get("user_checklists", []) if row.get("user_id") == user_id), None)
+
+    def _checklist_add_item(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        row = self._checklist_row(params["p_user_id"])
+        if row is None:
+            row = {"user_id": params["p_user_id"], "title": params["p_title"], "checklist_data": {"items": []}, "version": 0}
+            self.tables.setdefault("user_checklists", []).append(row)
+        data = row.get("checklist_data") or {}
+        row["checklist_data"] = {**data, "items": list(data.get("items") or []) + [params["p_item"]]}
+        row["updated_at"] = _now_iso()
+        row["version"] = row.get("version", 0) + 1
+        return {"item": params["p_item"], "version": row["version"]}
+
+    def _checklist_update_item(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        row = self._checklist_row(params["p_user_id"])
+        items = ((row or {}).get("checklist_data") or {}).get("items") or []
+        for index, item in enumerate(items):
+            if item.get("id") == params["p_item_id"]:
+                items[index] = {**item, **params["p_changes"]}
+                row["updated_at"] = _now_iso()
+                row["version"] = row.get("version", 1) + 1
+                return {"item": items[index], "version": row["version"]}
+        return None
@@ -0,0 +1,97 @@
+# Import-time benchmark for the app (cold start): imports main.py in fresh interpreters, with no Supabase or
+# OpenAI credentials set, and checks the median against a budget. Also fails if a module that should only be
+# imported lazily (after start-up, by the warm-up in warm_up.py) is pulled in by the import.
+# Run from the backend directory:
+#   python -m benchmarks.import_time [--runs 5] [--budget 2.0] [--top 15]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Median seconds `import main` may take; measured at about 1.5s (down from about 4.4s with eager clients)
+IMPORT_TIME_BUDGET_SECONDS = 2.0
+# Created by the warm-up or on first use, never at import time
+DEFERRED_MODULES = ("openai", "langchain_openai", "langchain.agents", "supabase", "tiktoken")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "deferred_loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _clean_env() -> Dict[str, str]:
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "OPENAI_API_KEY")}
+    env["PYTHONPATH"] = BACKEND_DIR
+    return env
+
+
+def _run_probe(importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _PROBE]
+    return subprocess.run(command, cwd=BACKEND_DIR, env=_clean_env(), capture_output=True, text=True, check=True)
+
+
+def _slowest_imports(importtime_output: str, top: int) -> List[tuple]:
+    """Packages by total import time (microseconds, each module's own time summed per top-level package), from `-X importtime` output."""
+    totals: Dict[str, int] = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_time)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure(runs: int, top: int) -> Dict:
+    _run_probe() # Compile bytecode first, so runs measure imports rather than compilation
+    samples = [json.loads(_run_probe().stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    seconds = sorted(sample["seconds"] for sample in samples)
+    profile = _run_probe(importtime=True)
+    return {
+        "runs": runs,
+        "median_seconds": statistics.median(seconds),
+        "min_seconds": seconds[0],
+        "max_seconds": seconds[-1],
+        "deferred_loaded": sorted({name for sample in samples for name in sample["deferred_loaded"]}),
+        "slowest_imports": _slowest_imports(profile.stderr, top),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Import-time (cold start) benchmark for the backend app.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (default: 5)")
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET_SECONDS,
+                        help=f"Median import time allowed, in seconds (default: {IMPORT_TIME_BUDGET_SECONDS})")
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list (default: 15)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = measure(args.runs, args.top)
+    report["budget_seconds"] = args.budget
+    report["within_budget"] = report["median_seconds"] <= args.budget and not report["deferred_loaded"]
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import main: median {report['median_seconds'] * 1000:.0f} ms over {args.runs} runs "
+              f"(min {report['min_seconds'] * 1000:.0f} ms, max {report['max_seconds'] * 1000:.0f} ms), budget {args.budget * 1000:.0f} ms")
+        for name, microseconds in report["slowest_imports"]:
+            print(f"  {name:<40} {microseconds / 1000:>8.1f} ms")
+        if report["deferred_loaded"]:
+            print(f"Imported at start-up but should be deferred: {', '.join(report['deferred_loaded'])}")
+        print("OK" if report["within_budget"] else "OVER BUDGET")
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+# Load test for the /chat endpoints that runs fully offline: the app is served in-process (through
+# httpx's ASGI transport, or the raw ASGI interface for streaming), Supabase is replaced by the in-memory stand-in (fake_supabase.py) and both
+# OpenAI models by the deterministic fake chat model (fake_llm.py), each with simulated latency.
+# Concurrent users each send their turns one after another; reports latency percentiles and turns/sec.
+# Run from the backend directory:
+#   python -m benchmarks.load_chat [--users 50] [--turns 10] [--stream] [--llm-latency 0.3] [--db-latency 0.005]
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+# The fakes replace the real clients, so these values are never used to connect.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# The start-up warm-up would try to reach Supabase and OpenAI
+os.environ.setdefault("OLIVIA_WARM_UP", "false")
+
+import httpx
+
+from app_logging import set_log_level
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.fake_supabase import InMemorySupabase
+
+# A mix of general questions (answer-cache candidates), personal follow-ups and checklist requests (tool calls)
+TURN_SCRIPT = [
+    "How do I find student housing in Amsterdam?",
+    "My semester starts in September and I still need a room near the university.",
+    "Please add registering at the city hall to my checklist.",
+    "What documents do I need to open a bank account in the Netherlands?",
+    "Can you remind me what we said about my housing budget?",
+    "Add buying a bike to my checklist.",
+    "How does public transport work for students in Amsterdam?",
+    "I am worried about my visa appointment next month.",
+    "Put getting health insurance on my checklist.",
+    "What should I pack for a rainy autumn semester?",
+    "Thanks, that helps a lot!",
+]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def _post_json(client: httpx.AsyncClient, payload: Dict) -> Dict:
+    started = time.perf_counter()
+    response = await client.post("/chat/", json=payload)
+    ok = response.status_code == 200 and not response.json().get("error")
+    return {"latency": time.perf_counter() - started, "first_token": None, "ok": ok}
+
+
+async def _post_stream(app, payload: Dict) -> Dict:
+    """
+    Calls /chat/stream through the raw ASGI interface. httpx's ASGITransport buffers the whole response
+    body, so it can't show when the first token was sent; here each body chunk is timed as it is sent.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/chat/stream", "raw_path": b"/chat/stream", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"olivia.test"), (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("olivia.test", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    result = {"latency": None, "first_token": None, "ok": False, "status": None}
+    received = bytearray()
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if result["first_token"] is None and b"event: token" in chunk:
+                result["first_token"] = time.perf_counter() - started
+            received.extend(chunk)
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    result["latency"] = time.perf_counter() - started
+    text = received.decode("utf-8")
+    result["ok"] = result["status"] == 200 and "event: done" in text and "event: error" not in text
+    return result
+
+
+async def _run_turn(app, client: httpx.AsyncClient, user_id: str, message: str, stream: bool) -> Dict[str, Optional[float]]:
+    payload = {"user_id": user_id, "session_id": f"{user_id}-session", "message": message}
+    if stream:
+        return await _post_stream(app, payload)
+    return await _post_json(client, payload)
+
+
+async def _run_user(app, client: httpx.AsyncClient, user_index: int, turns: int, stream: bool, results: List[Dict]):
+    user_id = f"load-user-{user_index:04d}"
+    for turn in range(turns):
+        message = TURN_SCRIPT[(user_index + turn) % len(TURN_SCRIPT)]
+        try:
+            results.append(await _run_turn(app, client, user_id, message, stream))
+        except Exception as e:
+            results.append({"latency": None, "first_token": None, "ok": False, "error": repr(e)})
+
+
+async def run_load(users: int, turns: int, stream: bool, llm_latency: float, db_latency: float, verbose: bool) -> Dict:
+    # The app logs every turn; keep the report readable unless asked for the logs
+    if not verbose:
+        set_log_level("WARNING")
+    from main import app
+    from chat.agent import answer_cache, summary_worker, use_chat_models
+    from chat.tools import use_supabase_client
+
+    database = InMemorySupabase(latency_seconds=db_latency)
+    main_model = FakeChatModel(latency_seconds=llm_latency, jitter_seconds=llm_latency / 2, token_latency_seconds=0.002)
+    summarizer_model = FakeChatModel(latency_seconds=llm_latency / 2, jitter_seconds=llm_latency / 4, reply_words=30)
+    light_model = FakeChatModel(latency_seconds=llm_latency / 2, jitter_seconds=llm_latency / 4, token_latency_seconds=0.001, reply_words=25)
+    use_supabase_client(database)
+    use_chat_models(main=main_model, summarizer=summarizer_model, light=light_model)
+    answer_cache.clear()
+
+    results: List[Dict] = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://olivia.test", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(_run_user(app, client, i, turns, stream, results) for i in range(users)))
+            elapsed = time.perf_counter() - started
+        summary_jobs_pending = summary_worker.queue_depth
+
+    latencies = sorted(r["latency"] for r in results if r["ok"] and r["latency"] is not None)
+    first_tokens = sorted(r["first_token"] for r in results if r["ok"] and r.get("first_token") is not None)
+    return {
+        "users": users,
+        "turns": len(results),
+        "errors": sum(1 for r in results if not r["ok"]),
+        "elapsed_seconds": elapsed,
+        "turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_p99": _percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "first_token_p50": _percentile(first_tokens, 0.50) if stream else None,
+        "first_token_p95": _percentile(first_tokens, 0.95) if stream else None,
+        "agent_llm_calls": main_model.calls,
+        "summarizer_llm_calls": summarizer_model.calls,
+        "light_llm_calls": light_model.calls,
+        "db_requests": database.requests,
+        "answer_cache_hits": answer_cache.hits,
+        "summary_jobs_pending_at_end": summary_jobs_pending,
+    }
+
+
+def _print_report(report: Dict):
+    mode = "stream" if report["first_token_p50"] is not None else "json"
+    print(f"Load test ({mode}): {report['users']} users, {report['turns']} turns, {report['errors']} errors, {report['elapsed_seconds']:.2f}s")
+    print(f"  throughput         {report['turns_per_second']:>9.1f} turns/s")
+    for name in ("p50", "p95", "p99", "max"):
+        print(f"  latency {name:<10} {report['latency_' + name] * 1000:>9.1f} ms")
+    if report["first_token_p50"] is not None:
+        print(f"  first token p50    {report['first_token_p50'] * 1000:>9.1f} ms")
+        print(f"  first token p95    {report['first_token_p95'] * 1000:>9.1f} ms")
+    print(f"  agent LLM calls    {report['agent_llm_calls']:>9}")
+    print(f"  summarizer calls   {report['summarizer_llm_calls']:>9}")
+    print(f"  light LLM calls    {report['light_llm_calls']:>9}")
+    print(f"  Supabase requests  {report['db_requests']:>9}")
+    print(f"  answer cache hits  {report['answer_cache_hits']:>9}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline load test for Olivia's /chat endpoints.")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent users (default: 50)")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per user, sent one after another (default: 10)")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream and also report time to first token")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Base latency of each fake agent LLM call in seconds (default: 0.3)")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="Latency of each in-memory Supabase request in seconds (default: 0.005)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args.users, args.turns, args.stream, args.llm_latency, args.db_latency, args.verbose))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
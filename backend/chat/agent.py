@@ -1,58 +1,105 @@
 # This file will contain the LangChain agent logic.
 # Tools are defined in tools.py
+import asyncio
+import contextvars
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI # For summarization LLM
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_openai_tools_agent
 import json
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional, Tuple
 
 # Import tools from tools.py
 from .tools import (
     read_conversation_history,
     write_conversation_summary,
+    write_chunk_summary,
     write_conversation_message, # Now active for the test loop
     read_user_checklist,
     write_user_checklist,
-    delete_user_checklist # Added for test setup
+    delete_user_checklist, # Added for test setup
+    add_checklist_item,
+    update_checklist_item,
+    toggle_checklist_item,
+    recall_index
 )
+from .recall import RECALL_CROSS_SESSION, format_recalled_messages
+from .answer_cache import AnswerCache, is_context_independent, question_key
+from .intent_router import ROUTE_LIGHT, route_turn
+from .summary_worker import SummaryWorker
+from .context_assembler import assemble_context, truncate_to_tokens
+from .memory import (
+    MEMORY_MAX_CHUNK_SUMMARIES,
+    SYNOPSIS_MAX_TOKENS,
+    build_compaction_prompt,
+    format_memory_for_prompt,
+    history_after_chunk_fold,
+    plan_chunk_fold,
+    plan_synopsis_merge,
+    synopsis_needs_compaction
+)
+from .usage import PromptUsageRecorder, prompt_cache_stats
+from .user_locks import user_turn_locks
+from llm_gateway import get_chat_model
+from metrics import atime_stage, summary_folds_total, time_stage, timed_stage
+from .agent_trace import turn_callbacks
+from app_logging import Truncated, get_logger, get_payload_logger, set_log_level
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
 
 # Load environment variables from .env file (for OPENAI_API_KEY)
 load_dotenv()
 
+logger = get_logger(__name__)
+payload_logger = get_payload_logger(__name__)
+
 # --- Configuration for Summarization & Agent Context ---
 # Max raw messages the MAIN AGENT sees in its direct context (newer than the latest summary)
 MAIN_AGENT_MAX_RAW_MESSAGES = 30
-# Number of oldest raw messages (from the post-summary pool) to fold into the summary during maintenance
+# Number of oldest raw messages (from the post-summary pool) to fold into one chunk summary during maintenance
 SUMMARIZE_BATCH_SIZE = 10 
 SUMMARIZATION_LLM_MODEL = "gpt-4o-mini"
 
-# Initialize the LLM for summarization
+# The LLMs are created on first use (or by the warm-up in warm_up.py), not at import time
 # Ensure OPENAI_API_KEY is set in your environment or .env file
-summarizer_llm = ChatOpenAI(
-    model=SUMMARIZATION_LLM_MODEL,
-    temperature=0.3, # Low temperature for more factual and concise summaries
-)
+_summarizer_llm = None
+
+def get_summarizer_llm():
+    """Returns the summarization chat model, creating it on first call."""
+    global _summarizer_llm
+    if _summarizer_llm is None:
+        _summarizer_llm = get_chat_model(
+            SUMMARIZATION_LLM_MODEL,
+            temperature=0.3, # Low temperature for more factual and concise summaries
+        )
+    return _summarizer_llm
 
 # --- Configuration for Main Agent ---
 MAIN_LLM_MODEL = "gpt-4o"
+# Static instructions: identical bytes for every user and turn, so together with the tool schemas they
+# form a prefix the provider's prompt cache can reuse. Anything per-user belongs in USER_CONTEXT_PROMPT.
 INITIAL_SYSTEM_PROMPT = """You are Olivia, a friendly and helpful AI assistant. Your primary goal is to assist users with questions and tasks related to relocating for an exchange semester or moving to a new city.
 
 Format your responses as plain text. Do not use any markdown syntax (such as `*`, `_`, `#`, `[]()`, etc.).
 
-The user you are currently assisting has the ID: {user_id}
+The ID of the user you are currently assisting is given in the 'Current User ID' line of the user context that follows these instructions.
 When you use any tool that requires a user_id, you MUST use this exact ID.
 
-You have access to the following tools for managing a relocation checklist:
-- `write_user_checklist`: Use this tool to create a new checklist or update an existing checklist for the user. The `user_id` parameter for this tool MUST be {user_id}.
-- `delete_user_checklist`: Use this tool to completely delete a user's checklist. The `user_id` parameter for this tool MUST be {user_id}. It's a good idea to confirm with the user before deleting their entire checklist.
+You have access to the following tools for managing a relocation checklist. The `user_id` parameter for every one of them MUST be the current user's ID.
+- `add_checklist_item`: Adds ONE new item (give its `category` and `description`). Creates the checklist if the user doesn't have one yet. The item's id and timestamps are generated for you.
+- `toggle_checklist_item`: Checks off (`is_checked` true) or unchecks (`is_checked` false) ONE existing item, identified by its `id`.
+- `update_checklist_item`: Changes the `category`, `description` and/or `is_checked` of ONE existing item, identified by its `id`. Only pass the fields that change.
+- `write_user_checklist`: Replaces the user's ENTIRE checklist. Only use it when restructuring most of the list at once (e.g. creating a full checklist from scratch, or removing items).
+- `delete_user_checklist`: Use this tool to completely delete a user's checklist. It's a good idea to confirm with the user before deleting their entire checklist.
+
+Always prefer the single-item tools (`add_checklist_item`, `toggle_checklist_item`, `update_checklist_item`) for small changes: they are much faster than rewriting the whole checklist. Call them once per item.
 
 **Checklist Structure and Usage:**
 
 The user's checklist is stored and managed as a JSON object with a single top-level key: "items". The value of "items" is a list of checklist item objects.
 
-When you receive the current checklist from the `read_user_checklist` tool (it will be provided in the 'User's Current Checklist' section of your context), it will be in the format: `{{"items": [item1, item2, ...]}}`. If no checklist exists, it will be `{{"items": []}}`.
+The current checklist is provided in the 'User's Current Checklist' section of your context in a compact form: a header line with the checklist version and item counts, then one line per item formatted as `[x] id | category | description` (`[x]` = checked, `[ ]` = not checked). Timestamps are not shown. If no checklist exists, it says so.
 
 When using `write_user_checklist`, the `checklist_data` argument you provide MUST be a JSON object EXACTLY in this format: `{{"items": [list_of_item_objects]}}`.
 
@@ -89,31 +136,80 @@ For example:
 }}
 ```
 
-Each item object in the "items" list MUST contain the following fields:
-- `id`: A unique identifier for the item (you should generate a new UUID string for new items).
+Each item object in the "items" list contains the following fields:
+- `id`: A unique identifier for the item. Use it to refer to existing items with `toggle_checklist_item` and `update_checklist_item`.
 - `category`: A string indicating the category of the item. This MUST be one of the standard categories: "Visa", "Health Insurance", "SIM Card", "Incoming University Documents", "Home University Documents", "Housing", "Bank Account". You can also use other categories if they are relevant to the user's specific needs, but try to use standard ones where applicable.
 - `description`: The text of the checklist item.
 - `is_checked`: A boolean indicating if the item is completed (true) or not (false).
-- `created_at`: An ISO 8601 timestamp string for when the item was created (e.g., use a placeholder like "current_timestamp_iso" if you cannot generate one, but the tool expects it).
-- `updated_at`: An ISO 8601 timestamp string for when the item was last updated (similarly, use "current_timestamp_iso").
+- `created_at` / `updated_at`: ISO 8601 timestamps. These are managed by the tools; you never need to set them.
 
 **Important for `write_user_checklist`:**
-- You MUST provide the *entire* `{{"items": [...]}}` structure in the `checklist_data` argument, even if you are only modifying one item. Retrieve the current checklist (which will be in your context as `{{"items": [...]}}`), make your modifications to the list of items, and then pass the complete, updated `{{"items": [updated_list]}}` structure to the tool.
-- When adding a new item: generate a new unique `id`, set its `category`, `description`, `is_checked` to false, and set `created_at` and `updated_at` to the current timestamp.
-- When updating an existing item (e.g., checking it off, changing description): find the item by its `id` in the list, update its fields (especially `is_checked` and/or `description`), and importantly, update its `updated_at` timestamp to the current time.
+- You MUST provide the *entire* `{{"items": [...]}}` structure in the `checklist_data` argument. Take the current checklist from your context, make your modifications to the list of items, and then pass the complete, updated `{{"items": [updated_list]}}` structure to the tool, with each item as an object with `id`, `category`, `description` and `is_checked`.
+- Keep the `id` of existing items. New items may omit `id`, `created_at` and `updated_at`; they are generated for you, and existing items keep their timestamps.
+- If your context says some items are not shown, do not use `write_user_checklist`.
+- Pass the checklist version shown in your context as `expected_version`. If the checklist changed in the meantime (for example on another device), the write is rejected and the tool returns the current checklist: apply your change to that checklist and call `write_user_checklist` again with its version.
 
-If a user asks to add, remove, or update items on their checklist, use `write_user_checklist` with the appropriately modified complete `{{"items": [...]}}` structure.
+If a user asks to add items, use `add_checklist_item` once per item. If they ask to check off, uncheck or change an item, use `toggle_checklist_item` or `update_checklist_item` with the item's `id`. If they ask to remove individual items, use `write_user_checklist` with the complete list minus those items.
 If a user explicitly asks to delete their entire checklist, use `delete_user_checklist` after confirming with them. (This tool deletes the entire checklist record, not individual items).
 If you need to ask clarifying questions before writing to a checklist, do so.
 
-The user's current checklist (if one exists, in the `{{"items": [...]}}` format) is provided below in the conversation context. Review it to understand what tasks are already noted before making modifications.
+The user's current checklist (if one exists) is provided in the user context that follows these instructions. Review it to understand what tasks are already noted before making modifications.
 """
 
-# Initialize the main LLM for Olivia's responses
-main_llm = ChatOpenAI(
-    model=MAIN_LLM_MODEL,
-    temperature=0.6 # Standard temperature for creative and helpful responses
-)
+# Everything that changes per user or per turn, sent as a second system message after the static prefix
+USER_CONTEXT_PROMPT = """Current User ID: {user_id}
+
+Conversation Summary:
+{summary_content}
+
+Recent Messages (excluding current user input):
+{recent_messages_formatted}
+
+Relevant Earlier Messages (older messages that may relate to the current input, most relevant first):
+{recalled_messages_formatted}
+
+User's Current Checklist:
+{current_checklist_formatted}"""
+
+_main_llm = None
+
+def get_main_llm():
+    """Returns the chat model for Olivia's responses, creating it on first call."""
+    global _main_llm
+    if _main_llm is None:
+        _main_llm = get_chat_model(
+            MAIN_LLM_MODEL,
+            temperature=0.6, # Standard temperature for creative and helpful responses
+            stream_usage=True # Report token usage (incl. cached prompt tokens) for streamed calls too
+        )
+    return _main_llm
+
+# --- Configuration for the light tier (see intent_router.py) ---
+# Greetings, thanks and short standalone questions are answered by this model in a single call, without
+# the agent loop, the tool schemas or the checklist
+LIGHT_LLM_MODEL = "gpt-4o-mini"
+# Recent messages the light model sees (after the conversation summary); enough to keep the tone continuous
+LIGHT_MAX_RAW_MESSAGES = 6
+LIGHT_SYSTEM_PROMPT = """You are Olivia, a friendly and helpful AI assistant for people relocating for an exchange semester or moving to a new city.
+Answer the user's message briefly and warmly, in plain text. You have no tools in this conversation step: don't claim to have changed their checklist or saved anything. If they ask for something you can't do here, tell them to just ask and you will take care of it."""
+LIGHT_CONTEXT_PROMPT = """Conversation Summary:
+{summary_content}
+
+Recent Messages (excluding current user input):
+{recent_messages_formatted}"""
+
+_light_llm = None
+
+def get_light_llm():
+    """Returns the chat model for turns the intent router sends to the light tier, creating it on first call."""
+    global _light_llm
+    if _light_llm is None:
+        _light_llm = get_chat_model(
+            LIGHT_LLM_MODEL,
+            temperature=0.6, # Same voice as the main model
+            stream_usage=True
+        )
+    return _light_llm
 
 def format_messages_for_prompt(messages: list) -> str:
     """Helper function to format a list of message dicts into a string for the prompt."""
@@ -121,213 +217,703 @@ def format_messages_for_prompt(messages: list) -> str:
         return "No messages to format."
     return "\n".join([f"{msg.get('message_type', 'unknown').capitalize()}: {msg.get('content', '')}" for msg in messages])
 
-def maintain_conversation_summary(user_id: str):
-    """
-    Maintains a rolling summary of the conversation based on the new logic.
-    If the number of raw messages newer than the current summary exceeds MAIN_AGENT_MAX_RAW_MESSAGES,
-    the oldest SUMMARIZE_BATCH_SIZE of these messages are folded into the summary.
-    """
-    print(f"[SummaryManager] Checking summary for user_id: {user_id}")
+def _is_tool_error(result) -> bool:
+    """Returns True if a string result from one of the Supabase tools reports a failure."""
+    return isinstance(result, str) and (
+        result.startswith("Error") or result.startswith("Failed") or result.startswith("An unexpected error")
+    )
 
-    # 1. Get the current state of history (latest summary and post-summary raw messages)
-    #    We use a slightly larger limit here to ensure we see all messages that might need to be summarized.
-    #    The read_conversation_history tool itself will cap at its internal default if we ask for too many for the agent view.
-    #    This call is specifically to assess summarization needs.
-    history_for_summarizer = read_conversation_history.invoke({
-        "user_id": user_id,
-        "max_messages": MAIN_AGENT_MAX_RAW_MESSAGES + SUMMARIZE_BATCH_SIZE + 5 # e.g., 30 + 10 + 5 = 45
-    })
+# The summarizer looks slightly further back than the agent so it sees every message that might need folding.
+SUMMARIZER_HISTORY_WINDOW = MAIN_AGENT_MAX_RAW_MESSAGES + SUMMARIZE_BATCH_SIZE + 5 # e.g., 30 + 10 + 5 = 45
 
+def _check_history_for_maintenance(user_id: str, session_id: str, history_for_summarizer: dict) -> bool:
+    """Logs the state of the history that summary maintenance starts from. Returns False if it couldn't be read."""
     if history_for_summarizer.get("error"):
-        print(f"[SummaryManager] Error fetching history for summarization: {history_for_summarizer.get('error')}")
-        return
-
-    current_summary_content = history_for_summarizer.get("summary") # This can be None if no summary exists
-    # These are messages newer than the current_summary_content (or all if no summary)
+        logger.error("[SummaryManager] Error fetching history for summarization: %s", history_for_summarizer.get("error"))
+        return False
     post_summary_raw_messages = history_for_summarizer.get("messages", [])
-    
-    print(f"[SummaryManager] Fetched {len(post_summary_raw_messages)} post-summary raw messages for check.")
-    if current_summary_content:
-        print(f"[SummaryManager] Current summary (first 100 chars): '{current_summary_content[:100]}...'")
+    chunk_summaries = history_for_summarizer.get("chunk_summaries") or []
+    logger.debug("[SummaryManager] Fetched %s post-summary raw messages and %s chunk summaries for check.", len(post_summary_raw_messages), len(chunk_summaries))
+    if len(post_summary_raw_messages) <= MAIN_AGENT_MAX_RAW_MESSAGES and len(chunk_summaries) <= MEMORY_MAX_CHUNK_SUMMARIES:
+        logger.debug("[SummaryManager] No summarization needed for %s, session %s. (%s post-summary messages <= %s limit)", user_id, session_id, len(post_summary_raw_messages), MAIN_AGENT_MAX_RAW_MESSAGES)
+    return True
+
+def _report_summary_write(user_id: str, write_summary_result: str, kind: str = "summary"):
+    """Logs the outcome of writing a freshly generated chunk summary or synopsis."""
+    if _is_tool_error(write_summary_result):
+        logger.error("[SummaryManager] Error writing new %s for %s: %s", kind, user_id, write_summary_result)
     else:
-        print("[SummaryManager] No current summary found.")
+        logger.info("[SummaryManager] Successfully wrote new %s for %s.", kind, user_id)
 
-    # 2. Check if summarization is needed
-    # If the number of raw messages that are newer than the current summary 
-    # is greater than what the main agent is allowed to see directly.
-    if len(post_summary_raw_messages) > MAIN_AGENT_MAX_RAW_MESSAGES:
-        print(f"[SummaryManager] Summarization needed for {user_id}. ({len(post_summary_raw_messages)} post-summary messages > {MAIN_AGENT_MAX_RAW_MESSAGES} limit)")
-        
-        # 3. Determine messages to fold into the summary
-        # These are the oldest messages from the post_summary_raw_messages list
-        messages_to_fold_in = post_summary_raw_messages[:SUMMARIZE_BATCH_SIZE]
-        
-        if not messages_to_fold_in:
-            print("[SummaryManager] No messages to process for folding, though condition met. Skipping.")
+def _history_after_turn(history_data: dict, session_id: str, ai_response_content: str) -> dict:
+    """
+    Extends the history a turn already fetched with the AI reply it just saved,
+    so summary maintenance can reuse it instead of reading the history again.
+    """
+    ai_message = {"session_id": session_id, "message_type": "ai", "content": str(ai_response_content)}
+    return {**history_data, "messages": list(history_data.get("messages", [])) + [ai_message]}
+
+# The steps of summary maintenance that need I/O, as (kind, payload) requests yielded by _summary_maintenance_steps
+SUMMARIZE_STEP = "summarize" # payload: prompt text; result: the summarizer's reply text
+WRITE_CHUNK_STEP = "write_chunk" # payload: write_chunk_summary input; result: the tool's result string
+WRITE_SYNOPSIS_STEP = "write_synopsis" # payload: write_conversation_summary input; result: the tool's result string
+
+def _summary_maintenance_steps(user_id: str, session_id: str, history_for_summarizer: dict):
+    """
+    The decisions of summary maintenance, shared by the sync and async entry points: a generator that yields
+    a (kind, payload) request for every summarizer call or summary write and is sent back its result.
+    1. If more than MAIN_AGENT_MAX_RAW_MESSAGES raw messages are newer than the summaries, the oldest
+       SUMMARIZE_BATCH_SIZE of them are summarized on their own into a chunk summary.
+    2. If that leaves more than MEMORY_MAX_CHUNK_SUMMARIES chunk summaries, the oldest are merged into the
+       synopsis, which is re-compacted if it exceeds SYNOPSIS_MAX_TOKENS; superseded summary rows are pruned.
+    """
+    if not _check_history_for_maintenance(user_id, session_id, history_for_summarizer):
+        return
+
+    # Fold the oldest raw messages into a chunk summary if the raw window is full
+    chunk_plan = plan_chunk_fold(history_for_summarizer, MAIN_AGENT_MAX_RAW_MESSAGES, SUMMARIZE_BATCH_SIZE)
+    if chunk_plan is not None:
+        prompt_text, covers_until, folded_count = chunk_plan
+        logger.info("[SummaryManager] Invoking LLM (%s) for a chunk summary of %s messages...", SUMMARIZATION_LLM_MODEL, folded_count)
+        chunk_summary = yield SUMMARIZE_STEP, prompt_text
+        write_result = yield WRITE_CHUNK_STEP, {
+            "user_id": user_id, "session_id": session_id, "summary_content": chunk_summary, "covers_until": covers_until
+        }
+        _report_summary_write(user_id, write_result, "chunk summary")
+        if _is_tool_error(write_result):
             return
+        summary_folds_total.inc("chunk")
+        history_for_summarizer = history_after_chunk_fold(history_for_summarizer, chunk_summary, covers_until, folded_count)
 
-        formatted_msgs_to_fold = format_messages_for_prompt(messages_to_fold_in)
-        
-        # Effective current summary for the prompt (handles if it's the very first summary)
-        summary_for_prompt = current_summary_content if current_summary_content else "This is the beginning of the conversation."
-
-        prompt_text = f"""
-Your task is to update an existing conversation summary by integrating new messages. 
-Focus on extracting key information, decisions, and important topics discussed in the new messages and seamlessly incorporate them into the existing summary. 
-If the existing summary is 'This is the beginning of the conversation.', create a new concise summary based on the new messages. 
-Maintain a coherent and concise narrative. Output only the updated summary content.
-
-Existing Summary:
----
-{summary_for_prompt}
----
-
-New Message(s) to Integrate:
----
-{formatted_msgs_to_fold}
----
-
-Updated Summary:
-"""
-        try:
-            print(f"[SummaryManager] Invoking LLM ({SUMMARIZATION_LLM_MODEL}) for summarization with {len(messages_to_fold_in)} messages...")
-            llm_response = summarizer_llm.invoke(prompt_text)
-            new_updated_summary = llm_response.content
-            print(f"[SummaryManager] LLM generated new summary (length: {len(new_updated_summary)}).")
-            
-            write_summary_result = write_conversation_summary.invoke({
-                "user_id": user_id,
-                "summary_content": new_updated_summary
-            })
-            # The write_conversation_summary tool returns a string
-            if "Error" in write_summary_result or "Failed" in write_summary_result:
-                 print(f"[SummaryManager] Error writing new summary for {user_id}: {write_summary_result}")
+    # Merge the oldest chunk summaries into the synopsis if there are too many
+    merge_plan = plan_synopsis_merge(history_for_summarizer)
+    if merge_plan is None:
+        return
+    prompt_text, covers_until, merged_count = merge_plan
+    logger.info("[SummaryManager] Invoking LLM (%s) to merge %s chunk summaries into the synopsis...", SUMMARIZATION_LLM_MODEL, merged_count)
+    synopsis = yield SUMMARIZE_STEP, prompt_text
+    if synopsis_needs_compaction(synopsis, SUMMARIZATION_LLM_MODEL):
+        logger.info("[SummaryManager] Synopsis over %s tokens; re-compacting.", SYNOPSIS_MAX_TOKENS)
+        summary_folds_total.inc("compaction")
+        synopsis = yield SUMMARIZE_STEP, build_compaction_prompt(synopsis)
+        synopsis = truncate_to_tokens(synopsis, SYNOPSIS_MAX_TOKENS, SUMMARIZATION_LLM_MODEL)
+    write_result = yield WRITE_SYNOPSIS_STEP, {
+        "user_id": user_id, "session_id": session_id, "summary_content": synopsis, "covers_until": covers_until
+    }
+    _report_summary_write(user_id, write_result, "synopsis")
+    if not _is_tool_error(write_result):
+        summary_folds_total.inc("synopsis")
+
+_SUMMARY_WRITE_TOOLS = {WRITE_CHUNK_STEP: write_chunk_summary, WRITE_SYNOPSIS_STEP: write_conversation_summary}
+
+@timed_stage("chat", "summary_maintenance")
+def maintain_conversation_summary(user_id: str, session_id: str, history_for_summarizer: Optional[dict] = None):
+    """
+    Maintains the tiered conversation memory of one of the user's sessions (see chat/memory.py and
+    _summary_maintenance_steps), blocking. Each summarizer call sees a bounded prompt, however long the
+    conversation has been going.
+    Pass `history_for_summarizer` (fetched with SUMMARIZER_HISTORY_WINDOW) to skip reading the history again.
+    """
+    logger.debug("[SummaryManager] Checking summary for user_id: %s, session_id: %s", user_id, session_id)
+    if history_for_summarizer is None:
+        history_for_summarizer = read_conversation_history.invoke({
+            "user_id": user_id,
+            "session_id": session_id,
+            "max_messages": SUMMARIZER_HISTORY_WINDOW
+        })
+    steps = _summary_maintenance_steps(user_id, session_id, history_for_summarizer)
+    try:
+        request = next(steps)
+        while True:
+            kind, payload = request
+            if kind == SUMMARIZE_STEP:
+                result = get_summarizer_llm().invoke(payload).content
             else:
-                print(f"[SummaryManager] Successfully wrote new summary for {user_id}.")
+                result = _SUMMARY_WRITE_TOOLS[kind].invoke(payload)
+            request = steps.send(result)
+    except StopIteration:
+        pass
+    except Exception as e:
+        logger.error("[SummaryManager] Error during LLM summarization or writing summary: %s", e)
 
-        except Exception as e:
-            print(f"[SummaryManager] Error during LLM summarization or writing summary: {e}")
-    else:
-        print(f"[SummaryManager] No summarization needed for {user_id}. ({len(post_summary_raw_messages)} post-summary messages <= {MAIN_AGENT_MAX_RAW_MESSAGES} limit)")
+@timed_stage("chat", "summary_maintenance")
+async def amaintain_conversation_summary(user_id: str, session_id: str, history_for_summarizer: Optional[dict] = None):
+    """
+    Async counterpart of maintain_conversation_summary.
+    The history read and summary writes run off the event loop and the summarizer LLM is awaited via `ainvoke`.
+    """
+    logger.debug("[SummaryManager] Checking summary for user_id: %s, session_id: %s", user_id, session_id)
+    if history_for_summarizer is None:
+        history_for_summarizer = await read_conversation_history.ainvoke({
+            "user_id": user_id,
+            "session_id": session_id,
+            "max_messages": SUMMARIZER_HISTORY_WINDOW
+        })
+    steps = _summary_maintenance_steps(user_id, session_id, history_for_summarizer)
+    try:
+        request = next(steps)
+        while True:
+            kind, payload = request
+            if kind == SUMMARIZE_STEP:
+                result = (await get_summarizer_llm().ainvoke(payload)).content
+            else:
+                result = await _SUMMARY_WRITE_TOOLS[kind].ainvoke(payload)
+            request = steps.send(result)
+    except StopIteration:
+        pass
+    except Exception as e:
+        logger.error("[SummaryManager] Error during LLM summarization or writing summary: %s", e)
+
+# Runs amaintain_conversation_summary in the background, one pending job per (user, session).
+# Started/stopped by the FastAPI lifespan in main.py (and lazily on first use).
+summary_worker = SummaryWorker(amaintain_conversation_summary)
+
+def _checklist_for_prompt(user_id: str, checklist_data_result):
+    """
+    Validates the result of the read_user_checklist tool for the checklist section of the agent prompt.
+    Returns the checklist dict to encode, or the text to show in its place.
+    """
+    current_checklist_content = "No checklist found for the user." # Default
+
+    if isinstance(checklist_data_result, dict) and checklist_data_result.get("error"):
+        logger.error("[Checklist] Error reading checklist: %s", checklist_data_result.get("error"))
+        # current_checklist_content remains default
+    elif checklist_data_result is None:
+        logger.debug("[Checklist] No checklist found for user %s (tool returned None).", user_id)
+        # current_checklist_content remains default
+    elif isinstance(checklist_data_result, dict): # Checklist data is directly the dict from JSONB
+        if isinstance(checklist_data_result.get("items"), list):
+            logger.debug("[Checklist] Successfully read checklist (version %s, %s items).", checklist_data_result.get("version", 0), len(checklist_data_result["items"]))
+            return checklist_data_result
+        logger.warning("[Checklist] Checklist data has no 'items' list. Data: %s", Truncated(checklist_data_result, 200))
+        current_checklist_content = f"Error: Could not display checklist data due to formatting issue. Raw: {str(checklist_data_result)[:200]}"
+    else: # Should not happen if tool adheres to its return types (dict for data/error, or None)
+        logger.warning("[Checklist] Unexpected data type from read_user_checklist: %s. Data: %s", type(checklist_data_result), Truncated(checklist_data_result))
+        current_checklist_content = "Error: Received unexpected checklist data format from tool."
+
+    return current_checklist_content
+
+def _recall_earlier_messages(user_id: str, session_id: str, user_message_content: str, history_data: dict) -> list:
+    """
+    Looks up the older messages of this session (of all the user's sessions with RECALL_CROSS_SESSION)
+    most similar to the current input (see recall.py).
+    Messages in the fetched history window are excluded, since the agent already sees or has just summarized them.
+    """
+    try:
+        window_ids = {msg.get("message_id") for msg in history_data.get("messages", []) if msg.get("message_id")}
+        recalled = recall_index.search(user_id, user_message_content, exclude_ids=window_ids,
+                                       session_id=None if RECALL_CROSS_SESSION else session_id)
+        if recalled:
+            logger.debug("[Recall] Recalled %s earlier messages for user_id %s (best score: %.2f).", len(recalled), user_id, recalled[0]["score"])
+        return recalled
+    except Exception as e: # Recall only adds context; never fail the turn over it
+        logger.error("[Recall] Error recalling earlier messages for user_id %s: %s", user_id, e)
+        return []
+
+def _build_agent_inputs(user_id: str, user_message_content: str, history_data: dict, checklist_data_result, recalled_messages: Optional[list] = None) -> dict:
+    """
+    Assembles the per-turn invocation inputs for the agent from history and checklist reads.
+    The summary, recent messages, recalled earlier messages and checklist are fitted into the context
+    token budget (see context_assembler).
+    """
+    # History is fetched with the summarizer's (larger) window; the agent sees at most the newest
+    # MAIN_AGENT_MAX_RAW_MESSAGES of it, fewer if they don't fit the budget
+    context = assemble_context(
+        format_memory_for_prompt(history_data), # Synopsis + chunk summaries
+        history_data.get("messages", []),
+        _checklist_for_prompt(user_id, checklist_data_result),
+        max_messages=MAIN_AGENT_MAX_RAW_MESSAGES,
+        model=MAIN_LLM_MODEL,
+        recalled_lines=format_recalled_messages(recalled_messages or [])
+    )
+    token_counts = context["token_counts"]
+    logger.debug("[Context] Tokens - summary: %s, messages: %s (%s/%s), recalled: %s (%s), checklist: %s (%s/%s items), total: %s/%s",
+                 token_counts["summary"], token_counts["messages"], context["messages_included"], context["messages_available"],
+                 token_counts["recalled"], context["messages_recalled"], token_counts["checklist"],
+                 context["checklist_items_included"], context["checklist_items_total"], token_counts["total"], token_counts["budget"])
+
+    return {
+        "input": user_message_content,
+        "summary_content": context["summary_content"],
+        "recent_messages_formatted": context["recent_messages_formatted"],
+        "recalled_messages_formatted": context["recalled_messages_formatted"],
+        "current_checklist_formatted": context["current_checklist_formatted"],
+        "user_id": user_id,  # Pass user_id here so it can be used in the formatted prompt
+        "chat_history": []
+    }
+
+# Tools the main agent may call. These, the prompt and the LLM never change between turns,
+# so the agent is built once and only the per-turn values are passed as invocation inputs.
+AGENT_TOOLS = [
+    add_checklist_item, toggle_checklist_item, update_checklist_item, # Item-level patches (preferred)
+    write_user_checklist, delete_user_checklist # Whole-checklist rewrite or delete
+]
+
+# Agent step tracing is opt-in: set OLIVIA_AGENT_VERBOSE=true to log every agent step (see agent_trace.py)
+AGENT_VERBOSE = os.getenv("OLIVIA_AGENT_VERBOSE", "false").lower() in ("1", "true", "yes")
+if AGENT_VERBOSE:
+    set_log_level("DEBUG", "chat.agent.trace")
+
+_agent_executor = None
+
+def _build_agent_executor(verbose: bool = False) -> "AgentExecutor":
+    """
+    Creates the tool-calling agent for Olivia and wraps it in an AgentExecutor.
+    `verbose` makes AgentExecutor print its steps to stdout; the service traces through the logger instead (agent_trace.py).
+    """
+    # Deferred: langchain.agents is one of the slowest imports in the app, and only needed once the agent is built
+    from langchain.agents import AgentExecutor, create_openai_tools_agent
+
+    agent_prompt = ChatPromptTemplate.from_messages([
+        # Static instructions first (cacheable prefix, after the tool schemas), then the per-user context
+        ("system", INITIAL_SYSTEM_PROMPT),
+        ("system", USER_CONTEXT_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+    
+    agent = create_openai_tools_agent(get_main_llm(), AGENT_TOOLS, agent_prompt)
+    return AgentExecutor(agent=agent, tools=AGENT_TOOLS, verbose=verbose, handle_parsing_errors=True) # Added handle_parsing_errors
 
+def use_chat_models(main=None, summarizer=None, light=None):
+    """
+    Swaps the agent's, the summarizer's and/or the light tier's chat model, e.g. for the fake model in
+    benchmarks/fake_llm.py. The shared AgentExecutor is rebuilt on next use.
+    """
+    global _main_llm, _summarizer_llm, _light_llm, _agent_executor
+    if main is not None:
+        _main_llm = main
+        _agent_executor = None
+    if summarizer is not None:
+        _summarizer_llm = summarizer
+    if light is not None:
+        _light_llm = light
+
+def get_agent_executor() -> "AgentExecutor":
+    """
+    Returns the shared AgentExecutor for Olivia, building it on first use.
+    The executor holds no per-turn state, so one instance serves all turns (sync and async, concurrently).
+    """
+    global _agent_executor
+    if _agent_executor is None:
+        _agent_executor = _build_agent_executor()
+    return _agent_executor
+
+def _extract_agent_output(response: dict) -> str:
+    """Pulls Olivia's reply out of an AgentExecutor response."""
+    ai_response_content = response.get("output")
+    if ai_response_content is None:
+        ai_response_content = "I'm sorry, I wasn't able to generate a response. (Agent output was None)"
+        logger.warning("[Agent Call] Agent returned None for 'output'.")
+    payload_logger.debug("[Agent Call] Received response from agent: %s", Truncated(ai_response_content, 100))
+    return ai_response_content
+
+def _agent_error_message(e: Exception) -> str:
+    """Maps an exception raised by the agent to the reply stored and returned for the turn."""
+    logger.error("[Agent Call] Error invoking agent: %s", e)
+    # Check if the error is a parsing error that handle_parsing_errors might have tried to address
+    if "Could not parse LLM output" in str(e) or "ActionParser" in str(e):
+        return "I had a little trouble processing that request. Could you try rephrasing it?"
+    return f"Sorry, I encountered an error trying to generate a response: {e}"
+
+@timed_stage("chat", "turn_total")
 def invoke_agent_turn(user_id: str, session_id: str, user_message_content: str) -> str:
     """
     Orchestrates a single turn of the conversation with Olivia.
     1. Saves the user message.
     2. Retrieves history (summary + recent messages).
     3. Retrieves current checklist for the user.
-    4. Initializes an agent with the 'write_user_checklist' tool.
+    4. Gets the prebuilt agent (with the checklist tools in AGENT_TOOLS).
     5. Invokes the agent to get Olivia's response (which might involve tool use).
     6. Saves Olivia's response to history.
     7. Triggers summary maintenance.
     Returns Olivia's response content as a string.
     """
-    print(f"\n--- Invoking Agent Turn for user: {user_id}, session: {session_id} ---")
-    print(f"User Message: {user_message_content}")
+    logger.info("--- Invoking Agent Turn for user: %s, session: %s ---", user_id, session_id)
+    payload_logger.debug("User Message: %s", Truncated(user_message_content))
 
     # 1. Save user message to history BEFORE calling LLM
-    write_user_msg_result = write_conversation_message.invoke({
-        "user_id": user_id, "session_id": session_id,
-        "message_type": "human", "content": user_message_content
-    })
-    print(f"[DB Write] User message saved: {write_user_msg_result}")
-    if isinstance(write_user_msg_result, str) and (write_user_msg_result.startswith("Error") or write_user_msg_result.startswith("Failed") or write_user_msg_result.startswith("An unexpected error")):
+    with time_stage("chat", "message_write"):
+        write_user_msg_result = write_conversation_message.invoke({
+            "user_id": user_id, "session_id": session_id,
+            "message_type": "human", "content": user_message_content
+        })
+    logger.debug("[DB Write] User message saved: %s", write_user_msg_result)
+    if _is_tool_error(write_user_msg_result):
         return f"Error saving user message: {write_user_msg_result}"
 
     # 2. Read conversation history (summary + recent messages for prompt)
-    history_data = read_conversation_history.invoke({
-        "user_id": user_id,
-        "max_messages": MAIN_AGENT_MAX_RAW_MESSAGES
-    })
+    with time_stage("chat", "history_read"):
+        history_data = read_conversation_history.invoke({
+            "user_id": user_id,
+            "session_id": session_id,
+            "max_messages": SUMMARIZER_HISTORY_WINDOW # Also reused by summary maintenance below
+        })
 
     if history_data.get("error"):
         return f"Error fetching conversation history: {history_data.get('error')}"
 
-    summary_content = history_data.get("summary", "No summary available yet.")
-    recent_messages_dicts = history_data.get("messages", [])
-    formatted_recent_messages_str = format_messages_for_prompt(recent_messages_dicts)
-
     # 3. Read user's current checklist
-    print(f"[Checklist] Reading checklist for user_id: {user_id}")
-    checklist_data_result = read_user_checklist.invoke({"user_id": user_id})
+    logger.debug("[Checklist] Reading checklist for user_id: %s", user_id)
+    with time_stage("chat", "checklist_read"):
+        checklist_data_result = read_user_checklist.invoke({"user_id": user_id})
+    with time_stage("chat", "recall"):
+        recalled_messages = _recall_earlier_messages(user_id, session_id, user_message_content, history_data)
+
+    # 4. Get the prebuilt agent
+    agent_executor = get_agent_executor()
+
+    # 5. Invoke the agent
+    logger.info("[Agent Call] Invoking agent (%s)...", MAIN_LLM_MODEL)
+    usage_recorder = PromptUsageRecorder()
+    try:
+        with time_stage("chat", "agent_run"):
+            response = agent_executor.invoke(
+                _build_agent_inputs(user_id, user_message_content, history_data, checklist_data_result, recalled_messages),
+                config=turn_callbacks(usage_recorder)
+            )
+        ai_response_content = _extract_agent_output(response)
+    except Exception as e:
+        # Still return the ai_response_content which is now an error message
+        ai_response_content = _agent_error_message(e)
+    prompt_cache_stats.record_turn(user_id, usage_recorder)
+
+    # 6. Save AI response to history
+    with time_stage("chat", "ai_message_write"):
+        write_ai_msg_result = write_conversation_message.invoke({
+            "user_id": user_id, "session_id": session_id,
+            "message_type": "ai", "content": str(ai_response_content) # Ensure content is string
+        })
+    logger.debug("[DB Write] AI message saved: %s", write_ai_msg_result)
+    if _is_tool_error(write_ai_msg_result):
+        logger.warning("[DB Write] Error saving AI message: %s", write_ai_msg_result)
+
+    # 7. Trigger summary maintenance, reusing the history fetched above
+    maintain_conversation_summary(user_id, session_id, _history_after_turn(history_data, session_id, ai_response_content))
     
-    current_checklist_content = "No checklist found for the user." # Default
-    raw_checklist_for_prompt = None # Store the raw dict for prompt if needed
+    logger.info("--- Agent Turn Ended for user: %s ---", user_id)
+    return str(ai_response_content) # Ensure return is string
 
-    if isinstance(checklist_data_result, dict) and checklist_data_result.get("error"):
-        print(f"[Checklist] Error reading checklist: {checklist_data_result.get('error')}")
-        # current_checklist_content remains default
-    elif checklist_data_result is None:
-        print(f"[Checklist] No checklist found for user {user_id} (tool returned None).")
-        # current_checklist_content remains default
-    elif isinstance(checklist_data_result, dict): # Checklist data is directly the dict from JSONB
-        raw_checklist_for_prompt = checklist_data_result
-        try:
-            current_checklist_content = json.dumps(raw_checklist_for_prompt, indent=2)
-            print(f"[Checklist] Successfully read checklist. Content (first 100 chars): {current_checklist_content[:100]}...")
-        except TypeError as e:
-            print(f"[Checklist] Error serializing checklist data to JSON: {e}. Data: {raw_checklist_for_prompt}")
-            current_checklist_content = f"Error: Could not display checklist data due to formatting issue. Raw: {str(raw_checklist_for_prompt)[:200]}"
-    else: # Should not happen if tool adheres to its return types (dict for data/error, or None)
-        print(f"[Checklist] Unexpected data type from read_user_checklist: {type(checklist_data_result)}. Data: {checklist_data_result}")
-        current_checklist_content = "Error: Received unexpected checklist data format from tool."
+class AgentTurnError(Exception):
+    """Raised when a turn cannot reach the agent (e.g. the user message or history could not be loaded)."""
 
-    # 4. Define tools and create the agent
-    tools_for_agent = [write_user_checklist, delete_user_checklist] # Agent can write or delete
+# Answers to general, context-independent questions, shared by all users. The user's own turn always runs
+# with their full context; the shared answer is generated separately, from a prompt without any per-user
+# context (see _afill_answer_cache), so nothing about one user can reach another through the cache.
+answer_cache = AnswerCache()
 
-    agent_prompt = ChatPromptTemplate.from_messages([
-        ("system", INITIAL_SYSTEM_PROMPT + 
-         "\n\nConversation Summary:\n{summary_content}" +
-         "\n\nRecent Messages (excluding current user input):\n{recent_messages_formatted}" +
-         "\n\nUser's Current Checklist:\n{current_checklist_formatted}"),
-        MessagesPlaceholder(variable_name="chat_history", optional=True),
+GENERAL_ANSWER_SYSTEM_PROMPT = """You are Olivia, a friendly and helpful AI assistant for people relocating for an exchange semester or moving to a new city.
+Answer the general question below. You know nothing about the person asking it, and your answer will be shown to anyone who asks the same question, so don't assume or mention anything about their situation.
+Format your response as plain text. Do not use any markdown syntax."""
+
+# Cache fills in progress, by question key, so concurrent misses for the same question generate one answer
+_answer_cache_fills: Dict[frozenset, asyncio.Task] = {}
+
+def _build_general_answer_chain():
+    """Prompt -> main model -> text, with nothing but the question itself (no tools bound)."""
+    general_prompt = ChatPromptTemplate.from_messages([
+        ("system", GENERAL_ANSWER_SYSTEM_PROMPT),
         ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
-    
-    agent = create_openai_tools_agent(main_llm, tools_for_agent, agent_prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools_for_agent, verbose=True, handle_parsing_errors=True) # Added handle_parsing_errors
+    return general_prompt | get_main_llm() | StrOutputParser()
 
-    print(f"[Agent Call] Invoking agent with tool '{tools_for_agent[0].name}' ({MAIN_LLM_MODEL})...")
+async def _afill_answer_cache(user_message_content: str):
+    """Generates the shared answer to a general question without any per-user context and caches it."""
     try:
-        response = agent_executor.invoke({
-            "input": user_message_content,
-            "summary_content": summary_content,
-            "recent_messages_formatted": formatted_recent_messages_str,
-            "current_checklist_formatted": current_checklist_content,
-            "user_id": user_id,  # Pass user_id here so it can be used in the formatted prompt
-            "chat_history": [] 
-        })
-        ai_response_content = response.get("output")
-        if ai_response_content is None:
-            ai_response_content = "I'm sorry, I wasn't able to generate a response. (Agent output was None)"
-            print("[Agent Call] Agent returned None for 'output'.")
-        print(f"[Agent Call] Received response from agent: {str(ai_response_content)[:100]}...")
+        with time_stage("chat", "answer_cache_fill"):
+            answer = await _build_general_answer_chain().ainvoke({"input": user_message_content})
+        if answer:
+            answer_cache.store(user_message_content, answer)
     except Exception as e:
-        error_message = f"Sorry, I encountered an error trying to generate a response: {e}"
-        print(f"[Agent Call] Error invoking agent: {e}")
-        # Check if the error is a parsing error that handle_parsing_errors might have tried to address
-        if "Could not parse LLM output" in str(e) or "ActionParser" in str(e):
-            ai_response_content = "I had a little trouble processing that request. Could you try rephrasing it?"
-        else:
-            ai_response_content = error_message
-        # Still return the ai_response_content which is now an error message
+        logger.warning("[AnswerCache] Error generating the shared answer: %s", e)
 
-    # 5. Save AI response to history
-    write_ai_msg_result = write_conversation_message.invoke({
+def _schedule_answer_cache_fill(user_message_content: str):
+    """Starts _afill_answer_cache in the background unless the answer is cached or already being generated."""
+    key = question_key(user_message_content)
+    if key in _answer_cache_fills or answer_cache.contains(user_message_content):
+        return
+    # A fresh context: the fill is not part of the user's turn (its callbacks, log context or usage)
+    task = asyncio.create_task(_afill_answer_cache(user_message_content), name="answer-cache-fill", context=contextvars.Context())
+    _answer_cache_fills[key] = task
+    task.add_done_callback(lambda _: _answer_cache_fills.pop(key, None))
+
+@timed_stage("chat", "answer_cache_lookup")
+async def _alookup_cached_answer(user_message_content: str) -> Optional[str]:
+    """
+    Returns a cached answer if the message is a general question that was answered before.
+    On a miss for a general question, the shared answer is generated in the background for the next asker.
+    """
+    if not is_context_independent(user_message_content):
+        return None
+    cached_answer = answer_cache.lookup(user_message_content)
+    if cached_answer is not None:
+        logger.info("[AnswerCache] Cache hit; skipping the agent.")
+    else:
+        _schedule_answer_cache_fill(user_message_content)
+    return cached_answer
+
+@timed_stage("chat", "message_write")
+async def _asave_user_message(user_id: str, session_id: str, user_message_content: str):
+    """Saves the user message to history BEFORE calling the LLM. Raises AgentTurnError on failure."""
+    write_user_msg_result = await write_conversation_message.ainvoke({
         "user_id": user_id, "session_id": session_id,
-        "message_type": "ai", "content": str(ai_response_content) # Ensure content is string
+        "message_type": "human", "content": user_message_content
     })
-    print(f"[DB Write] AI message saved: {write_ai_msg_result}")
-    if isinstance(write_ai_msg_result, str) and (write_ai_msg_result.startswith("Error") or write_ai_msg_result.startswith("Failed") or write_ai_msg_result.startswith("An unexpected error")):
-        print(f"Warning: Error saving AI message: {write_ai_msg_result}")
+    logger.debug("[DB Write] User message saved: %s", write_user_msg_result)
+    if _is_tool_error(write_user_msg_result):
+        raise AgentTurnError(f"Error saving user message: {write_user_msg_result}")
 
-    # 6. Trigger summary maintenance
-    maintain_conversation_summary(user_id)
-    
-    print(f"--- Agent Turn Ended for user: {user_id} ---")
+async def _aprepare_agent_turn(user_id: str, session_id: str, user_message_content: str) -> Tuple[dict, dict]:
+    """
+    Saves the user message and loads everything the agent needs for this turn.
+    Returns (agent invocation inputs, history data). Raises AgentTurnError if the turn can't proceed.
+    """
+    # 1. Save user message to history BEFORE calling LLM
+    await _asave_user_message(user_id, session_id, user_message_content)
+
+    # 2 + 3. Read conversation history and the user's checklist concurrently (independent reads)
+    logger.debug("[Checklist] Reading checklist for user_id: %s", user_id)
+    history_data, checklist_data_result = await asyncio.gather(
+        atime_stage("chat", "history_read", read_conversation_history.ainvoke({
+            "user_id": user_id,
+            "session_id": session_id,
+            "max_messages": SUMMARIZER_HISTORY_WINDOW # Also reused by summary maintenance
+        })),
+        atime_stage("chat", "checklist_read", read_user_checklist.ainvoke({"user_id": user_id})),
+    )
+
+    if history_data.get("error"):
+        raise AgentTurnError(f"Error fetching conversation history: {history_data.get('error')}")
+
+    # Needs the history window (to exclude it); the embedding and first-use index load run off the loop
+    with time_stage("chat", "recall"):
+        recalled_messages = await asyncio.to_thread(_recall_earlier_messages, user_id, session_id, user_message_content, history_data)
+
+    return _build_agent_inputs(user_id, user_message_content, history_data, checklist_data_result, recalled_messages), history_data
+
+async def _afinish_agent_turn(user_id: str, session_id: str, ai_response_content: str, history_data: Optional[dict]):
+    """Saves Olivia's response and queues summary maintenance in the background."""
+    # 6. Save AI response to history
+    with time_stage("chat", "ai_message_write"):
+        write_ai_msg_result = await write_conversation_message.ainvoke({
+            "user_id": user_id, "session_id": session_id,
+            "message_type": "ai", "content": str(ai_response_content) # Ensure content is string
+        })
+    logger.debug("[DB Write] AI message saved: %s", write_ai_msg_result)
+    if _is_tool_error(write_ai_msg_result):
+        logger.warning("[DB Write] Error saving AI message: %s", write_ai_msg_result)
+
+    # 7. Queue summary maintenance in the background so the response returns as soon as the AI message is saved
+    # (it reuses this turn's history, if one was read, rather than reading it again)
+    summary_worker.schedule(user_id, session_id, _history_after_turn(history_data, session_id, ai_response_content) if history_data is not None else None)
+
+def _build_light_chain():
+    """Prompt -> light model -> text, for turns the intent router keeps away from the agent (no tools bound)."""
+    light_prompt = ChatPromptTemplate.from_messages([
+        ("system", LIGHT_SYSTEM_PROMPT),
+        ("system", LIGHT_CONTEXT_PROMPT),
+        ("human", "{input}"),
+    ])
+    return light_prompt | get_light_llm() | StrOutputParser()
+
+async def _aprepare_light_turn(user_id: str, session_id: str, user_message_content: str) -> Tuple[dict, dict]:
+    """
+    Light-tier counterpart of _aprepare_agent_turn: saves the user message and reads the history (no checklist
+    or recall). Returns (light chain inputs, history data).
+    """
+    await _asave_user_message(user_id, session_id, user_message_content)
+
+    history_data = await atime_stage("chat", "history_read", read_conversation_history.ainvoke({
+        "user_id": user_id,
+        "session_id": session_id,
+        "max_messages": SUMMARIZER_HISTORY_WINDOW # Reused by summary maintenance, as on the agent path
+    }))
+    if history_data.get("error"):
+        raise AgentTurnError(f"Error fetching conversation history: {history_data.get('error')}")
+
+    return {
+        "input": user_message_content,
+        "summary_content": format_memory_for_prompt(history_data) or "No summary available yet.",
+        "recent_messages_formatted": format_messages_for_prompt(history_data.get("messages", [])[-LIGHT_MAX_RAW_MESSAGES:])
+    }, history_data
+
+@timed_stage("chat", "turn_total")
+async def ainvoke_agent_turn(user_id: str, session_id: str, user_message_content: str) -> str:
+    """
+    Async variant of invoke_agent_turn for use from the FastAPI event loop.
+    Supabase reads/writes are awaited via the tools' `ainvoke` (which runs the blocking client off the loop),
+    the history and checklist reads are fanned out concurrently, and the agent and summarizer are awaited
+    via `ainvoke`, so a slow LLM call no longer blocks other requests on the same worker.
+    Summary maintenance is handed to the background summary_worker instead of running inline.
+    Turns for the same user are serialized (see user_locks), so each one sees the previous turn's messages.
+    Answers to general, context-independent questions are shared through answer_cache, so repeats skip the
+    agent entirely. A miss runs with the user's full context; the shared answer is generated separately,
+    without it (see _afill_answer_cache).
+    Turns the intent router classifies as simple (greetings, thanks, short standalone questions) are answered
+    by the light model (LIGHT_LLM_MODEL) in a single call, without tools or the checklist.
+    Returns Olivia's response content as a string.
+    """
+    logger.info("--- Invoking Async Agent Turn for user: %s, session: %s ---", user_id, session_id)
+    payload_logger.debug("User Message: %s", Truncated(user_message_content))
+
+    # One turn per user at a time: a double-submit waits for the first turn instead of racing it
+    async with user_turn_locks.hold(user_id):
+        # General questions answered before are served from the shared answer cache
+        cached_answer = await _alookup_cached_answer(user_message_content)
+        if cached_answer is not None:
+            try:
+                await _asave_user_message(user_id, session_id, user_message_content)
+            except AgentTurnError as e:
+                return str(e)
+            await _afinish_agent_turn(user_id, session_id, cached_answer, None)
+            logger.info("--- Async Agent Turn Ended for user: %s (cached answer) ---", user_id)
+            return cached_answer
+
+        # Greetings, thanks and short standalone questions skip the agent (see intent_router)
+        if route_turn(user_id, session_id, user_message_content).route == ROUTE_LIGHT:
+            try:
+                light_inputs, history_data = await _aprepare_light_turn(user_id, session_id, user_message_content)
+            except AgentTurnError as e:
+                return str(e)
+            logger.info("[Light Call] Invoking light model (%s)...", LIGHT_LLM_MODEL)
+            usage_recorder = PromptUsageRecorder()
+            try:
+                with time_stage("chat", "light_run"):
+                    ai_response_content = await _build_light_chain().ainvoke(light_inputs, config=turn_callbacks(usage_recorder))
+            except Exception as e:
+                ai_response_content = _agent_error_message(e)
+            prompt_cache_stats.record_turn(user_id, usage_recorder)
+            await _afinish_agent_turn(user_id, session_id, ai_response_content, history_data)
+            logger.info("--- Async Agent Turn Ended for user: %s (light tier) ---", user_id)
+            return str(ai_response_content)
+
+        try:
+            agent_inputs, history_data = await _aprepare_agent_turn(user_id, session_id, user_message_content)
+        except AgentTurnError as e:
+            return str(e)
+
+        # 4 + 5. Invoke the prebuilt agent
+        logger.info("[Agent Call] Invoking agent asynchronously (%s)...", MAIN_LLM_MODEL)
+        usage_recorder = PromptUsageRecorder()
+        try:
+            with time_stage("chat", "agent_run"):
+                response = await get_agent_executor().ainvoke(agent_inputs, config=turn_callbacks(usage_recorder))
+            ai_response_content = _extract_agent_output(response)
+        except Exception as e:
+            ai_response_content = _agent_error_message(e)
+        prompt_cache_stats.record_turn(user_id, usage_recorder)
+
+        await _afinish_agent_turn(user_id, session_id, ai_response_content, history_data)
+
+    logger.info("--- Async Agent Turn Ended for user: %s ---", user_id)
     return str(ai_response_content) # Ensure return is string
 
+async def _astream_light_turn(user_id: str, session_id: str, user_message_content: str) -> AsyncIterator[dict]:
+    """The light-tier part of astream_agent_turn (same events, never tool_start/tool_end); runs under the caller's user lock."""
+    try:
+        light_inputs, history_data = await _aprepare_light_turn(user_id, session_id, user_message_content)
+    except AgentTurnError as e:
+        yield {"event": "error", "data": {"error": str(e)}}
+        return
+
+    chunks = []
+    light_failed = False
+    usage_recorder = PromptUsageRecorder()
+    logger.info("[Light Call] Streaming light model (%s)...", LIGHT_LLM_MODEL)
+    with time_stage("chat", "light_run"): # Includes the time the client takes to read the stream
+        try:
+            async for chunk in _build_light_chain().astream(light_inputs, config=turn_callbacks(usage_recorder)):
+                if chunk:
+                    chunks.append(chunk)
+                    yield {"event": "token", "data": {"content": chunk}}
+            ai_response_content = "".join(chunks)
+        except Exception as e:
+            light_failed = True
+            ai_response_content = _agent_error_message(e)
+            yield {"event": "error", "data": {"error": ai_response_content}}
+
+    prompt_cache_stats.record_turn(user_id, usage_recorder)
+
+    await _afinish_agent_turn(user_id, session_id, ai_response_content, history_data)
+    yield {"event": "done", "data": {"ai_response": str(ai_response_content)}}
+    logger.info("--- Streaming Agent Turn Ended for user: %s (light tier) ---", user_id)
+
+@timed_stage("chat", "turn_total")
+async def astream_agent_turn(user_id: str, session_id: str, user_message_content: str) -> AsyncIterator[dict]:
+    """
+    Streaming variant of ainvoke_agent_turn.
+    Yields events as the agent runs, each a dict {"event": <name>, "data": {...}}:
+        - "token": a chunk of Olivia's reply as the LLM generates it ({"content": str})
+        - "tool_start" / "tool_end": a checklist tool call and its result ({"name", "input"} / {"name", "output"})
+        - "done": the turn finished ({"ai_response": str}); the full reply has been saved to history
+        - "error": the turn failed ({"error": str}); if the agent run itself failed, the error reply is
+          still saved to history and followed by "done"
+    The AI message is persisted and summary maintenance queued once the stream completes.
+    """
+    logger.info("--- Streaming Agent Turn for user: %s, session: %s ---", user_id, session_id)
+    payload_logger.debug("User Message: %s", Truncated(user_message_content))
+
+    async with user_turn_locks.hold(user_id): # Held until the stream completes (or the client disconnects)
+        cached_answer = await _alookup_cached_answer(user_message_content)
+        if cached_answer is not None:
+            try:
+                await _asave_user_message(user_id, session_id, user_message_content)
+            except AgentTurnError as e:
+                yield {"event": "error", "data": {"error": str(e)}}
+                return
+            await _afinish_agent_turn(user_id, session_id, cached_answer, None)
+            yield {"event": "token", "data": {"content": cached_answer}}
+            yield {"event": "done", "data": {"ai_response": cached_answer}}
+            return
+
+        if route_turn(user_id, session_id, user_message_content).route == ROUTE_LIGHT:
+            async for event in _astream_light_turn(user_id, session_id, user_message_content):
+                yield event
+            return
+
+        try:
+            agent_inputs, history_data = await _aprepare_agent_turn(user_id, session_id, user_message_content)
+        except AgentTurnError as e:
+            yield {"event": "error", "data": {"error": str(e)}}
+            return
+
+        ai_response_content = None
+        agent_failed = False
+        root_run_id = None
+        usage_recorder = PromptUsageRecorder()
+        logger.info("[Agent Call] Streaming agent events (%s)...", MAIN_LLM_MODEL)
+        with time_stage("chat", "agent_run"): # Includes the time the client takes to read the stream
+            try:
+                async for event in get_agent_executor().astream_events(agent_inputs, config=turn_callbacks(usage_recorder), version="v2"):
+                    kind = event["event"]
+                    if root_run_id is None:
+                        root_run_id = event["run_id"] # The first event is the AgentExecutor run itself
+
+                    if kind == "on_chat_model_stream":
+                        content = event["data"]["chunk"].content
+                        if content: # Chunks of tool-calling LLM steps carry tool call deltas, not text
+                            yield {"event": "token", "data": {"content": content}}
+                    elif kind == "on_tool_start":
+                        yield {"event": "tool_start", "data": {"name": event["name"], "input": event["data"].get("input")}}
+                    elif kind == "on_tool_end":
+                        yield {"event": "tool_end", "data": {"name": event["name"], "output": str(event["data"].get("output"))}}
+                    elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+                        ai_response_content = _extract_agent_output(event["data"].get("output") or {})
+            except Exception as e:
+                agent_failed = True
+                ai_response_content = _agent_error_message(e)
+                yield {"event": "error", "data": {"error": ai_response_content}}
+
+        if ai_response_content is None:
+            agent_failed = True
+            ai_response_content = _extract_agent_output({})
+        prompt_cache_stats.record_turn(user_id, usage_recorder)
+
+        await _afinish_agent_turn(user_id, session_id, ai_response_content, history_data)
+        yield {"event": "done", "data": {"ai_response": str(ai_response_content)}}
+    logger.info("--- Streaming Agent Turn Ended for user: %s ---", user_id)
+
 def run_test_conversation_flow(user_id: str, session_id: str, turns: list):
     """Simulates a conversation, writes messages to DB, and calls summary maintenance."""
     print(f"\n--- Starting Test Conversation Flow for user: {user_id}, session: {session_id} ---")
@@ -354,10 +940,12 @@ def run_test_conversation_flow(user_id: str, session_id: str, turns: list):
         print(f"[DB Write] AI message saved: {write_msg_result}")
         
         # 4. Maintain summary after each AI response (i.e., after a full turn)
-        maintain_conversation_summary(user_id)
+        maintain_conversation_summary(user_id, session_id)
     
     print(f"\n--- Test Conversation Flow Ended for user: {user_id} ---")
 
+# Manual, sequential run against the live services. For concurrent, repeatable runs with a latency, token
+# and tool-call report (live or offline), see evals/run_evals.py and the scripts in evals/conversations/.
 if __name__ == '__main__':
     print("Agent.py - Main test execution block")
     
@@ -494,6 +1082,7 @@ if __name__ == '__main__':
     print(f"\n[Final Check] Fetching agent context for {test_agent_user_id} after Phase 2 tests...")
     final_history_for_agent = read_conversation_history.invoke({
        "user_id": test_agent_user_id,
+       "session_id": test_agent_session_id,
        "max_messages": MAIN_AGENT_MAX_RAW_MESSAGES, 
     })
     final_agent_summary = final_history_for_agent.get("summary")
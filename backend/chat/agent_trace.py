@@ -0,0 +1,43 @@
+# Step-by-step trace of agent runs through the logger, replacing AgentExecutor(verbose=True) stdout printing.
+# Records go to the "chat.agent.trace" logger at DEBUG, so the trace costs nothing unless that logger is enabled
+# (OLIVIA_AGENT_VERBOSE=true, or OLIVIA_LOG_LEVELS="chat.agent.trace=DEBUG").
+import logging
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app_logging import Truncated, get_logger
+
+trace_logger = get_logger("chat.agent.trace")
+
+
+def agent_trace_enabled() -> bool:
+    return trace_logger.isEnabledFor(logging.DEBUG)
+
+
+class AgentTraceLogger(BaseCallbackHandler):
+    """Logs the agent's tool calls, tool results and final answer. Pass it in `config={"callbacks": [...]}`."""
+
+    run_inline = True # Only enqueues log records
+
+    def on_agent_action(self, action: AgentAction, *, run_id: UUID, **kwargs: Any) -> None:
+        trace_logger.debug("[AgentTrace] Invoking tool %s with %s", action.tool, Truncated(action.tool_input), extra={"run_id": str(run_id)})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        trace_logger.debug("[AgentTrace] Tool result: %s", Truncated(getattr(output, "content", output)), extra={"run_id": str(run_id)})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        trace_logger.debug("[AgentTrace] Tool error: %r", error, extra={"run_id": str(run_id)})
+
+    def on_agent_finish(self, finish: AgentFinish, *, run_id: UUID, **kwargs: Any) -> None:
+        trace_logger.debug("[AgentTrace] Finished: %s", Truncated(finish.return_values.get("output")), extra={"run_id": str(run_id)})
+
+
+agent_trace_logger = AgentTraceLogger()
+
+
+def turn_callbacks(*callbacks: BaseCallbackHandler) -> Dict[str, Any]:
+    """Run config for an agent turn: the given callbacks plus the trace logger when tracing is enabled."""
+    return {"callbacks": [*callbacks, agent_trace_logger] if agent_trace_enabled() else list(callbacks)}
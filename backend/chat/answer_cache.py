@@ -0,0 +1,111 @@
+# Shared cache of Olivia's answers to general, context-independent relocation questions
+# (e.g. "how to find student housing in Amsterdam"), so repeated FAQ-style questions skip the agent.
+# The cache is shared by all users, so only answers generated from a prompt without any per-user context
+# may be stored (see agent._afill_answer_cache).
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+ANSWER_CACHE_MAX_ENTRIES = 1000
+# Answers may go stale (deadlines, fees, office procedures), so they expire
+ANSWER_CACHE_TTL_SECONDS = 6 * 3600
+# Shorter questions are usually follow-ups that depend on the conversation ("and in Munich?")
+ANSWER_CACHE_MIN_WORDS = 4
+
+_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+# Words that tie a question to the user's own situation, checklist or the conversation so far
+_CONTEXT_WORDS = frozenset(
+    "i im ive id am my mine myself our ours we us me checklist list item items task tasks add remove delete mark uncheck "
+    "update remind remember earlier previous previously before said told again it that this these those "
+    "there them they he she his her".split()
+)
+_FOLLOW_UP_OPENERS = frozenset("and also so then but or ok okay what's whats".split())
+# Words that don't change what a question asks; everything else (places, nationalities, "non", "not",
+# question words, prepositions) must be identical for two questions to share an answer
+_FILLER_WORDS = frozenset("a an the please some do does is are".split())
+
+
+def normalize_question(text: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def is_context_independent(question: str) -> bool:
+    """
+    Heuristic: True if the question reads as a general relocation question whose answer doesn't depend
+    on who asks it (no references to the user, their checklist, or earlier messages; not a follow-up).
+    """
+    words = normalize_question(question).split()
+    if len(words) < ANSWER_CACHE_MIN_WORDS:
+        return False
+    if words[0] in _FOLLOW_UP_OPENERS or " ".join(words[:2]) in ("what about", "how about"):
+        return False
+    return not any(word in _CONTEXT_WORDS for word in words)
+
+
+def question_key(question: str) -> frozenset:
+    """
+    Cache key of a question: its content words. Questions that differ only in filler words, punctuation,
+    case or word order share a key; "an EU student" and "a non-EU student", or Berlin and Munich, don't.
+    """
+    return frozenset(word for word in normalize_question(question).split() if word not in _FILLER_WORDS)
+
+
+class _Entry:
+    __slots__ = ("answer", "expires_at")
+
+    def __init__(self, answer: str, expires_at: float):
+        self.answer = answer
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    LRU cache with a TTL from a question's content words (see question_key) to its answer, shared by all users.
+    Only answers produced without any per-user context belong here (see agent.py). Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[frozenset, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, question: str) -> Optional[str]:
+        key = question_key(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.answer
+
+    def contains(self, question: str) -> bool:
+        """True if an unexpired answer is cached for the question. Doesn't count as a lookup."""
+        with self._lock:
+            entry = self._entries.get(question_key(question))
+            return entry is not None and entry.expires_at >= time.monotonic()
+
+    def store(self, question: str, answer: str):
+        key = question_key(question)
+        with self._lock:
+            self._entries[key] = _Entry(answer, time.monotonic() + self._ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,9 +1,15 @@
 # This file will define the FastAPI router for the chat endpoint.
+import json
 from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
 
 from .schemas import ChatRequest, ChatResponse
-from .agent import invoke_agent_turn # Assuming agent.py is in the same directory
+from .agent import ainvoke_agent_turn, astream_agent_turn # Assuming agent.py is in the same directory
+from metrics import requests_total
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
@@ -12,16 +18,17 @@ async def handle_chat_endpoint(request: ChatRequest):
     """
     Handles a single turn of conversation with Olivia.
     """
-    print(f"[ChatRouter] Received chat request for user_id: {request.user_id}, session_id: {request.session_id}")
+    logger.info("[ChatRouter] Received chat request for user_id: %s, session_id: %s", request.user_id, request.session_id)
     try:
-        ai_message_content = invoke_agent_turn(
+        # Await the async turn so a slow LLM call doesn't block other requests on this worker
+        ai_message_content = await ainvoke_agent_turn(
             user_id=request.user_id,
             session_id=request.session_id,
             user_message_content=request.message
         )
         
         if ai_message_content is None:
-            print(f"[ChatRouter] Agent returned None for user_id: {request.user_id}")
+            logger.error("[ChatRouter] Agent returned None for user_id: %s", request.user_id)
             raise HTTPException(status_code=500, detail="Agent returned an empty response.")
 
         # Basic check for error messages from the agent
@@ -29,14 +36,16 @@ async def handle_chat_endpoint(request: ChatRequest):
             ai_message_content.startswith("Error:") or 
             ai_message_content.startswith("Sorry, I encountered an error") # Check for common error prefixes
         ):
-            print(f"[ChatRouter] Agent returned an error message: {ai_message_content}")
+            logger.error("[ChatRouter] Agent returned an error message: %s", ai_message_content)
+            requests_total.inc("chat", "agent_error")
             return ChatResponse(
                 user_id=request.user_id,
                 session_id=request.session_id,
                 error=ai_message_content
             )
             
-        print(f"[ChatRouter] Successfully processed chat for user_id: {request.user_id}. AI response length: {len(ai_message_content)}")
+        logger.info("[ChatRouter] Successfully processed chat for user_id: %s. AI response length: %s", request.user_id, len(ai_message_content))
+        requests_total.inc("chat", "ok")
         return ChatResponse(
             user_id=request.user_id,
             session_id=request.session_id,
@@ -44,10 +53,46 @@ async def handle_chat_endpoint(request: ChatRequest):
         )
 
     except HTTPException as http_exc:
-        print(f"[ChatRouter] HTTPException for user_id: {request.user_id}: {http_exc.detail}")
+        logger.warning("[ChatRouter] HTTPException for user_id: %s: %s", request.user_id, http_exc.detail)
+        requests_total.inc("chat", "error")
         raise http_exc
     except Exception as e:
-        print(f"[ChatRouter] Error processing chat for user_id: {request.user_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"An internal error occurred in chat router: {str(e)}") 
\ No newline at end of file
+        logger.exception("[ChatRouter] Error processing chat for user_id: %s: %s", request.user_id, e)
+        requests_total.inc("chat", "error")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred in chat router: {str(e)}")
+
+def _format_sse(event: str, data: dict) -> str:
+    """Encodes one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream")
+async def handle_chat_stream_endpoint(request: ChatRequest):
+    """
+    Handles a single turn of conversation with Olivia, streaming the reply as server-sent events.
+    Emits `token`, `tool_start`, `tool_end`, `error` and a final `done` event carrying the full reply.
+    """
+    logger.info("[ChatRouter] Received streaming chat request for user_id: %s, session_id: %s", request.user_id, request.session_id)
+
+    async def event_stream() -> AsyncIterator[str]:
+        outcome = "ok"
+        try:
+            async for turn_event in astream_agent_turn(
+                user_id=request.user_id,
+                session_id=request.session_id,
+                user_message_content=request.message
+            ):
+                if turn_event["event"] == "error":
+                    outcome = "agent_error"
+                yield _format_sse(turn_event["event"], turn_event["data"])
+        except Exception as e:
+            outcome = "error"
+            logger.error("[ChatRouter] Error streaming chat for user_id: %s: %s", request.user_id, e)
+            yield _format_sse("error", {"error": f"An internal error occurred in chat router: {str(e)}"})
+        finally:
+            requests_total.inc("chat_stream", outcome)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Keep proxies from buffering the stream
+    )
@@ -0,0 +1,86 @@
+# Process-local cache of user checklists, keyed on the `version` column of user_checklists.
+# Checklists change rarely, so most chat turns can skip the checklist query entirely.
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CHECKLIST_CACHE_MAX_USERS = 2048
+# Bounds how long a change made by another process can go unseen (its writes still can't be
+# overwritten: whole-checklist writes are compare-and-swap on the version)
+CHECKLIST_CACHE_TTL_SECONDS = 60
+
+# Version reported for a user who has no checklist row yet
+NO_CHECKLIST_VERSION = 0
+
+
+class ChecklistCache:
+    """
+    LRU cache with a TTL mapping user_id -> (checklist_data, version).
+    Writes in this process update the entry with the version the database returned, and item-level
+    patches are applied in place only when they are the direct successor of the cached version;
+    anything else invalidates the entry. Thread-safe (the tools run in worker threads).
+    """
+
+    def __init__(self, max_users: int = CHECKLIST_CACHE_MAX_USERS, ttl_seconds: float = CHECKLIST_CACHE_TTL_SECONDS):
+        self._max_users = max_users
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Returns (checklist_data, version) or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return copy.deepcopy(entry[0]), entry[1]
+
+    def put(self, user_id: str, checklist_data: Dict[str, Any], version: int):
+        """Stores a checklist read from or written to the database. Never replaces a newer version."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > version:
+                return
+            self._entries[user_id] = (copy.deepcopy(checklist_data), version, time.monotonic() + self._ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_users:
+                self._entries.popitem(last=False)
+
+    def apply_item_patch(self, user_id: str, item: Dict[str, Any], new_version: int):
+        """Applies an added/updated item to the cached checklist if it directly follows the cached version."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            checklist_data, version, expires_at = entry
+            if new_version != version + 1:
+                del self._entries[user_id] # Missed a write in between; re-read next time
+                return
+            items = list(checklist_data.get("items", []))
+            for index, existing in enumerate(items):
+                if existing.get("id") == item.get("id"):
+                    items[index] = copy.deepcopy(item)
+                    break
+            else:
+                items.append(copy.deepcopy(item))
+            self._entries[user_id] = ({**checklist_data, "items": items}, new_version, expires_at)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+checklist_cache = ChecklistCache()
@@ -0,0 +1,221 @@
+# Token-budgeted assembly of the per-turn context sections of Olivia's prompt
+# (conversation summary, recent messages and the user's checklist).
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Total tokens the three context sections may use together. Override with OLIVIA_CONTEXT_TOKEN_BUDGET.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("OLIVIA_CONTEXT_TOKEN_BUDGET", "3000"))
+# The summary is filled first but may not take more than this, so recent messages always get room
+CONTEXT_SUMMARY_MAX_TOKENS = 800
+# Kept free for the checklist while recent messages are filled
+CONTEXT_CHECKLIST_RESERVE_TOKENS = 400
+# Upper bound for the recalled older messages (see recall.py)
+CONTEXT_RECALL_MAX_TOKENS = 300
+# Tokenizer used when tiktoken has no entry for the model name
+FALLBACK_ENCODING = "o200k_base"
+
+# Loaded tiktoken encodings by encoding name, and the encoding name of each model seen so far.
+# Loading an encoding may download its file, so warm_up.py loads those of the configured models at start-up.
+_encodings: Dict[str, Any] = {}
+_model_encoding_names: Dict[str, str] = {}
+_encodings_lock = threading.Lock() # Held while an encoding loads
+_encodings_loading: Set[str] = set() # Being loaded in the background for a call on the event loop
+_encodings_loading_lock = threading.Lock()
+
+
+def _encoding_name(model: str) -> str:
+    """tiktoken's encoding name for `model` (a table lookup, no I/O), or FALLBACK_ENCODING for unknown models."""
+    if model not in _model_encoding_names:
+        try:
+            import tiktoken # Installed with langchain-openai
+            _model_encoding_names[model] = tiktoken.encoding_name_for_model(model)
+        except Exception: # Unknown model, or tiktoken not installed (then _get_encoding gives up too)
+            _model_encoding_names[model] = FALLBACK_ENCODING
+    return _model_encoding_names[model]
+
+
+def _load_encoding(name: str):
+    with _encodings_lock: # Concurrent first uses load (and possibly download) the file once
+        if name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e: # Not installed, or the encoding file could not be loaded
+                logger.warning("[ContextAssembler] tiktoken unavailable (%s); estimating tokens as characters / 4.", e)
+                _encodings[name] = None
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _get_encoding(model: str):
+    """
+    Returns the tiktoken encoding for `model`, or None if tiktoken is unavailable. Models sharing an encoding
+    share one load. An encoding the warm-up didn't load is never loaded on the event loop: it is loaded in a
+    background thread, and counts are approximated (characters / 4) until it is there.
+    """
+    name = _encoding_name(model)
+    if name in _encodings:
+        return _encodings[name]
+    if not _on_event_loop():
+        _load_encoding(name)
+        return _encodings[name]
+    with _encodings_loading_lock: # Never wait for a load on the event loop
+        if name not in _encodings_loading:
+            _encodings_loading.add(name)
+            threading.Thread(target=_load_encoding, args=(name,), name=f"tiktoken-{name}", daemon=True).start()
+    return None
+
+
+def load_encodings(models: Iterable[str]):
+    """Loads the encodings of `models` ahead of their first use (blocking; see warm_up.py)."""
+    for model in models:
+        _get_encoding(model)
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Counts the tokens `text` takes for `model`, approximating when no local tokenizer is available."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o", keep: str = "end") -> str:
+    """Cuts `text` down to `max_tokens`, keeping its end (most recent part) or its start."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        max_chars = max_tokens * 4 - 3 # Room for the "..." marker
+        return "..." + text[-max_chars:] if keep == "end" else text[:max_chars] + "..."
+    tokens = encoding.encode(text)
+    if keep == "end":
+        return "..." + encoding.decode(tokens[-max_tokens:])
+    return encoding.decode(tokens[:max_tokens]) + "..."
+
+
+def format_message_line(msg: Dict[str, Any]) -> str:
+    return f"{msg.get('message_type', 'unknown').capitalize()}: {msg.get('content', '')}"
+
+
+def format_checklist_item_line(item: Dict[str, Any]) -> str:
+    """One checklist item per line: `[x] <id> | <category> | <description>` (timestamps are left out)."""
+    mark = "x" if item.get("is_checked") else " "
+    return f"[{mark}] {item.get('id', '?')} | {item.get('category', '')} | {item.get('description', '')}"
+
+
+def _assemble_checklist(checklist: Union[Dict[str, Any], str], budget: int, model: str) -> Dict[str, Any]:
+    if isinstance(checklist, str): # No checklist, or the read failed; the caller passes the text to show
+        return {"text": checklist, "items_included": 0, "items_total": 0}
+
+    items = [item for item in checklist.get("items", []) if isinstance(item, dict)]
+    done = sum(1 for item in items if item.get("is_checked"))
+    header = f"Version {checklist.get('version', 0)}, {len(items)} items ({done} done). Format: [x] = done, [ ] = open; id | category | description"
+    if not items:
+        header = f"Version {checklist.get('version', 0)}, no items yet."
+
+    lines = [header]
+    used = count_tokens(header, model)
+    included = 0
+    for item in items:
+        line = format_checklist_item_line(item)
+        line_tokens = count_tokens(line, model) + 1 # + newline
+        if used + line_tokens > budget:
+            break
+        lines.append(line)
+        used += line_tokens
+        included += 1
+    if included < len(items):
+        # The agent must not rewrite the whole checklist from a partial view
+        lines.append(f"... {len(items) - included} more items not shown. Do not use write_user_checklist; use the single-item tools.")
+    return {"text": "\n".join(lines), "items_included": included, "items_total": len(items)}
+
+
+def assemble_context(summary: Optional[str], messages: List[Dict[str, Any]], checklist: Union[Dict[str, Any], str],
+                     budget: int = CONTEXT_TOKEN_BUDGET, max_messages: Optional[int] = None, model: str = "gpt-4o",
+                     recalled_lines: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Fills `budget` tokens with the context sections in priority order:
+    1. the conversation summary (capped at CONTEXT_SUMMARY_MAX_TOKENS, keeping its most recent part),
+    2. recent messages, newest first, until the budget minus the checklist reserve is used,
+    3. recalled older messages (`recalled_lines`, best match first), up to CONTEXT_RECALL_MAX_TOKENS,
+    4. the checklist in a compact one-line-per-item encoding, with whatever budget is left.
+    `messages` is chronological; at most `max_messages` of the newest are considered.
+    `checklist` is the read_user_checklist result ({"items": [...], "version": n}), or the text to show instead.
+    Returns the formatted sections plus per-section token counts under "token_counts".
+    """
+    summary_text = summary or "No summary available yet."
+    summary_text = truncate_to_tokens(summary_text, min(CONTEXT_SUMMARY_MAX_TOKENS, budget), model)
+    summary_tokens = count_tokens(summary_text, model)
+    remaining = budget - summary_tokens
+
+    candidates = messages[-max_messages:] if max_messages else list(messages)
+    message_budget = max(remaining - CONTEXT_CHECKLIST_RESERVE_TOKENS, 0)
+    selected: List[str] = []
+    message_tokens = 0
+    for msg in reversed(candidates):
+        line = format_message_line(msg)
+        line_tokens = count_tokens(line, model) + 1 # + newline
+        if message_tokens + line_tokens > message_budget:
+            if not selected and message_budget > 0:
+                # Always show the newest message, shortened if it alone is over budget
+                line = truncate_to_tokens(line, message_budget - 1, model, keep="start")
+                selected.append(line)
+                message_tokens += count_tokens(line, model) + 1
+            break
+        selected.append(line)
+        message_tokens += line_tokens
+    selected.reverse()
+    messages_text = "\n".join(selected) if selected else "No messages to format."
+    remaining -= message_tokens
+
+    recall_budget = min(CONTEXT_RECALL_MAX_TOKENS, max(remaining - CONTEXT_CHECKLIST_RESERVE_TOKENS, 0))
+    recalled: List[str] = []
+    recall_tokens = 0
+    for line in recalled_lines or []:
+        line_tokens = count_tokens(line, model) + 1
+        if recall_tokens + line_tokens > recall_budget:
+            break
+        recalled.append(line)
+        recall_tokens += line_tokens
+    recalled_text = "\n".join(recalled) if recalled else "None."
+    remaining -= recall_tokens
+
+    checklist_section = _assemble_checklist(checklist, max(remaining, 0), model)
+    checklist_tokens = count_tokens(checklist_section["text"], model)
+
+    return {
+        "summary_content": summary_text,
+        "recent_messages_formatted": messages_text,
+        "recalled_messages_formatted": recalled_text,
+        "messages_recalled": len(recalled),
+        "current_checklist_formatted": checklist_section["text"],
+        "messages_included": len(selected),
+        "messages_available": len(candidates),
+        "checklist_items_included": checklist_section["items_included"],
+        "checklist_items_total": checklist_section["items_total"],
+        "token_counts": {
+            "summary": summary_tokens,
+            "messages": message_tokens,
+            "recalled": recall_tokens,
+            "checklist": checklist_tokens,
+            "total": summary_tokens + message_tokens + recall_tokens + checklist_tokens,
+            "budget": budget,
+        },
+    }
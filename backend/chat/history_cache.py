@@ -0,0 +1,163 @@
+# In-process, write-through cache of each session's conversation context (synopsis, chunk summaries + post-summary messages).
+# Supabase stays the system of record; this only saves the repeated history reads made on every chat turn.
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Maximum number of (user, session) contexts kept in memory (least recently used are evicted first)
+CONVERSATION_CACHE_MAX_SESSIONS = 1024
+# Entries expire after this long, which bounds staleness if another process writes to the same session
+CONVERSATION_CACHE_TTL_SECONDS = 120
+# Newest post-summary messages kept per session. Must cover the summarizer's window (45) to serve its reads too.
+CONVERSATION_CACHE_MAX_MESSAGES = 64
+
+
+class _CacheEntry:
+    __slots__ = ("summary", "summary_timestamp", "chunk_summaries", "messages", "complete", "expires_at")
+
+    def __init__(self, summary: Optional[str], summary_timestamp: Optional[str], chunk_summaries: List[Dict[str, Any]], messages: List[Dict[str, Any]], complete: bool, expires_at: float):
+        self.summary = summary
+        self.summary_timestamp = summary_timestamp # Messages up to here are covered by the summaries
+        self.chunk_summaries = chunk_summaries # Chronological, all newer than the synopsis
+        self.messages = messages # Chronological (oldest first)
+        self.complete = complete # True if `messages` holds *every* message newer than the summary
+        self.expires_at = expires_at
+
+
+class ConversationCache:
+    """
+    LRU cache with a TTL holding, per (user_id, session_id), the synopsis, the chunk summaries after it and the window of
+    messages newer than both. Filled by read_conversation_history on a miss and kept current by
+    write_conversation_message, write_chunk_summary and write_conversation_summary, so most turns read
+    their context from memory.
+    Thread-safe: the Supabase tools run in worker threads when invoked with `ainvoke`.
+    """
+
+    def __init__(self, max_sessions: int = CONVERSATION_CACHE_MAX_SESSIONS, ttl_seconds: float = CONVERSATION_CACHE_TTL_SECONDS, max_messages: int = CONVERSATION_CACHE_MAX_MESSAGES):
+        self._max_sessions = max_sessions
+        self._ttl_seconds = ttl_seconds
+        self._max_messages = max_messages
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        # Per-session write counters, used to discard database reads that raced with a write
+        self._write_seqs: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, session_id: str, max_messages: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns the history of the session in the read_conversation_history format, or None on a miss.
+        A hit requires an unexpired entry holding at least `max_messages` messages (or all of them).
+        """
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            if not entry.complete and len(entry.messages) < max_messages:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {
+                "summary": entry.summary,
+                "summary_timestamp": entry.summary_timestamp,
+                "chunk_summaries": [dict(chunk) for chunk in entry.chunk_summaries],
+                "messages": [dict(msg) for msg in entry.messages[-max_messages:]] if max_messages > 0 else [],
+            }
+
+    def begin_read(self, user_id: str, session_id: str) -> int:
+        """Returns a token to pass to `put` so a database read that overlapped a write isn't cached."""
+        key = (user_id, session_id)
+        with self._lock:
+            return self._write_seqs.get(key, 0)
+
+    def put(self, user_id: str, session_id: str, history: Dict[str, Any], max_messages: int, read_token: int):
+        """Caches the result of a database read made with limit `max_messages`."""
+        messages = history.get("messages", [])
+        key = (user_id, session_id)
+        with self._lock:
+            if self._write_seqs.get(key, 0) != read_token:
+                return # A write landed while we were reading; the next read will repopulate
+            self._entries[key] = _CacheEntry(
+                summary=history.get("summary"),
+                summary_timestamp=history.get("summary_timestamp"),
+                chunk_summaries=[dict(chunk) for chunk in history.get("chunk_summaries") or []],
+                messages=[dict(msg) for msg in messages[-self._max_messages:]],
+                complete=len(messages) < max_messages and len(messages) <= self._max_messages,
+                expires_at=time.monotonic() + self._ttl_seconds,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_sessions:
+                self._entries.popitem(last=False)
+
+    def append_message(self, user_id: str, session_id: str, message_row: Dict[str, Any]):
+        """Write-through for a newly inserted message row."""
+        key = (user_id, session_id)
+        with self._lock:
+            self._bump_write_seq(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.messages.append(dict(message_row))
+            entry.messages.sort(key=lambda x: x.get("timestamp") or "")
+            if len(entry.messages) > self._max_messages:
+                del entry.messages[:-self._max_messages]
+                entry.complete = False
+
+    def set_summary(self, user_id: str, session_id: str, summary_content: str, summary_timestamp: Optional[str]):
+        """Write-through for a newly inserted synopsis: chunk summaries and messages it covers drop out."""
+        key = (user_id, session_id)
+        with self._lock:
+            self._bump_write_seq(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if not summary_timestamp:
+                del self._entries[key] # Can't place the summary in the timeline; re-read next time
+                return
+            entry.summary = summary_content
+            entry.chunk_summaries = [chunk for chunk in entry.chunk_summaries if (chunk.get("timestamp") or "") > summary_timestamp]
+            self._advance_watermark(entry, max([summary_timestamp] + [chunk["timestamp"] for chunk in entry.chunk_summaries]))
+
+    def add_chunk_summary(self, user_id: str, session_id: str, chunk_row: Dict[str, Any]):
+        """Write-through for a newly inserted chunk summary: the messages it covers drop out of the window."""
+        key = (user_id, session_id)
+        with self._lock:
+            self._bump_write_seq(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.chunk_summaries.append(dict(chunk_row))
+            entry.chunk_summaries.sort(key=lambda x: x.get("timestamp") or "")
+            self._advance_watermark(entry, max(entry.summary_timestamp or "", chunk_row["timestamp"]))
+
+    @staticmethod
+    def _advance_watermark(entry: _CacheEntry, summary_timestamp: str):
+        entry.summary_timestamp = summary_timestamp
+        entry.messages = [msg for msg in entry.messages if (msg.get("timestamp") or "") > summary_timestamp]
+
+    def invalidate(self, user_id: str, session_id: str):
+        key = (user_id, session_id)
+        with self._lock:
+            self._bump_write_seq(key)
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._bump_write_seq(key)
+            self._entries.clear()
+
+    def _bump_write_seq(self, key: Tuple[str, str]):
+        self._write_seqs[key] = self._write_seqs.get(key, 0) + 1
+        self._write_seqs.move_to_end(key)
+        while len(self._write_seqs) > self._max_sessions * 2:
+            self._write_seqs.popitem(last=False)
+
+
+conversation_cache = ConversationCache()
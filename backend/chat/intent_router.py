@@ -0,0 +1,100 @@
+# Rule-based intent router in front of the agent. Simple turns (greetings, thanks, one-line questions) are
+# answered by a smaller model without the tool-calling agent loop (see agent.py); checklist edits, planning
+# requests, questions about the user themselves or their progress, references to earlier conversation and
+# anything longer or multi-part go to the full agent.
+# When in doubt the router picks the agent, which can do everything the light path can.
+import os
+import re
+from typing import NamedTuple
+
+from app_logging import Truncated, get_logger, get_payload_logger
+from metrics import registry
+from .answer_cache import normalize_question
+
+logger = get_logger(__name__)
+payload_logger = get_payload_logger(__name__)
+
+# Set OLIVIA_INTENT_ROUTER=false to send every turn to the agent
+INTENT_ROUTER_ENABLED = os.getenv("OLIVIA_INTENT_ROUTER", "true").lower() in ("1", "true", "yes")
+# Longer messages usually carry enough detail to deserve the agent
+LIGHT_MAX_WORDS = 20
+SMALL_TALK_MAX_WORDS = 8
+
+ROUTE_LIGHT = "light"
+ROUTE_AGENT = "agent"
+
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)")
+_SMALL_TALK_WORDS = frozenset(
+    "hi hello hey hiya yo olivia good morning afternoon evening night thanks thank you thx ty cheers much so very "
+    "a lot ok okay k cool great perfect awesome nice amazing lovely sounds got it alright sure yes yeah yep no nope "
+    "bye goodbye see later soon talk to have day haha lol that that's thats really helps helped helpful".split()
+)
+# Words that need the checklist tools or a multi-step answer
+_PLANNING_WORDS = frozenset(
+    "checklist list item items task tasks todo to-do add remove delete mark check uncheck tick untick update rename "
+    "plan planning schedule timeline itinerary budget organize organise prepare steps".split()
+)
+_PLANNING_PHRASES = ("help me", "step by step", "make a", "create a", "put on")
+# References to earlier conversation, which the agent answers with the full history and recall
+_MEMORY_WORDS = frozenset("remind remember earlier previous previously said told mentioned".split())
+_MEMORY_PHRASES = ("what did", "we talked")
+# Anything the user asks about themselves ("What is my next step?", "Did I get my visa appointment yet?") and
+# first-person progress updates ("I still need to book the hotel") depend on their checklist and history,
+# which only the agent sees
+_FIRST_PERSON_WORDS = frozenset("i im ive me my mine myself".split())
+_STATUS_WORDS = frozenset(
+    "booked book done finished completed complete registered register left still need needed already yet missing "
+    "forgot forgotten status ready sorted".split()
+)
+_QUESTION_OPENERS = frozenset(
+    "what what's whats how when where which who why is are am can could do does did should would will was were "
+    "have has may shall any anything tell explain".split()
+)
+
+
+class RouteDecision(NamedTuple):
+    route: str # ROUTE_LIGHT or ROUTE_AGENT
+    reason: str # Short label, e.g. "small_talk" or "checklist_or_planning"
+
+
+routing_decisions_total = registry.counter(
+    "olivia_routing_decisions_total", "Chat turns by the model tier the intent router sent them to, and why.", ("route", "reason"))
+
+
+def classify_turn(message: str) -> RouteDecision:
+    """Decides whether a turn can skip the agent. Pure function of the message text."""
+    if not INTENT_ROUTER_ENABLED:
+        return RouteDecision(ROUTE_AGENT, "router_disabled")
+    words = normalize_question(message).split()
+    if not words:
+        return RouteDecision(ROUTE_AGENT, "empty")
+    if len(words) <= SMALL_TALK_MAX_WORDS and all(word in _SMALL_TALK_WORDS for word in words):
+        return RouteDecision(ROUTE_LIGHT, "small_talk")
+    text = " ".join(words)
+    if any(word in _PLANNING_WORDS for word in words) or any(phrase in text for phrase in _PLANNING_PHRASES):
+        return RouteDecision(ROUTE_AGENT, "checklist_or_planning")
+    if any(word in _MEMORY_WORDS for word in words) or any(phrase in text for phrase in _MEMORY_PHRASES):
+        return RouteDecision(ROUTE_AGENT, "memory_reference")
+    is_question = words[0] in _QUESTION_OPENERS or message.strip().endswith("?")
+    if any(word in _FIRST_PERSON_WORDS for word in words):
+        if any(word in _STATUS_WORDS for word in words):
+            return RouteDecision(ROUTE_AGENT, "personal_status")
+        if is_question:
+            return RouteDecision(ROUTE_AGENT, "personal_question")
+    if len(words) > LIGHT_MAX_WORDS:
+        return RouteDecision(ROUTE_AGENT, "long_message")
+    if len(_SENTENCE_END.findall(message.strip())) > 1:
+        return RouteDecision(ROUTE_AGENT, "multi_part")
+    if is_question:
+        return RouteDecision(ROUTE_LIGHT, "short_question")
+    return RouteDecision(ROUTE_AGENT, "statement")
+
+
+def route_turn(user_id: str, session_id: str, message: str) -> RouteDecision:
+    """classify_turn, with the decision counted and logged for later review (the message text only in payload logs)."""
+    decision = classify_turn(message)
+    routing_decisions_total.inc(decision.route, decision.reason)
+    logger.info("[IntentRouter] Routed turn for user_id %s, session_id %s to %s (%s).", user_id, session_id, decision.route, decision.reason,
+                extra={"route": decision.route, "reason": decision.reason})
+    payload_logger.debug("[IntentRouter] %s (%s): %s", decision.route, decision.reason, Truncated(message))
+    return decision
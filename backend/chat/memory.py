@@ -0,0 +1,139 @@
+# Tiered conversation memory: recent raw messages -> chunk summaries -> one capped synopsis.
+# This module decides what to fold next and builds the summarizer prompts; the LLM calls and
+# writes are made by the summary maintenance functions in agent.py.
+#
+# - Once more than MAIN_AGENT_MAX_RAW_MESSAGES raw messages are newer than the latest summary, the oldest
+#   SUMMARIZE_BATCH_SIZE of them are summarized on their own into a chunk summary ('ai_chunk_summary').
+# - Once more than MEMORY_MAX_CHUNK_SUMMARIES chunk summaries are newer than the synopsis, all but the
+#   newest MEMORY_CHUNKS_KEPT_AFTER_MERGE are merged into the synopsis ('ai_summary'). A synopsis over
+#   SYNOPSIS_MAX_TOKENS is re-compacted. Superseded summary rows are pruned when the synopsis is written.
+# Every summarizer prompt therefore has a bounded size, and so does the memory shown to the agent.
+from typing import Any, Dict, Optional, Tuple
+
+from .context_assembler import count_tokens, format_message_line
+
+# Chunk summaries kept verbatim (newer than the synopsis) before merging into the synopsis
+MEMORY_MAX_CHUNK_SUMMARIES = 4
+# Newest chunk summaries left unmerged when merging, so the agent keeps some mid-range detail
+MEMORY_CHUNKS_KEPT_AFTER_MERGE = 1
+# Target size of a chunk summary, in words (asked of the summarizer)
+CHUNK_SUMMARY_MAX_WORDS = 80
+# Hard cap on the synopsis; a longer one is re-compacted before being stored
+SYNOPSIS_MAX_TOKENS = 500
+
+NO_SUMMARY_TEXT = "This is the beginning of the conversation."
+
+
+def format_memory_for_prompt(history: Dict[str, Any]) -> Optional[str]:
+    """Renders the synopsis and the chunk summaries after it as the agent's conversation summary, or None if there are none."""
+    synopsis = history.get("summary")
+    chunks = [chunk.get("content", "") for chunk in history.get("chunk_summaries") or []]
+    if not chunks:
+        return synopsis
+    recent = "\n".join(f"- {chunk}" for chunk in chunks)
+    if not synopsis:
+        return f"Earlier in this conversation:\n{recent}"
+    return f"{synopsis}\n\nSince then:\n{recent}"
+
+
+def plan_chunk_fold(history: Dict[str, Any], max_raw_messages: int, batch_size: int) -> Optional[Tuple[str, str, int]]:
+    """
+    Returns (prompt, covers_until, folded_message_count) for summarizing the oldest raw messages into a
+    chunk summary, or None when the raw window is within `max_raw_messages`.
+    `covers_until` is the timestamp of the last folded message, which becomes the chunk summary's timestamp.
+    """
+    messages = history.get("messages", [])
+    if len(messages) <= max_raw_messages:
+        return None
+    to_fold = messages[:batch_size]
+    covers_until = to_fold[-1].get("timestamp") if to_fold else None
+    if not covers_until:
+        # Only the turn's own AI reply lacks a timestamp, and it is never among the oldest messages;
+        # if it somehow is, skip and let the next maintenance run read stored rows
+        return None
+
+    previous = (history.get("chunk_summaries") or [])[-1:]
+    context = previous[0].get("content") if previous else (history.get("summary") or NO_SUMMARY_TEXT)
+    formatted_messages = "\n".join(format_message_line(msg) for msg in to_fold)
+    prompt = f"""
+Summarize the following part of a conversation between a user and Olivia, a relocation assistant.
+Capture the facts about the user, decisions, open questions and tasks discussed. Do not repeat the context.
+Use at most {CHUNK_SUMMARY_MAX_WORDS} words. Output only the summary.
+
+Context (what came just before, for reference only):
+---
+{context}
+---
+
+Messages to summarize:
+---
+{formatted_messages}
+---
+
+Summary:
+"""
+    return prompt, covers_until, len(to_fold)
+
+
+def history_after_chunk_fold(history: Dict[str, Any], chunk_content: str, covers_until: str, folded_count: int) -> Dict[str, Any]:
+    """Applies a written chunk summary to a history snapshot, as a fresh read would return it."""
+    chunk = {"content": chunk_content, "timestamp": covers_until}
+    return {
+        **history,
+        "summary_timestamp": covers_until,
+        "chunk_summaries": list(history.get("chunk_summaries") or []) + [chunk],
+        "messages": list(history.get("messages", []))[folded_count:],
+    }
+
+
+def plan_synopsis_merge(history: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+    """
+    Returns (prompt, covers_until, merged_chunk_count) for merging the oldest chunk summaries into the
+    synopsis, or None while there are at most MEMORY_MAX_CHUNK_SUMMARIES of them.
+    """
+    chunks = history.get("chunk_summaries") or []
+    if len(chunks) <= MEMORY_MAX_CHUNK_SUMMARIES:
+        return None
+    to_merge = chunks[:len(chunks) - MEMORY_CHUNKS_KEPT_AFTER_MERGE]
+    covers_until = to_merge[-1].get("timestamp")
+    if not covers_until:
+        return None
+
+    formatted_chunks = "\n".join(f"- {chunk.get('content', '')}" for chunk in to_merge)
+    prompt = f"""
+Your task is to update an existing conversation synopsis by integrating summaries of later parts of the conversation.
+Keep what still matters about the user (their destination, dates, preferences, decisions and open tasks) and drop details that are no longer relevant.
+If the existing synopsis is '{NO_SUMMARY_TEXT}', create a new synopsis from the summaries.
+Keep it under {SYNOPSIS_MAX_TOKENS * 3 // 4} words. Output only the updated synopsis.
+
+Existing Synopsis:
+---
+{history.get("summary") or NO_SUMMARY_TEXT}
+---
+
+Later Summaries to Integrate:
+---
+{formatted_chunks}
+---
+
+Updated Synopsis:
+"""
+    return prompt, covers_until, len(to_merge)
+
+
+def synopsis_needs_compaction(synopsis: str, model: str) -> bool:
+    return count_tokens(synopsis, model) > SYNOPSIS_MAX_TOKENS
+
+
+def build_compaction_prompt(synopsis: str) -> str:
+    return f"""
+The following conversation synopsis is too long. Rewrite it in under {SYNOPSIS_MAX_TOKENS // 2} words,
+keeping the most important facts about the user, their decisions and open tasks. Output only the synopsis.
+
+Synopsis:
+---
+{synopsis}
+---
+
+Shortened Synopsis:
+"""
@@ -0,0 +1,192 @@
+# Write-behind buffer that group-commits conversation message inserts.
+# Rows from many turns and users are batched and flushed to Supabase with one multi-row insert.
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Flush as soon as this many rows are waiting
+MESSAGE_BUFFER_MAX_ROWS = 100
+# ...or once the oldest waiting row has been buffered this long
+MESSAGE_BUFFER_FLUSH_INTERVAL_SECONDS = 0.2
+# A row that fails to insert is retried on the next flush, up to this many attempts
+MESSAGE_BUFFER_MAX_ATTEMPTS = 3
+# Postgres SQLSTATE classes for errors caused by the rows themselves (22 data exception, 23 integrity
+# constraint violation); anything else (timeouts, connection or auth errors) is about the request
+_ROW_ERROR_SQLSTATE_CLASSES = ("22", "23")
+_UNIQUE_VIOLATION = "23505"
+
+
+def _sqlstate(error: Exception) -> str:
+    return (error.code or "") if isinstance(error, APIError) else ""
+
+
+def _is_row_error(error: Exception) -> bool:
+    """True if the insert failed because of the data in the batch, so retrying a part of it can succeed."""
+    return _sqlstate(error).startswith(_ROW_ERROR_SQLSTATE_CLASSES)
+
+
+class MessageWriteBuffer:
+    """
+    Buffers complete `user_conversations` rows (message_id and timestamp are generated client-side)
+    and inserts them in batches from a background thread.
+    Rows stay visible through `pending_for_user` until their insert has completed, which gives
+    read-your-writes within this process. `close()` flushes everything.
+    If a batch insert fails because of its data (a Postgres data or constraint error), it is split in
+    halves until the failing rows are isolated, so one bad row doesn't hold back the rest of the batch;
+    any other failure (timeout, connection error) requeues the rows not yet written, without more tries
+    in that flush. Failed rows are retried on the next flush, and `on_drop` is called for each row that
+    is given up on. A duplicate-key error for a row being retried means an earlier attempt did write it
+    (e.g. the request timed out after the commit), so the row counts as written.
+    """
+
+    def __init__(self, insert_rows: Callable[[List[Dict[str, Any]]], None],
+                 max_rows: int = MESSAGE_BUFFER_MAX_ROWS,
+                 flush_interval_seconds: float = MESSAGE_BUFFER_FLUSH_INTERVAL_SECONDS,
+                 max_attempts: int = MESSAGE_BUFFER_MAX_ATTEMPTS,
+                 on_drop: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._insert_rows = insert_rows
+        self._on_drop = on_drop
+        self._max_rows = max_rows
+        self._flush_interval_seconds = flush_interval_seconds
+        self._max_attempts = max_attempts
+        self._pending: List[Tuple[Dict[str, Any], int]] = [] # (row, attempts so far)
+        self._in_flight: List[Dict[str, Any]] = []
+        self._oldest_pending_at: Optional[float] = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock() # One insert at a time keeps rows in order
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    def add(self, row: Dict[str, Any]):
+        """Queues a row for insertion. Starts the flush thread on first use."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Message buffer is closed.")
+            self._ensure_thread()
+            self._pending.append((row, 0))
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+            if len(self._pending) >= self._max_rows:
+                self._condition.notify()
+
+    def pending_for_user(self, user_id: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rows for `user_id` (in `session_id`, if given) that have been accepted but not yet confirmed written."""
+        with self._condition:
+            rows = self._in_flight + [row for row, _ in self._pending]
+            return [dict(row) for row in rows
+                    if row.get("user_id") == user_id and (session_id is None or row.get("session_id") == session_id)]
+
+    def flush(self) -> int:
+        """Inserts everything currently pending, in one batch unless some rows fail. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._condition:
+                batch = self._pending
+                self._pending = []
+                self._oldest_pending_at = None
+                self._in_flight = [row for row, _ in batch]
+            if not batch:
+                return 0
+            try:
+                failed: List[Tuple[Dict[str, Any], int, Exception]] = []
+                written = self._insert_isolating_failures(batch, failed)
+                self.flushes += 1
+                self.rows_written += written
+                if failed:
+                    self._requeue_failed(failed, len(batch))
+                return written
+            finally:
+                with self._condition:
+                    self._in_flight = []
+
+    def close(self):
+        """Stops the flush thread after writing out every buffered row."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        for _ in range(self._max_attempts): # Failed rows are re-queued; give them their remaining attempts
+            if not self._pending:
+                break
+            self.flush()
+
+    def _insert_isolating_failures(self, batch: List[Tuple[Dict[str, Any], int]], failed: List[Tuple[Dict[str, Any], int, Exception]]) -> int:
+        """
+        Inserts `batch`, bisecting it on data errors so the rows that fail on their own end up in `failed`
+        (with their attempts so far and the error) and all others are written. On any other error the rows
+        not yet written all go to `failed` untried. Returns the rows written.
+        """
+        try:
+            self._insert_rows([row for row, _ in batch])
+            return len(batch)
+        except Exception as e:
+            if len(batch) == 1 and batch[0][1] > 0 and _sqlstate(e) == _UNIQUE_VIOLATION:
+                logger.info("[MessageBuffer] Message %s was already written by an earlier attempt.", batch[0][0].get("message_id"))
+                return 1
+            if len(batch) == 1 or not _is_row_error(e):
+                failed.extend((row, attempts, e) for row, attempts in batch)
+                return 0
+            middle = len(batch) // 2
+            written = self._insert_isolating_failures(batch[:middle], failed)
+            if failed and not _is_row_error(failed[-1][2]):
+                # The database is failing requests, not rows: leave the other half for the next flush too
+                failed.extend((row, attempts, failed[-1][2]) for row, attempts in batch[middle:])
+                return written
+            return written + self._insert_isolating_failures(batch[middle:], failed)
+
+    def _requeue_failed(self, failed: List[Tuple[Dict[str, Any], int, Exception]], batch_size: int):
+        retry = []
+        for row, attempts, error in failed:
+            if attempts + 1 < self._max_attempts:
+                retry.append((row, attempts + 1))
+                continue
+            self.rows_dropped += 1
+            logger.error("[MessageBuffer] Dropping message %s (user_id %s, session_id %s) after %s failed inserts: %s",
+                         row.get("message_id"), row.get("user_id"), row.get("session_id"), attempts + 1, error)
+            if self._on_drop is not None:
+                try:
+                    self._on_drop(row)
+                except Exception as e:
+                    logger.error("[MessageBuffer] Error in drop handler for message %s: %s", row.get("message_id"), e)
+        if retry:
+            logger.warning("[MessageBuffer] %s of %s message rows failed to insert (%s); retrying them on the next flush.",
+                           len(retry), batch_size, failed[-1][2])
+        with self._condition:
+            self._in_flight = []
+            self._pending = retry + self._pending
+            if self._pending and self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="message-write-buffer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if len(self._pending) >= self._max_rows:
+                        break
+                    if self._oldest_pending_at is not None:
+                        wait_for = self._oldest_pending_at + self._flush_interval_seconds - time.monotonic()
+                        if wait_for <= 0:
+                            break
+                        self._condition.wait(wait_for)
+                    else:
+                        self._condition.wait()
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
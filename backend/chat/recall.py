@@ -0,0 +1,271 @@
+# Semantic recall over a user's older conversation messages.
+# Every stored human/AI message is embedded into a per-user in-memory vector index; each turn, the
+# messages most similar to the user's input are looked up with a vectorized NumPy top-k so the agent
+# can see relevant details that have already dropped out of its raw message window.
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Embedding backend: "hashing" (local, offline, no model download) or "openai"
+RECALL_EMBEDDER = os.getenv("OLIVIA_RECALL_EMBEDDER", "hashing").lower()
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Old messages injected into the prompt per turn
+RECALL_TOP_K = 3
+# Newest messages kept in a user's index (older ones are dropped first)
+RECALL_MAX_MESSAGES_PER_USER = 2000
+# Stored messages loaded from Supabase the first time a user's index is built in this process
+RECALL_BACKFILL_LIMIT = 500
+RECALL_INDEX_MAX_USERS = 512
+# Rebuild a user's index from Supabase after this long, to pick up messages written by other processes
+RECALL_INDEX_TTL_SECONDS = 1800
+
+# Recall searches only the current session's messages unless OLIVIA_RECALL_CROSS_SESSION=true,
+# in which case any of the user's sessions may contribute (e.g. "as I said last week")
+RECALL_CROSS_SESSION = os.getenv("OLIVIA_RECALL_CROSS_SESSION", "false").lower() in ("1", "true", "yes")
+
+RECALL_ROW_FIELDS = ("message_id", "session_id", "message_type", "content", "timestamp")
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from have how i in is it me my of on or so that the this to "
+    "was we what when where which with you your".split()
+)
+
+
+class HashingEmbedder:
+    """
+    Local embedding via the hashing trick: word unigrams and bigrams are hashed (with a sign) into
+    `dim` buckets, weighted by log term frequency and L2-normalized. Captures lexical overlap only,
+    but needs no model or network access.
+    """
+
+    min_score = 0.2 # Cosine similarity below which a match is treated as unrelated
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = [word for word in _TOKEN_PATTERN.findall(text.lower()) if word not in _STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.array(
+                [int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little") for feature in features],
+                dtype=np.uint64
+            )
+            buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], buckets, signs)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API (one request per batch of texts, through the LLM gateway)."""
+
+    min_score = 0.35
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL):
+        from llm_gateway import get_embeddings
+        self._model = model
+        self._embeddings = get_embeddings(model)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from llm_gateway import llm_gateway
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = llm_gateway.call(self._model, lambda: self._embeddings.embed_documents(texts))
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def get_embedder(name: str = RECALL_EMBEDDER):
+    """Returns the embedding backend configured with OLIVIA_RECALL_EMBEDDER."""
+    if name == "openai":
+        return OpenAIEmbedder()
+    if name != "hashing":
+        logger.warning("[Recall] Unknown embedder '%s'; using the local hashing embedder.", name)
+    return HashingEmbedder()
+
+
+class _UserIndex:
+    __slots__ = ("ids", "rows", "vectors", "sessions", "positions", "session_codes", "count", "pending", "known_ids", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.ids: List[str] = []
+        self.rows: List[Dict[str, Any]] = []
+        self.vectors: Optional[np.ndarray] = None # (capacity, dim); the first `count` rows are in use
+        self.sessions: Optional[np.ndarray] = None # (capacity,) session code of each row, parallel to `vectors`
+        self.positions: Dict[str, int] = {} # message_id -> row position
+        self.session_codes: Dict[Optional[str], int] = {} # session_id -> code in `sessions`
+        self.count = 0
+        self.pending: List[Dict[str, Any]] = [] # Added but not yet embedded
+        self.known_ids = set()
+        self.expires_at = expires_at
+
+
+class RecallIndex:
+    """
+    Per-user vector index of conversation messages, held in memory (LRU over users, with a TTL).
+    A user's index is built on first use from `load_messages(user_id)` and kept current with `add`.
+    Embedding is deferred: added rows are embedded together with the next query, in one batch.
+    Thread-safe. Rows are only appended in place or replaced by new arrays, so a search scores a
+    snapshot of the first `count` rows without holding the lock.
+    """
+
+    def __init__(self, embedder, load_messages: Callable[[str], List[Dict[str, Any]]],
+                 max_users: int = RECALL_INDEX_MAX_USERS, max_messages_per_user: int = RECALL_MAX_MESSAGES_PER_USER,
+                 ttl_seconds: float = RECALL_INDEX_TTL_SECONDS):
+        self._embedder = embedder
+        self._load_messages = load_messages
+        self._max_users = max_users
+        self._max_messages_per_user = max_messages_per_user
+        self._ttl_seconds = ttl_seconds
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, message_row: Dict[str, Any]):
+        """Queues a stored message for indexing. A no-op until the user's index has been built."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._queue(entry, [message_row])
+
+    def search(self, user_id: str, query: str, k: int = RECALL_TOP_K, exclude_ids: Iterable[str] = (),
+               min_score: Optional[float] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `k` of the user's messages most similar to `query`, best first, each with a "score".
+        Messages in `exclude_ids` (e.g. those already in the prompt) and matches below `min_score` are skipped.
+        With `session_id`, only that session's messages are considered.
+        """
+        entry = self._get_entry(user_id)
+        with self._lock:
+            pending, entry.pending = entry.pending, []
+        vectors = self._embedder.embed([row["content"] for row in pending] + [query])
+        query_vector = vectors[-1]
+        min_score = self._embedder.min_score if min_score is None else min_score
+        exclude = set(exclude_ids)
+
+        with self._lock:
+            self._append(entry, pending, vectors[:-1])
+            count, rows = entry.count, entry.rows
+            if count == 0 or not query_vector.any():
+                return []
+            matrix, sessions = entry.vectors[:count], entry.sessions[:count]
+            excluded_positions = [entry.positions[message_id] for message_id in exclude if message_id in entry.positions]
+            session_code = entry.session_codes.get(session_id, -1) if session_id is not None else None
+
+        scores = matrix @ query_vector
+        mask = np.zeros(count, dtype=bool)
+        mask[excluded_positions] = True
+        if session_code is not None:
+            mask |= sessions != session_code
+        scores[mask] = -np.inf
+        candidates = min(k, count)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**rows[position], "score": float(scores[position])}
+            for position in top if scores[position] >= min_score
+        ]
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def _get_entry(self, user_id: str) -> _UserIndex:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry.expires_at >= time.monotonic():
+                self._users.move_to_end(user_id)
+                return entry
+
+        try:
+            rows = self._load_messages(user_id)
+        except Exception as e: # Recall is best-effort; an empty index is retried after the TTL
+            logger.error("[Recall] Error loading messages for user_id %s: %s", user_id, e)
+            rows = []
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry.expires_at < time.monotonic():
+                entry = _UserIndex(time.monotonic() + self._ttl_seconds)
+                self._users[user_id] = entry
+            self._queue(entry, rows)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._max_users:
+                self._users.popitem(last=False)
+            return entry
+
+    def _queue(self, entry: _UserIndex, rows: List[Dict[str, Any]]):
+        for row in rows:
+            if row.get("message_id") in entry.known_ids or not row.get("content"):
+                continue
+            entry.known_ids.add(row["message_id"])
+            entry.pending.append({field: row.get(field) for field in RECALL_ROW_FIELDS})
+
+    def _append(self, entry: _UserIndex, rows: List[Dict[str, Any]], vectors: np.ndarray):
+        if not rows:
+            return
+        needed = entry.count + len(rows)
+        if entry.vectors is None or needed > entry.vectors.shape[0]:
+            capacity = max(needed, 2 * (entry.vectors.shape[0] if entry.vectors is not None else 64))
+            grown = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            grown_sessions = np.full(capacity, -1, dtype=np.int32)
+            if entry.vectors is not None:
+                grown[:entry.count] = entry.vectors[:entry.count]
+                grown_sessions[:entry.count] = entry.sessions[:entry.count]
+            entry.vectors, entry.sessions = grown, grown_sessions
+        entry.vectors[entry.count:needed] = vectors
+        entry.sessions[entry.count:needed] = [
+            entry.session_codes.setdefault(row.get("session_id"), len(entry.session_codes)) for row in rows
+        ]
+        for position, row in enumerate(rows, start=entry.count):
+            entry.positions[row["message_id"]] = position
+        entry.ids.extend(row["message_id"] for row in rows)
+        entry.rows.extend(rows)
+        entry.count = needed
+
+        overflow = entry.count - self._max_messages_per_user
+        if overflow > 0: # Drop the oldest
+            order = np.argsort([row.get("timestamp") or "" for row in entry.rows], kind="stable")
+            keep = np.sort(order[overflow:])
+            entry.vectors = entry.vectors[keep].copy()
+            entry.sessions = entry.sessions[keep].copy()
+            entry.ids = [entry.ids[i] for i in keep]
+            entry.positions = {message_id: position for position, message_id in enumerate(entry.ids)}
+            entry.rows = [entry.rows[i] for i in keep]
+            entry.known_ids = set(entry.ids) | {row["message_id"] for row in entry.pending}
+            entry.count = len(keep)
+
+
+def format_recalled_messages(recalled: List[Dict[str, Any]]) -> List[str]:
+    """One line per recalled message (in the given order, best match first), prefixed with its date."""
+    lines = []
+    for row in recalled:
+        date = (row.get("timestamp") or "")[:10]
+        lines.append(f"[{date}] {(row.get('message_type') or 'unknown').capitalize()}: {row.get('content', '')}")
+    return lines
@@ -11,10 +11,19 @@ class WriteMessageInput(BaseModelV1):
 
 class WriteSummaryInput(BaseModelV1):
     user_id: str = Field(description="Identifier for the user.")
+    session_id: str = Field(description="Identifier for the conversation session; history and summaries are kept per session.")
     summary_content: str = Field(description="The content of the summary to be written.")
+    covers_until: Optional[str] = Field(default=None, description="ISO timestamp of the last message/chunk summary the synopsis covers. Older summary rows are pruned.")
+
+class WriteChunkSummaryInput(BaseModelV1):
+    user_id: str = Field(description="Identifier for the user.")
+    session_id: str = Field(description="Identifier for the conversation session; history and summaries are kept per session.")
+    summary_content: str = Field(description="Summary of one batch of consecutive messages.")
+    covers_until: str = Field(description="ISO timestamp of the last message the chunk summary covers.")
 
 class ReadHistoryInput(BaseModelV1):
     user_id: str = Field(description="Identifier for the user.")
+    session_id: str = Field(description="Identifier for the conversation session; history and summaries are kept per session.")
     max_messages: int = Field(default=10, description="Maximum number of messages to retrieve.")
 
 # --- Pydantic Models for Checklist Tool Inputs ---
@@ -24,10 +33,28 @@ class ReadChecklistInput(BaseModelV1):
 class WriteChecklistInput(BaseModelV1):
     user_id: str = Field(description="Identifier for the user whose checklist is to be written.")
     checklist_data: Dict[str, Any] = Field(description="The checklist data in JSON format. This will overwrite any existing checklist for the user.")
+    expected_version: Optional[int] = Field(default=None, description="The checklist version your change is based on (shown with the current checklist; 0 if the user has none). The write is rejected if the checklist changed since.")
 
 class DeleteChecklistInput(BaseModelV1):
     user_id: str = Field(description="Identifier for the user whose checklist is to be deleted.")
 
+class AddChecklistItemInput(BaseModelV1):
+    user_id: str = Field(description="Identifier for the user whose checklist the item is added to.")
+    category: str = Field(description="Category of the item, e.g. 'Visa', 'Housing' or 'Bank Account'.")
+    description: str = Field(description="The text of the checklist item.")
+
+class UpdateChecklistItemInput(BaseModelV1):
+    user_id: str = Field(description="Identifier for the user whose checklist item is updated.")
+    item_id: str = Field(description="The 'id' of the checklist item to update.")
+    category: Optional[str] = Field(default=None, description="New category for the item. Omit to keep the current one.")
+    description: Optional[str] = Field(default=None, description="New text for the item. Omit to keep the current one.")
+    is_checked: Optional[bool] = Field(default=None, description="New completion state. Omit to keep the current one.")
+
+class ToggleChecklistItemInput(BaseModelV1):
+    user_id: str = Field(description="Identifier for the user whose checklist item is checked off or unchecked.")
+    item_id: str = Field(description="The 'id' of the checklist item.")
+    is_checked: bool = Field(description="True to mark the item as done, False to mark it as not done.")
+
 
 # --- Pydantic Models for Chat API ---
 class ChatRequest(BaseModel):
@@ -0,0 +1,118 @@
+# Background worker that runs conversation summary maintenance off the /chat response path.
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Number of summary jobs that may run at the same time (each one is at most one summarizer LLM call)
+SUMMARY_WORKER_CONCURRENCY = 2
+
+
+class SummaryWorker:
+    """
+    Queue of per-session summary maintenance jobs, processed by background asyncio tasks.
+    Jobs are keyed by (user_id, session_id), since each session has its own summaries.
+    At most one job is pending per session: turns that arrive before the worker reaches a session
+    are coalesced into the job that is already queued, so they are handled by a single fold.
+    A session is never summarized by two tasks at once; a job scheduled while that session's
+    summary is being maintained is re-queued once the running job finishes.
+    A job may carry the history snapshot its turn already fetched; coalesced jobs keep the newest one,
+    and snapshots that may predate a fold that just finished are dropped.
+    """
+
+    def __init__(self, maintain_fn: Callable[[str, str, Optional[Dict[str, Any]]], Awaitable[None]], concurrency: int = SUMMARY_WORKER_CONCURRENCY):
+        self._maintain_fn = maintain_fn
+        self._concurrency = concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[Tuple[str, str]] = set()
+        self._snapshots: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        self._running: Set[Tuple[str, str]] = set()
+        self._rerun: Set[Tuple[str, str]] = set()
+        self.coalesced_jobs = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Starts the worker tasks on the running event loop. Safe to call more than once."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._run(), name=f"summary-worker-{i}") for i in range(self._concurrency)]
+        logger.info("[SummaryWorker] Started with concurrency %s.", self._concurrency)
+
+    def schedule(self, user_id: str, session_id: str, history: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queues summary maintenance for a session unless a job for it is already pending.
+        `history` is an optional snapshot of the session's history to reuse instead of re-reading it.
+        Must be called from the event loop. Starts the worker lazily if needed.
+        Returns True if a new job was queued, False if it was merged into a pending one.
+        """
+        self.start()
+        key = (user_id, session_id)
+        self._snapshots[key] = history
+        if key in self._pending:
+            self.coalesced_jobs += 1
+            logger.debug("[SummaryWorker] Coalesced summary job for user_id: %s, session_id: %s (queue depth: %s)", user_id, session_id, self.queue_depth)
+            return False
+        self._pending.add(key)
+        self._queue.put_nowait(key)
+        return True
+
+    async def _run(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                self._pending.discard(key)
+                history = self._snapshots.pop(key, None)
+                if key in self._running:
+                    # Another task is folding this session's history; run again once it is done.
+                    # The snapshot predates that fold, so the rerun reads fresh history.
+                    self._rerun.add(key)
+                    continue
+                self._running.add(key)
+                try:
+                    await self._maintain_fn(*key, history)
+                except Exception as e:
+                    logger.error("[SummaryWorker] Error maintaining summary for user_id %s, session_id %s: %s", *key, e)
+                finally:
+                    self._running.discard(key)
+                    if key in self._pending:
+                        # A snapshot queued while this job ran may predate its fold; folding from it
+                        # would summarize the same messages twice, so the next job reads fresh history
+                        self._snapshots[key] = None
+                    if key in self._rerun:
+                        self._rerun.discard(key)
+                        self.schedule(*key)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self):
+        """Waits until every job queued so far (and any re-run it triggers) has finished; the worker keeps running."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, drain: bool = True):
+        """Stops the worker. With drain=True, pending jobs are finished first."""
+        if not self._tasks:
+            return
+        if drain:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+        self._snapshots.clear()
+        self._running.clear()
+        self._rerun.clear()
+        logger.info("[SummaryWorker] Stopped.")
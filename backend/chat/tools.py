@@ -1,32 +1,98 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from langchain_core.tools import tool
-import supabase
+import atexit
 import os
+import uuid
+import json
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 # Import Pydantic models from schemas.py
 from .schemas import (
-    WriteMessageInput, WriteSummaryInput, ReadHistoryInput,
-    ReadChecklistInput, WriteChecklistInput, DeleteChecklistInput
+    WriteMessageInput, WriteSummaryInput, WriteChunkSummaryInput, ReadHistoryInput,
+    ReadChecklistInput, WriteChecklistInput, DeleteChecklistInput,
+    AddChecklistItemInput, UpdateChecklistItemInput, ToggleChecklistItemInput
 )
+from .history_cache import conversation_cache
+from .message_buffer import MessageWriteBuffer
+from .checklist_cache import checklist_cache, NO_CHECKLIST_VERSION
+from .recall import RecallIndex, get_embedder, RECALL_BACKFILL_LIMIT, RECALL_ROW_FIELDS
+from clients import get_supabase_client, set_supabase_client
+from app_logging import Truncated, get_logger, get_payload_logger
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+logger = get_logger(__name__)
+payload_logger = get_payload_logger(__name__)
+
+# Message and chunk summary columns returned by read_conversation_history (matches the get_conversation_context database function)
+HISTORY_MESSAGE_FIELDS = ("message_id", "session_id", "message_type", "content", "timestamp")
+CHUNK_SUMMARY_FIELDS = ("message_id", "content", "timestamp")
+
+def _insert_conversation_rows(rows: List[Dict[str, Any]]):
+    """Inserts a batch of message rows with a single multi-row insert. Raises on failure so the buffer can retry."""
+    response = get_supabase_client().table("user_conversations").insert(rows).execute()
+    if hasattr(response, 'error') and response.error:
+        raise RuntimeError(response.error.message if hasattr(response.error, 'message') else response.error)
+
+# Message inserts are group-committed: rows from all turns/users are batched and written in the background.
+# Flushed on shutdown by the FastAPI lifespan in main.py, and at interpreter exit for scripts.
+def _forget_dropped_message(row: Dict[str, Any]):
+    """A message the buffer gave up on was never stored; stop serving it from the conversation cache."""
+    conversation_cache.invalidate(row.get("user_id"), row.get("session_id"))
+
+message_buffer = MessageWriteBuffer(_insert_conversation_rows, on_drop=_forget_dropped_message)
+atexit.register(message_buffer.close)
+
+def _load_recent_messages(table: str, user_id: str) -> List[Dict[str, Any]]:
+    """A user's newest RECALL_BACKFILL_LIMIT human/AI messages in `table`, newest first."""
+    response = (
+        get_supabase_client().table(table)
+        .select(", ".join(RECALL_ROW_FIELDS))
+        .eq("user_id", user_id)
+        .in_("message_type", ["human", "ai"])
+        .order("timestamp", desc=True)
+        .limit(RECALL_BACKFILL_LIMIT)
+        .execute()
+    )
+    if hasattr(response, 'error') and response.error:
+        raise RuntimeError(response.error.message if hasattr(response.error, 'message') else response.error)
+    return list(response.data or [])
+
+def _load_messages_for_recall(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Loads a user's newest RECALL_BACKFILL_LIMIT stored human/AI messages, plus buffered ones, to build their recall index.
+    Compaction (compaction.py) moves summarized messages from user_conversations to user_conversations_archive,
+    so both tables are read; the archive is read second, so a row moved in between is seen at least once.
+    """
+    hot_rows = _load_recent_messages("user_conversations", user_id)
+    archived_rows = _load_recent_messages("user_conversations_archive", user_id)
+    rows_by_id = {row["message_id"]: row for row in archived_rows + hot_rows}
+    rows = sorted(rows_by_id.values(), key=lambda row: row.get("timestamp") or "", reverse=True)[:RECALL_BACKFILL_LIMIT]
+    return rows + message_buffer.pending_for_user(user_id)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL and Key must be set in environment variables.")
+# Semantic recall over each user's older messages (see recall.py). Kept current by write_conversation_message.
+recall_index = RecallIndex(get_embedder(), _load_messages_for_recall)
 
-supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
+def use_supabase_client(client):
+    """
+    Replaces the Supabase client used by every tool, e.g. with the in-memory stand-in in
+    benchmarks/fake_supabase.py, and drops everything cached from the previous one.
+    """
+    message_buffer.flush()
+    set_supabase_client(client)
+    conversation_cache.clear()
+    checklist_cache.clear()
+    recall_index.clear()
 
 # --- History Tool Functions ---
 
 @tool("write_conversation_message", args_schema=WriteMessageInput)
 def write_conversation_message(user_id: str, session_id: str, message_type: str, content: str) -> str:
     """Writes a new message (human or AI) to the conversation history in Supabase.
+    The row (with a client-generated message ID and timestamp) is queued in the write-behind
+    message_buffer and inserted with other rows in a batch; reads in this process see it immediately.
     Args:
         user_id: Identifier for the user.
         session_id: Identifier for the specific conversation session.
@@ -37,121 +103,178 @@ def write_conversation_message(user_id: str, session_id: str, message_type: str,
     """
     try:
         insert_data = {
+            "message_id": str(uuid.uuid4()),
             "user_id": user_id,
             "session_id": session_id,
             "message_type": message_type,
             "content": content,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
         }
-        response = supabase_client.table("user_conversations").insert(insert_data).execute()
-
-        if hasattr(response, 'error') and response.error:
-            return f"Error writing message to Supabase: {response.error.message if hasattr(response.error, 'message') else response.error}"
-        elif hasattr(response, 'data') and response.data and len(response.data) > 0:
-            return f"Message written successfully. Message ID: {response.data[0]['message_id']}"
-        elif not (hasattr(response, 'error') and response.error): # No error, but no data from insert
-             return "Message write operation completed, but no data returned (may indicate success or no actual write)."
-        else: # Should be caught by the first condition, but as a fallback
-            return "Failed to write message due to an unknown issue with Supabase response."
+        message_buffer.add(insert_data)
+        # Keep the cached context current, in the same shape read_conversation_history returns
+        conversation_cache.append_message(user_id, session_id, {field: insert_data[field] for field in HISTORY_MESSAGE_FIELDS})
+        if message_type in ("human", "ai"):
+            recall_index.add(user_id, insert_data)
+        return f"Message written successfully. Message ID: {insert_data['message_id']}"
     except Exception as e:
         return f"An unexpected error occurred in write_conversation_message: {e}"
 
+# Message types of the summary tiers (see chat/memory.py)
+SYNOPSIS_MESSAGE_TYPE = "ai_summary"
+CHUNK_SUMMARY_MESSAGE_TYPE = "ai_chunk_summary"
+
+def _prune_summaries(user_id: str, session_id: str, covers_until: str, keep_message_id: str):
+    """Deletes the synopses and chunk summaries of the session that a newly written synopsis supersedes."""
+    try:
+        (
+            get_supabase_client().table("user_conversations")
+            .delete()
+            .eq("user_id", user_id)
+            .eq("session_id", session_id)
+            .in_("message_type", [SYNOPSIS_MESSAGE_TYPE, CHUNK_SUMMARY_MESSAGE_TYPE])
+            .lte("timestamp", covers_until)
+            .neq("message_id", keep_message_id)
+            .execute()
+        )
+    except Exception as e: # Leftover rows are only wasted space; the next synopsis write retries
+        logger.error("[SummaryTool] Error pruning old summaries for user %s, session %s: %s", user_id, session_id, e)
+
 @tool("write_conversation_summary", args_schema=WriteSummaryInput)
-def write_conversation_summary(user_id: str, summary_content: str) -> str:
-    """Writes/updates a conversation summary for a user in Supabase.
-    The summary is stored as a special message type.
+def write_conversation_summary(user_id: str, session_id: str, summary_content: str, covers_until: Optional[str] = None) -> str:
+    """Writes/updates a conversation summary (the synopsis) for one of a user's sessions in Supabase.
+    The summary is stored as a special message type in that session.
+    With `covers_until`, the row is timestamped with the last message/chunk summary it covers and
+    the summary rows it supersedes are deleted.
     Args:
         user_id: Identifier for the user.
+        session_id: The conversation session the summary belongs to.
         summary_content: The content of the summary to be written.
+        covers_until: ISO timestamp of the last message or chunk summary folded into this summary.
     Returns:
         A string indicating success or an error message.
     """
     try:
         insert_data = {
+            "message_id": str(uuid.uuid4()),
             "user_id": user_id,
-            "session_id": f"summary_for_{user_id}",
-            "message_type": "ai_summary",
+            "session_id": session_id,
+            "message_type": SYNOPSIS_MESSAGE_TYPE,
             "content": summary_content,
             "summary_flag": True
         }
-        response = supabase_client.table("user_conversations").insert(insert_data).execute()
+        if covers_until:
+            insert_data["timestamp"] = covers_until
+        response = get_supabase_client().table("user_conversations").insert(insert_data).execute()
 
         if hasattr(response, 'error') and response.error:
             return f"Error writing summary to Supabase: {response.error.message if hasattr(response.error, 'message') else response.error}"
         elif hasattr(response, 'data') and response.data and len(response.data) > 0:
-            return f"Summary written successfully for user {user_id}."
+            summary_timestamp = response.data[0].get("timestamp")
+            conversation_cache.set_summary(user_id, session_id, summary_content, summary_timestamp)
+            if covers_until:
+                _prune_summaries(user_id, session_id, covers_until, insert_data["message_id"])
+            return f"Summary written successfully for user {user_id}, session {session_id}."
         elif not (hasattr(response, 'error') and response.error): # No error, but no data from insert
+            conversation_cache.invalidate(user_id, session_id)
             return "Summary write operation completed, but no data returned (may indicate success or no actual write)."
         else:
             return "Failed to write summary due to an unknown issue with Supabase response."
     except Exception as e:
         return f"An unexpected error occurred in write_conversation_summary: {e}"
 
+@tool("write_chunk_summary", args_schema=WriteChunkSummaryInput)
+def write_chunk_summary(user_id: str, session_id: str, summary_content: str, covers_until: str) -> str:
+    """Writes the summary of one batch of consecutive messages (the middle tier of the conversation memory).
+    The row is timestamped with the last message it covers, so those messages drop out of the raw history window.
+    Args:
+        user_id: Identifier for the user.
+        session_id: The conversation session the folded messages belong to.
+        summary_content: Summary of the folded messages.
+        covers_until: ISO timestamp of the last folded message.
+    Returns:
+        A string indicating success or an error message.
+    """
+    try:
+        insert_data = {
+            "message_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "session_id": session_id,
+            "message_type": CHUNK_SUMMARY_MESSAGE_TYPE,
+            "content": summary_content,
+            "timestamp": covers_until,
+            "summary_flag": True
+        }
+        response = get_supabase_client().table("user_conversations").insert(insert_data).execute()
+
+        if hasattr(response, 'error') and response.error:
+            return f"Error writing chunk summary to Supabase: {response.error.message if hasattr(response.error, 'message') else response.error}"
+        conversation_cache.add_chunk_summary(user_id, session_id, {field: insert_data[field] for field in CHUNK_SUMMARY_FIELDS})
+        return f"Chunk summary written successfully for user {user_id}, session {session_id}."
+    except Exception as e:
+        return f"An unexpected error occurred in write_chunk_summary: {e}"
+
 @tool("read_conversation_history", args_schema=ReadHistoryInput)
-def read_conversation_history(user_id: str, max_messages: int = 30) -> Dict[str, Any]:
-    """Fetches the latest summary and up to 'max_messages' raw messages that are newer than that summary for a user.
-    If no summary exists, fetches the 'max_messages' most recent raw messages.
+def read_conversation_history(user_id: str, session_id: str, max_messages: int = 30) -> Dict[str, Any]:
+    """Fetches the conversation memory of one of a user's sessions: the synopsis, the chunk summaries newer than it, and up to
+    'max_messages' raw messages newer than both. If no summary exists, fetches the 'max_messages' most recent raw messages.
+    Both come back from a single database function call (get_conversation_context).
+    Served from the in-process conversation cache when possible; Supabase is queried on a miss.
     Args:
         user_id: Identifier for the user.
+        session_id: The conversation session to read; other sessions of the user are not included.
         max_messages: Maximum number of raw messages to retrieve (those newer than the summary, or most recent if no summary).
     Returns:
         A dictionary containing:
-            - "summary" (str|None): The content of the latest summary, or None if not found.
-            - "messages" (list): A list of raw message dictionaries.
-            - "summary_timestamp" (str|None): The ISO timestamp of the latest summary, or None.
+            - "summary" (str|None): The content of the synopsis, or None if not found.
+            - "chunk_summaries" (list): Chunk summary dictionaries (message_id, content, timestamp) newer than the synopsis.
+            - "messages" (list): A list of raw message dictionaries (message_id, session_id, message_type, content, timestamp).
+            - "summary_timestamp" (str|None): The ISO timestamp up to which the summaries cover the conversation, or None.
     """
-    response_data: Dict[str, Any] = {"messages": [], "summary": None, "summary_timestamp": None}
-    latest_summary_obj = None
+    cached_history = conversation_cache.get(user_id, session_id, max_messages)
+    if cached_history is not None:
+        return cached_history
+
+    response_data: Dict[str, Any] = {"messages": [], "summary": None, "summary_timestamp": None, "chunk_summaries": []}
+    cache_read_token = conversation_cache.begin_read(user_id, session_id)
+    # Read-your-writes: snapshot this session's rows still waiting in the write-behind buffer BEFORE the query.
+    # A row flushed in between is then either in the snapshot or in the query result (de-duplicated below);
+    # taken after the query, it could be in neither. Rows accepted after the snapshot bump the cache's write
+    # seq (append_message), so the cache won't keep this read.
+    pending_rows = message_buffer.pending_for_user(user_id, session_id)
 
     try:
-        # 1. Fetch the latest summary object (content and timestamp)
-        summary_query_response = (
-            supabase_client.table("user_conversations")
-            .select("content, timestamp")
-            .eq("user_id", user_id)
-            .eq("message_type", "ai_summary")
-            .order("timestamp", desc=True)
-            .limit(1)
-            .execute()
-        )
-
-        if hasattr(summary_query_response, 'error') and summary_query_response.error:
-            # Log a warning but don't make it a fatal error for fetching history
-            print(f"[HistoryTool] Warning: Error fetching summary for user {user_id}: {summary_query_response.error.message if hasattr(summary_query_response.error, 'message') else summary_query_response.error}")
-        elif not hasattr(summary_query_response, 'data'):
-            print(f"[HistoryTool] Warning: Summary query response for user {user_id} missing 'data' attribute.")
-        elif summary_query_response.data and len(summary_query_response.data) > 0:
-            latest_summary_obj = summary_query_response.data[0]
-            response_data["summary"] = latest_summary_obj['content']
-            response_data["summary_timestamp"] = latest_summary_obj['timestamp']
-
-        # 2. Fetch raw messages
-        query = (
-            supabase_client.table("user_conversations")
-            .select("*")
-            .eq("user_id", user_id)
-            .neq("message_type", "ai_summary")
-        )
-
-        if latest_summary_obj and latest_summary_obj.get('timestamp'):
-            query = query.gt("timestamp", latest_summary_obj['timestamp']) # Messages newer than the summary
-        
-        # Fetch potentially a bit more to sort then limit, ensuring we get the most recent ones correctly after filtering by timestamp
-        # The limit should be applied *after* ordering if we want the most recent ones post-summary_timestamp.
-        # Supabase order().limit() applies limit before order sometimes, so careful handling:
-        # Fetch all post-summary messages, sort in Python, then take the last `max_messages`.
-        # However, to avoid fetching too much, we can rely on a reasonable limit first.
-        
-        raw_messages_response = query.order("timestamp", desc=True).limit(max_messages).execute()
-
-        if hasattr(raw_messages_response, 'error') and raw_messages_response.error:
-            return {"error": f"Error reading raw messages: {raw_messages_response.error.message if hasattr(raw_messages_response.error, 'message') else raw_messages_response.error}"}
-        elif not hasattr(raw_messages_response, 'data'):
-            return {"error": "Error reading raw messages: Response object missing 'data'."}
-
-        if raw_messages_response.data:
-            # Data is fetched desc, so reverse to get chronological for the agent, then take the tail if needed (already limited)
-            response_data["messages"] = sorted(raw_messages_response.data, key=lambda x: x['timestamp'])
-        
+        # One round trip: the get_conversation_context database function returns the latest summary
+        # and the post-summary message window (chronological, prompt columns only).
+        # See supabase/migrations/*_session_scoped_conversation_context.sql
+        context_response = get_supabase_client().rpc(
+            "get_conversation_context",
+            {"p_user_id": user_id, "p_session_id": session_id, "p_max_messages": max_messages}
+        ).execute()
+
+        if hasattr(context_response, 'error') and context_response.error:
+            return {"error": f"Error reading conversation history: {context_response.error.message if hasattr(context_response.error, 'message') else context_response.error}"}
+        elif not hasattr(context_response, 'data'):
+            return {"error": "Error reading conversation history: Response object missing 'data'."}
+
+        context_data = context_response.data or {}
+        response_data["summary"] = context_data.get("summary")
+        response_data["summary_timestamp"] = context_data.get("summary_timestamp")
+        response_data["chunk_summaries"] = context_data.get("chunk_summaries") or []
+        messages = context_data.get("messages") or []
+
+        stored_ids = {msg.get("message_id") for msg in messages}
+        for row in pending_rows:
+            if row["message_id"] in stored_ids:
+                continue
+            if response_data["summary_timestamp"] and row["timestamp"] <= response_data["summary_timestamp"]:
+                continue
+            stored_ids.add(row["message_id"])
+            messages.append({field: row[field] for field in HISTORY_MESSAGE_FIELDS})
+
+        # Chronological, keeping only the newest `max_messages`
+        response_data["messages"] = sorted(messages, key=lambda x: x['timestamp'])[-max_messages:] if max_messages > 0 else []
+
+        conversation_cache.put(user_id, session_id, response_data, max_messages, cache_read_token)
         return response_data
 
     except Exception as e:
@@ -160,22 +283,52 @@ def read_conversation_history(user_id: str, max_messages: int = 30) -> Dict[str,
 
 # --- Checklist Tool Functions ---
 
-@tool("read_user_checklist", args_schema=ReadChecklistInput)
-def read_user_checklist(user_id: str) -> Dict[str, Any]:
-    """Reads a user's personalized moving checklist from Supabase.
-    The checklist data is expected to be a JSON object like {"items": [...]}.
-    Args:
-        user_id: Identifier for the user.
-    Returns:
-        A dictionary containing checklist items (e.g., {"items": [...]}) if found.
-        Returns {"items": []} if no checklist is found or if data is malformed.
-        Returns a dictionary with an 'error' key if a Supabase error occurs.
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _is_iso_timestamp(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return True
+    except ValueError:
+        return False
+
+CHECKLIST_ITEM_CONTENT_FIELDS = ("category", "description", "is_checked")
+
+def _normalize_checklist_item(item: Dict[str, Any], existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Fills in item fields the server owns: a UUID 'id' and real ISO timestamps instead of LLM placeholders.
+    `existing` is the stored item with the same id, if any: its created_at is kept (the agent is shown the
+    checklist without timestamps), and so is its updated_at when the item's content did not change.
     """
-    print(f"[ChecklistTool] Attempting to read checklist for user_id: {user_id} (expecting {{'items': [...]}} format)")
+    normalized = dict(item)
+    if not normalized.get("id") or not isinstance(normalized["id"], str):
+        normalized["id"] = str(uuid.uuid4())
+    normalized.setdefault("is_checked", False)
+    now = _now_iso()
+    if existing is not None:
+        if _is_iso_timestamp(existing.get("created_at")):
+            normalized["created_at"] = existing["created_at"]
+        unchanged = all(normalized.get(field) == existing.get(field) for field in CHECKLIST_ITEM_CONTENT_FIELDS)
+        normalized["updated_at"] = existing.get("updated_at") if unchanged else now
+    if not _is_iso_timestamp(normalized.get("created_at")):
+        normalized["created_at"] = now
+    if not _is_iso_timestamp(normalized.get("updated_at")):
+        normalized["updated_at"] = now
+    return normalized
+
+def _default_checklist_title(user_id: str) -> str:
+    return f"Relocation Checklist for {user_id}"
+
+def _fetch_user_checklist(user_id: str) -> Dict[str, Any]:
+    """Reads a user's checklist and its version straight from Supabase (see read_user_checklist)."""
+    logger.debug("[ChecklistTool] Attempting to read checklist for user_id: %s (expecting {'items': [...]} format)", user_id)
     try:
         response = (
-            supabase_client.table("user_checklists")
-            .select("checklist_data, updated_at")
+            get_supabase_client().table("user_checklists")
+            .select("checklist_data, updated_at, version")
             .eq("user_id", user_id)
             .order("updated_at", desc=True)
             .limit(1)
@@ -184,105 +337,182 @@ def read_user_checklist(user_id: str) -> Dict[str, Any]:
         # print(f"[ChecklistTool] Raw response from Supabase: {response}")
 
         if response is None: # Should not happen with supabase-py v1+
-            print("[ChecklistTool] Supabase client returned a None response object unexpectedly.")
+            logger.error("[ChecklistTool] Supabase client returned a None response object unexpectedly.")
             return {"error": "Error reading checklist: Supabase client returned an unexpected None response."}
 
         if hasattr(response, 'error') and response.error:
-            print(f"[ChecklistTool] Supabase response error: {response.error}")
+            logger.error("[ChecklistTool] Supabase response error: %s", response.error)
             return {"error": f"Error reading checklist for user {user_id}: {response.error.message if hasattr(response.error, 'message') else response.error}"}
         
         if hasattr(response, 'data'):
             if response.data is None or (isinstance(response.data, list) and len(response.data) == 0):
-                print("[ChecklistTool] No checklist found for user (empty data list or None). Returning {{'items': []}}.")
-                return {"items": []} # No record found
+                logger.debug("[ChecklistTool] No checklist found for user (empty data list or None). Returning {'items': []}.")
+                return {"items": [], "version": NO_CHECKLIST_VERSION} # No record found
             
             if isinstance(response.data, list) and len(response.data) > 0:
                 db_record = response.data[0]
                 checklist_data_from_db = db_record.get("checklist_data")
-                print(f"[ChecklistTool] Checklist record found. Raw checklist_data from DB: {checklist_data_from_db}")
+                record_version = db_record.get("version") or NO_CHECKLIST_VERSION
+                logger.debug("[ChecklistTool] Checklist record found (version %s).", record_version)
+                payload_logger.debug("[ChecklistTool] Raw checklist_data from DB: %s", Truncated(checklist_data_from_db))
                 
                 if isinstance(checklist_data_from_db, dict) and "items" in checklist_data_from_db and isinstance(checklist_data_from_db["items"], list):
                     # Valid format found
-                    return checklist_data_from_db
+                    return {**checklist_data_from_db, "version": record_version}
                 elif checklist_data_from_db is None: # checklist_data field is NULL in DB
-                    print("[ChecklistTool] checklist_data in DB is NULL. Returning {{'items': []}}.")
-                    return {"items": []}
+                    logger.debug("[ChecklistTool] checklist_data in DB is NULL. Returning {'items': []}.")
+                    return {"items": [], "version": record_version}
                 else:
                     # Malformed checklist_data
-                    print(f"[ChecklistTool] Warning: checklist_data from DB is malformed or not in {{'items': [...]}} format. Data: {checklist_data_from_db}. Returning {{'items': []}}.")
-                    return {"items": []}
+                    logger.warning("[ChecklistTool] checklist_data from DB is malformed or not in {'items': [...]} format. Data: %s. Returning {'items': []}.", Truncated(checklist_data_from_db))
+                    return {"items": [], "version": record_version}
             else: # Should be caught by earlier checks, but as a safeguard
-                print(f"[ChecklistTool] Unexpected response.data structure: {response.data}. Returning {{'items': []}}.")
-                return {"items": []}
+                logger.warning("[ChecklistTool] Unexpected response.data structure: %s. Returning {'items': []}.", Truncated(response.data))
+                return {"items": [], "version": NO_CHECKLIST_VERSION}
         else:
             # This case implies no error attribute, but also no data attribute.
-            print("[ChecklistTool] Supabase response object missing 'data' attribute despite no error. Returning {{'error': ...}}.")
+            logger.error("[ChecklistTool] Supabase response object missing 'data' attribute despite no error. Returning {'error': ...}.")
             return {"error": "Error reading checklist: Supabase response object missing 'data' attribute."}
 
     except Exception as e:
-        print(f"[ChecklistTool] Exception during read_user_checklist: {e}")
+        logger.error("[ChecklistTool] Exception during read_user_checklist: %s", e)
         return {"error": f"An unexpected error occurred in read_user_checklist: {e}"}
 
+@tool("read_user_checklist", args_schema=ReadChecklistInput)
+def read_user_checklist(user_id: str) -> Dict[str, Any]:
+    """Reads a user's personalized moving checklist from Supabase.
+    The checklist data is expected to be a JSON object like {"items": [...]}.
+    Served from the process-local checklist cache when possible.
+    Args:
+        user_id: Identifier for the user.
+    Returns:
+        A dictionary containing checklist items and the checklist version (e.g., {"items": [...], "version": 3}) if found.
+        Returns {"items": [], "version": 0} if no checklist is found, or {"items": []} with the row's version if data is malformed.
+        Returns a dictionary with an 'error' key if a Supabase error occurs.
+    """
+    cached = checklist_cache.get(user_id)
+    if cached is not None:
+        checklist_data, version = cached
+        return {**checklist_data, "version": version}
+
+    result = _fetch_user_checklist(user_id)
+    if not result.get("error"):
+        checklist_cache.put(user_id, {"items": result["items"]}, result["version"])
+    return result
+
+def _checklist_conflict_message(user_id: str, expected_version: int) -> str:
+    """Describes a lost compare-and-swap, including the current checklist so the agent can redo its change."""
+    checklist_cache.invalidate(user_id)
+    current = _fetch_user_checklist(user_id)
+    if current.get("error"):
+        return f"Error: The checklist for user {user_id} was changed by someone else (expected version {expected_version}). Your change was NOT saved."
+    checklist_cache.put(user_id, {"items": current["items"]}, current["version"])
+    return (
+        f"Error: The checklist for user {user_id} was changed by someone else (expected version {expected_version}, "
+        f"current version {current['version']}). Your change was NOT saved. Apply it again to the current checklist: "
+        f"{json.dumps({'items': current['items']})}"
+    )
+
 @tool("write_user_checklist", args_schema=WriteChecklistInput)
-def write_user_checklist(user_id: str, checklist_data: Dict[str, Any]) -> str:
+def write_user_checklist(user_id: str, checklist_data: Dict[str, Any], expected_version: Optional[int] = None) -> str:
     """Writes or overwrites a user's personalized moving checklist in Supabase.
     The checklist_data MUST be a dictionary of the format {"items": [list_of_item_objects]}.
     Each item_object in the list should contain its own 'category' field.
+    Missing item IDs and timestamps are filled in server-side.
+    Prefer add_checklist_item / update_checklist_item / toggle_checklist_item for changes to single items.
+    The write is compare-and-swap on the checklist version: it is rejected if the checklist changed
+    since `expected_version` (the version you were shown; 0 if the user had no checklist).
     Args:
         user_id: Identifier for the user.
         checklist_data: The checklist data in {"items": [...]} format.
+        expected_version: Version the change is based on. Defaults to the version last read in this process.
     Returns:
         A string indicating success or an error message.
     """
-    print(f"[ChecklistTool] Attempting to write checklist for user_id: {user_id} with data: {str(checklist_data)[:200]}...")
+    logger.debug("[ChecklistTool] Attempting to write checklist for user_id: %s", user_id)
+    payload_logger.debug("[ChecklistTool] Checklist data to write: %s", Truncated(checklist_data, 200))
     
     if not isinstance(checklist_data, dict) or "items" not in checklist_data or not isinstance(checklist_data["items"], list):
         error_msg = f"Error: checklist_data must be a dictionary with an 'items' key containing a list. Received: {str(checklist_data)[:200]}"
-        print(f"[ChecklistTool] {error_msg}")
+        logger.warning("[ChecklistTool] %s", error_msg)
         return error_msg
 
     # Validate items structure (basic check, LLM is primarily responsible for correct item fields)
     for item in checklist_data["items"]:
         if not isinstance(item, dict) or "description" not in item or "category" not in item:
             error_msg = f"Error: Each item in checklist_data['items'] must be a dictionary with at least 'description' and 'category'. Found: {str(item)[:100]}"
-            print(f"[ChecklistTool] {error_msg}")
+            logger.warning("[ChecklistTool] %s", error_msg)
             return error_msg
+
+    # The stored checklist supplies the default expected version and the existing items' timestamps
+    cached = checklist_cache.get(user_id)
+    if cached is None:
+        current = _fetch_user_checklist(user_id)
+        if current.get("error"):
+            return f"Error writing checklist for user {user_id}: {current['error']}"
+        current_items, current_version = current["items"], current["version"]
+    else:
+        current_items, current_version = cached[0].get("items", []), cached[1]
+    if expected_version is None:
+        expected_version = current_version
+    existing_by_id = {item.get("id"): item for item in current_items if isinstance(item, dict)}
+
+    # Item IDs and timestamps are generated here rather than trusted to the LLM
+    checklist_data = {**checklist_data, "items": [
+        _normalize_checklist_item(item, existing_by_id.get(item.get("id"))) for item in checklist_data["items"]
+    ]}
             
-    default_title = f"Relocation Checklist for {user_id}"
+    default_title = _default_checklist_title(user_id)
     # print(f"[ChecklistTool] Using default title: '{default_title}'") # Title is less prominent now
 
+    checklist_data.pop("version", None) # The version is a column, not part of the document
+
     try:
-        upsert_payload = {
+        write_payload = {
             "user_id": user_id,
             "title": default_title, 
-            "checklist_data": checklist_data # Directly use the provided {"items": [...]} structure
+            "checklist_data": checklist_data, # Directly use the provided {"items": [...]} structure
+            "updated_at": _now_iso(),
+            "version": expected_version + 1
         }
         
-        print(f"[ChecklistTool] Upserting payload to Supabase: {str(upsert_payload)[:300]}...")
-
-        response = (
-            supabase_client.table("user_checklists")
-            .upsert(upsert_payload, on_conflict="user_id")
-            .execute()
-        )
+        logger.info("[ChecklistTool] Writing checklist for user %s (version %s -> %s)", user_id, expected_version, expected_version + 1)
+        payload_logger.debug("[ChecklistTool] Write payload: %s", Truncated(write_payload))
+
+        if expected_version == NO_CHECKLIST_VERSION:
+            # First checklist for this user; a concurrent creation makes the insert fail on the unique user_id
+            try:
+                response = get_supabase_client().table("user_checklists").insert(write_payload).execute()
+            except Exception as e:
+                if getattr(e, "code", None) == "23505": # unique_violation
+                    return _checklist_conflict_message(user_id, expected_version)
+                raise
+        else:
+            # Compare-and-swap: only applies if nobody else wrote since expected_version
+            response = (
+                get_supabase_client().table("user_checklists")
+                .update(write_payload)
+                .eq("user_id", user_id)
+                .eq("version", expected_version)
+                .execute()
+            )
+            if hasattr(response, 'data') and isinstance(response.data, list) and len(response.data) == 0 and not (hasattr(response, 'error') and response.error):
+                return _checklist_conflict_message(user_id, expected_version)
 
         if hasattr(response, 'error') and response.error:
             error_message = response.error.message if hasattr(response.error, 'message') else str(response.error)
-            print(f"[ChecklistTool] Supabase error writing checklist: {error_message} (Code: {response.error.code if hasattr(response.error, 'code') else 'N/A'})")
+            logger.error("[ChecklistTool] Supabase error writing checklist: %s (Code: %s)", error_message, response.error.code if hasattr(response.error, "code") else "N/A")
             return f"Error writing checklist for user {user_id}: {error_message}"
         # Upsert in supabase-py v1+ returns a ModelResponse with data attribute that is a list of dicts
-        elif hasattr(response, 'data') and isinstance(response.data, list): # Can be empty list if nothing was upserted but no error.
-            # if len(response.data) > 0:
-            #     print(f"[ChecklistTool] Checklist successfully written for user {user_id}. Response data: {response.data}")
-            # else:
-            #     print(f"[ChecklistTool] Checklist write operation completed for user {user_id} (no error, upsert may not have changed data or returned it).")
-            return f"Checklist successfully written/updated for user {user_id}."
+        elif hasattr(response, 'data') and isinstance(response.data, list):
+            checklist_cache.put(user_id, checklist_data, expected_version + 1)
+            return f"Checklist successfully written/updated for user {user_id} (now version {expected_version + 1})."
         else: # Should not happen if no error and data is not a list
-            print(f"[ChecklistTool] Failed to write checklist for user {user_id} due to an unexpected Supabase response structure: {response}")
+            logger.error("[ChecklistTool] Failed to write checklist for user %s due to an unexpected Supabase response structure: %s", user_id, Truncated(response))
             return f"Failed to write checklist for user {user_id} due to an unknown issue with Supabase response structure."
 
     except Exception as e:
-        print(f"[ChecklistTool] An unexpected error occurred in write_user_checklist: {e}")
+        logger.error("[ChecklistTool] An unexpected error occurred in write_user_checklist: %s", e)
         return f"An unexpected error occurred in write_user_checklist: {e}"
 
 @tool("delete_user_checklist", args_schema=DeleteChecklistInput)
@@ -295,11 +525,12 @@ def delete_user_checklist(user_id: str) -> str:
     """
     try:
         response = (
-            supabase_client.table("user_checklists")
+            get_supabase_client().table("user_checklists")
             .delete()
             .eq("user_id", user_id)
             .execute()
         )
+        checklist_cache.invalidate(user_id)
         
         if hasattr(response, 'error') and response.error:
             return f"Error deleting checklist for user {user_id}: {response.error.message if hasattr(response.error, 'message') else response.error}"
@@ -318,6 +549,102 @@ def delete_user_checklist(user_id: str) -> str:
         return f"An unexpected error occurred in delete_user_checklist: {e}"
 
 
+def _apply_checklist_item_update(user_id: str, item_id: str, changes: Dict[str, Any]) -> str:
+    """Patches one checklist item in place via the checklist_update_item database function."""
+    changes = {**changes, "updated_at": _now_iso()}
+    try:
+        response = get_supabase_client().rpc(
+            "checklist_update_item",
+            {"p_user_id": user_id, "p_item_id": item_id, "p_changes": changes}
+        ).execute()
+
+        if hasattr(response, 'error') and response.error:
+            return f"Error updating checklist item {item_id} for user {user_id}: {response.error.message if hasattr(response.error, 'message') else response.error}"
+        if not getattr(response, 'data', None):
+            return f"Error: No checklist item with id '{item_id}' found for user {user_id}."
+        item = response.data.get("item") if isinstance(response.data, dict) else None
+        version = response.data.get("version") if isinstance(response.data, dict) else None
+        if item is None or version is None:
+            # The item may or may not have been updated; the cached checklist can't be patched without both
+            checklist_cache.invalidate(user_id)
+            return f"Error: Could not confirm that checklist item {item_id} was updated for user {user_id} (incomplete response). Read the checklist before retrying."
+        checklist_cache.apply_item_patch(user_id, item, version)
+        return f"Checklist item updated successfully: {item}"
+    except Exception as e:
+        return f"An unexpected error occurred while updating checklist item {item_id}: {e}"
+
+@tool("add_checklist_item", args_schema=AddChecklistItemInput)
+def add_checklist_item(user_id: str, category: str, description: str) -> str:
+    """Adds a single new item to the user's checklist, creating the checklist if it doesn't exist.
+    The item's id, is_checked (false) and timestamps are generated server-side.
+    Args:
+        user_id: Identifier for the user.
+        category: Category of the item.
+        description: The text of the checklist item.
+    Returns:
+        A string with the created item or an error message.
+    """
+    now = _now_iso()
+    item = {
+        "id": str(uuid.uuid4()),
+        "category": category,
+        "description": description,
+        "is_checked": False,
+        "created_at": now,
+        "updated_at": now,
+    }
+    try:
+        response = get_supabase_client().rpc(
+            "checklist_add_item",
+            {"p_user_id": user_id, "p_item": item, "p_title": _default_checklist_title(user_id)}
+        ).execute()
+
+        if hasattr(response, 'error') and response.error:
+            return f"Error adding checklist item for user {user_id}: {response.error.message if hasattr(response.error, 'message') else response.error}"
+        version = response.data.get("version") if isinstance(response.data, dict) else None
+        if version is None:
+            # The item may or may not have been written; the cached checklist can't be patched without a version
+            checklist_cache.invalidate(user_id)
+            return f"Error: Could not confirm that the checklist item was added for user {user_id} (no checklist version returned). Read the checklist before retrying."
+        checklist_cache.apply_item_patch(user_id, item, version)
+        return f"Checklist item added successfully: {item}"
+    except Exception as e:
+        return f"An unexpected error occurred in add_checklist_item: {e}"
+
+@tool("update_checklist_item", args_schema=UpdateChecklistItemInput)
+def update_checklist_item(user_id: str, item_id: str, category: Optional[str] = None, description: Optional[str] = None, is_checked: Optional[bool] = None) -> str:
+    """Updates fields of one existing checklist item, identified by its id. Only the fields you pass are changed.
+    Args:
+        user_id: Identifier for the user.
+        item_id: The 'id' of the item to update.
+        category: New category (optional).
+        description: New description (optional).
+        is_checked: New completion state (optional).
+    Returns:
+        A string with the updated item or an error message.
+    """
+    changes = {
+        key: value for key, value in
+        (("category", category), ("description", description), ("is_checked", is_checked))
+        if value is not None
+    }
+    if not changes:
+        return "Error: Provide at least one of 'category', 'description' or 'is_checked' to update."
+    return _apply_checklist_item_update(user_id, item_id, changes)
+
+@tool("toggle_checklist_item", args_schema=ToggleChecklistItemInput)
+def toggle_checklist_item(user_id: str, item_id: str, is_checked: bool) -> str:
+    """Checks off (is_checked=true) or unchecks (is_checked=false) one checklist item, identified by its id.
+    Args:
+        user_id: Identifier for the user.
+        item_id: The 'id' of the item.
+        is_checked: The new completion state.
+    Returns:
+        A string with the updated item or an error message.
+    """
+    return _apply_checklist_item_update(user_id, item_id, {"is_checked": is_checked})
+
+
 # Example usage (for testing purposes)
 if __name__ == '__main__':
     print("Testing history tools...")
@@ -343,6 +670,7 @@ if __name__ == '__main__':
     # print("\nTesting write_conversation_summary...")
     # summary_res = write_conversation_summary.invoke({
     #     "user_id":"tool_test_user_01", 
+    #     "session_id":"tool_test_session_01", 
     #     "summary_content":"Tested message writing and AI response from tools.py."
     # })
     # print(summary_res)
@@ -351,6 +679,7 @@ if __name__ == '__main__':
     print("\nTesting read_conversation_history...")
     history = read_conversation_history.invoke({
         "user_id":"tool_test_user_01", 
+        "session_id":"tool_test_session_01", 
         "max_messages":5, 
     })
     print("Retrieved history:")
@@ -0,0 +1,112 @@
+# Token usage accounting for agent turns, including how much of each prompt the provider served from its prompt cache.
+import threading
+import time
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+import metrics
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _is_error_output(output: Any) -> bool:
+    """The Supabase tools report failures as strings (see agent._is_tool_error) rather than raising."""
+    text = getattr(output, "content", output)
+    return isinstance(text, str) and (text.startswith("Error") or text.startswith("Failed") or text.startswith("An unexpected error"))
+
+
+class PromptUsageRecorder(BaseCallbackHandler):
+    """
+    Callback that adds up the token usage of every LLM call made during one agent turn,
+    and counts the tool calls the turn made (also recorded in the tool call metrics).
+    Pass a fresh instance per turn via `config={"callbacks": [recorder]}`.
+    Cached tokens are the prompt tokens the provider reused from its prefix cache
+    (usage_metadata["input_token_details"]["cache_read"]).
+    """
+
+    run_inline = True # Only counts; no need to hop to a thread for async runs
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        self.tool_calls = 0
+        self._tool_runs: Dict[UUID, tuple] = {} # run_id -> (tool name, start time)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self.tool_calls += 1
+        self._tool_runs[run_id] = ((serialized or {}).get("name") or kwargs.get("name") or "unknown", time.perf_counter())
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool_run(run_id, "error" if _is_error_output(output) else "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool_run(run_id, "error")
+
+    def _finish_tool_run(self, run_id: UUID, outcome: str):
+        run = self._tool_runs.pop(run_id, None)
+        if run is None:
+            return
+        name, started = run
+        metrics.tool_call_seconds.observe(time.perf_counter() - started, name)
+        metrics.tool_calls_total.inc(name, outcome)
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                self.llm_calls += 1
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+                self.cached_input_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class PromptCacheStats:
+    """Process-wide running totals of the per-turn usage reported by PromptUsageRecorder."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+
+    def record_turn(self, user_id: str, recorder: PromptUsageRecorder):
+        usage = recorder.as_dict()
+        with self._lock:
+            self.turns += 1
+            self.llm_calls += usage["llm_calls"]
+            self.input_tokens += usage["input_tokens"]
+            self.cached_input_tokens += usage["cached_input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+        metrics.llm_tokens_total.inc("input", amount=usage["input_tokens"])
+        metrics.llm_tokens_total.inc("cached_input", amount=usage["cached_input_tokens"])
+        metrics.llm_tokens_total.inc("output", amount=usage["output_tokens"])
+        hit_rate = usage["cached_input_tokens"] / usage["input_tokens"] if usage["input_tokens"] else 0.0
+        logger.info("[Usage] Turn for user %s: %s LLM call(s), input tokens: %s (%s cached, %.0f%%), output tokens: %s",
+                    user_id, usage["llm_calls"], usage["input_tokens"], usage["cached_input_tokens"], hit_rate * 100, usage["output_tokens"])
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of all input tokens so far that were served from the provider's prompt cache."""
+        with self._lock:
+            return self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+prompt_cache_stats = PromptCacheStats()
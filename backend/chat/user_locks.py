@@ -0,0 +1,50 @@
+# Per-user locks that make one user's chat turns run one at a time (in arrival order),
+# while turns for different users stay fully concurrent.
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class UserLockRegistry:
+    """
+    Hands out one asyncio.Lock per user_id. Entries exist only while a turn holds or waits for
+    the lock, so the registry doesn't grow with the number of users ever seen.
+    asyncio.Lock wakes waiters in FIFO order, so a user's turns run in the order they arrived.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, List] = {} # user_id -> [lock, number of holders + waiters]
+        self.contended_acquisitions = 0
+
+    @asynccontextmanager
+    async def hold(self, user_id: str) -> AsyncIterator[None]:
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            if entry[0].locked():
+                self.contended_acquisitions += 1
+                logger.info("[UserLocks] Turn for user_id %s is waiting for the previous turn to finish.", user_id)
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_id]
+
+    def is_locked(self, user_id: str) -> bool:
+        entry = self._locks.get(user_id)
+        return entry is not None and entry[0].locked()
+
+    @property
+    def active_users(self) -> int:
+        return len(self._locks)
+
+
+user_turn_locks = UserLockRegistry()
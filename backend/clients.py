@@ -0,0 +1,55 @@
+# Process-wide Supabase client, shared by the chat tools and the ranking feature.
+# It is created on first use rather than at import time, so importing the app stays fast and needs no
+# credentials; the FastAPI lifespan (see warm_up.py) creates it and opens its connection before /ready passes.
+import os
+import threading
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from metrics import instrument_supabase_client
+
+load_dotenv()
+
+# Table read by the warm-up request (any table the service key can read works)
+WARM_UP_TABLE = "user_checklists"
+
+_client: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def _create_supabase_client():
+    import supabase # Deferred: supabase-py and its dependencies are a large part of the app's import time
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+    if not url or not key:
+        raise ValueError("Supabase URL and Key must be set in environment variables.")
+    return supabase.create_client(url, key)
+
+
+def get_supabase_client():
+    """
+    Returns the shared Supabase client, creating it on first call.
+    Wrapped so every request is counted and timed in the DB call metrics (see metrics.py).
+    """
+    global _client
+    client = _client
+    if client is None:
+        with _lock:
+            if _client is None:
+                _client = instrument_supabase_client(_create_supabase_client())
+            client = _client
+    return client
+
+
+def set_supabase_client(client):
+    """Replaces the shared client (e.g. with benchmarks/fake_supabase.py); prefer chat.tools.use_supabase_client, which also drops caches."""
+    global _client
+    with _lock:
+        _client = instrument_supabase_client(client)
+
+
+def warm_up_supabase():
+    """Creates the client and sends one small query, so the first request finds an open (TLS) connection."""
+    get_supabase_client().table(WARM_UP_TABLE).select("user_id").limit(1).execute()
@@ -0,0 +1,92 @@
+# Compaction of the conversation history table (see supabase/migrations/*_conversation_archive.sql).
+# Messages already folded into a session's summaries are never read again by the chat path; this moves them,
+# once older than the retention window, into user_conversations_archive and deletes superseded summary rows,
+# so the per-session history ranges that get_conversation_context scans stay short as the user base ages.
+# Runs in the background when OLIVIA_COMPACTION_INTERVAL_HOURS is set (started by the lifespan in main.py),
+# or from cron, from the backend directory:
+#   python -m compaction [--dry-run] [--retention-days 30] [--max-rows 10000]
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+from app_logging import get_logger
+from clients import get_supabase_client
+from metrics import registry, time_stage
+
+logger = get_logger(__name__)
+
+# Folded messages are kept in the hot table for this long anyway (recall and support look-ups still find them)
+COMPACTION_RETENTION_DAYS = int(os.getenv("OLIVIA_COMPACTION_RETENTION_DAYS", "30"))
+# Rows of each kind moved or deleted per database call; a run repeats the call until nothing is left
+COMPACTION_BATCH_ROWS = 10000
+# Interval of the in-process background job; 0 (the default) leaves compaction to an external scheduler
+COMPACTION_INTERVAL_SECONDS = float(os.getenv("OLIVIA_COMPACTION_INTERVAL_HOURS", "0")) * 3600
+
+compaction_rows_total = registry.counter(
+    "olivia_compaction_rows_total", "Conversation rows reclaimed from the hot table by compaction (archived messages, pruned summaries).", ("action",))
+
+
+def _compact_batch(retention_days: int, dry_run: bool, max_rows: int) -> Dict:
+    response = get_supabase_client().rpc(
+        "compact_conversation_history",
+        {"p_retention": f"{retention_days} days", "p_dry_run": dry_run, "p_max_rows": max_rows}
+    ).execute()
+    if hasattr(response, 'error') and response.error:
+        raise RuntimeError(response.error.message if hasattr(response.error, 'message') else response.error)
+    return response.data or {}
+
+
+def compact_conversations(retention_days: int = COMPACTION_RETENTION_DAYS, dry_run: bool = False, max_rows: int = COMPACTION_BATCH_ROWS) -> Dict:
+    """
+    Archives folded messages and prunes superseded summaries older than `retention_days`, in batches of `max_rows`.
+    With `dry_run`, nothing is changed and the counts are those of every row that would be reclaimed.
+    Returns {"dry_run", "archived", "pruned", "batches"}.
+    """
+    totals = {"dry_run": dry_run, "archived": 0, "pruned": 0, "batches": 0}
+    with time_stage("compaction", "total"):
+        while True:
+            result = _compact_batch(retention_days, dry_run, max_rows)
+            archived, pruned = int(result.get("archived") or 0), int(result.get("pruned") or 0)
+            totals["archived"] += archived
+            totals["pruned"] += pruned
+            totals["batches"] += 1
+            if not dry_run:
+                compaction_rows_total.inc("archived", amount=archived)
+                compaction_rows_total.inc("pruned", amount=pruned)
+            if dry_run or (archived < max_rows and pruned < max_rows):
+                break
+    logger.info("[Compaction] %s %s messages and %s %s summaries older than %s days (%s batches).",
+                "Would archive" if dry_run else "Archived", totals["archived"],
+                "would prune" if dry_run else "pruned", totals["pruned"], retention_days, totals["batches"])
+    return totals
+
+
+async def run_periodically(interval_seconds: float = COMPACTION_INTERVAL_SECONDS):
+    """Runs compact_conversations every `interval_seconds` until cancelled; a failed run is retried at the next interval."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(compact_conversations)
+        except Exception as e:
+            logger.error("[Compaction] Error compacting conversation history: %s", e)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Archive folded conversation messages and prune superseded summaries.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be archived and pruned")
+    parser.add_argument("--retention-days", type=int, default=COMPACTION_RETENTION_DAYS,
+                        help=f"Leave rows younger than this in place (default: {COMPACTION_RETENTION_DAYS})")
+    parser.add_argument("--max-rows", type=int, default=COMPACTION_BATCH_ROWS,
+                        help=f"Rows of each kind per batch (default: {COMPACTION_BATCH_ROWS})")
+    args = parser.parse_args(argv)
+
+    report = compact_conversations(args.retention_days, args.dry_run, args.max_rows)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+# Batch evaluation of agent conversations. Loads conversation scripts (JSON, see evals/conversations/) and runs
+# them through the async chat path (chat.agent.ainvoke_agent_turn), several conversations at a time on a pool of
+# workers; the turns of one conversation always run in order. Reports per-turn latency, token usage, the models
+# called and a trace of the agent's tool calls.
+# Runs against the live services configured in .env, or fully offline with --fake (the deterministic chat model
+# in benchmarks/fake_llm.py and the in-memory Supabase in benchmarks/fake_supabase.py).
+# Run from the backend directory:
+#   python -m evals.run_evals [scripts or directories ...] [--workers 4] [--fake] [--output report.json]
+#
+# Script format:
+#   {"name": "checklist",                         # also names the eval user and session
+#    "setup": ["delete_checklist"],               # optional actions before the first turn
+#    "fake_only": true,                           # optional; skipped unless --fake (e.g. scripts that compact history)
+#    "turns": [{"message": "...",
+#               "id": "CHK_1", "type": "...",     # optional labels, copied into the report
+#               "before": ["delete_checklist"],   # optional actions before this turn
+#               "expect_tools": ["add_checklist_item"],  # optional tools the turn must call
+#               "expect_route": "agent",          # optional intent router decision ("agent" or "light")
+#               "expect_in_prompt": ["..."]}]}    # optional text the turn's prompt to the model must contain
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from app_logging import set_log_level
+
+DEFAULT_SCRIPTS_DIR = Path(__file__).parent / "conversations"
+DEFAULT_WORKERS = 4
+# Tool inputs/outputs and replies are cut to this many characters in the report
+TRACE_MAX_CHARS = 500
+# Replies the chat path returns instead of raising when a turn fails
+_TURN_ERROR_PREFIXES = ("Error saving", "Error fetching", "Sorry, I encountered an error")
+_TOOL_ERROR_PREFIXES = ("Error", "Failed", "An unexpected error")
+
+
+def _clip(value: Any) -> str:
+    text = value if isinstance(value, str) else str(getattr(value, "content", value))
+    return text if len(text) <= TRACE_MAX_CHARS else text[:TRACE_MAX_CHARS] + "..."
+
+
+class TurnRecorder(BaseCallbackHandler):
+    """
+    Collects the LLM usage and the agent's tool calls of one turn. Installed for every run started while it is
+    the current recorder (see _current_recorder), so it sees the chat path's own runs without changes there.
+    Tools invoked directly by the chat path (history reads, message writes) have no parent run and are skipped.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.usage = {"llm_calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+        self.models: Dict[str, int] = {}
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.prompts: List[str] = []
+        self._llm_models: Dict[UUID, str] = {}
+        self._tool_runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._llm_models[run_id] = (metadata or {}).get("ls_model_name") or "unknown"
+        self.prompts.append("\n".join(str(message.content) for batch in messages for message in batch))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model = self._llm_models.pop(run_id, "unknown")
+        self.models[model] = self.models.get(model, 0) + 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                self.usage["llm_calls"] += 1
+                self.usage["input_tokens"] += usage.get("input_tokens", 0)
+                self.usage["output_tokens"] += usage.get("output_tokens", 0)
+                self.usage["cached_input_tokens"] += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        if parent_run_id is None:
+            return
+        call = {"name": (serialized or {}).get("name") or kwargs.get("name") or "unknown", "input": _clip(kwargs.get("inputs") or input_str),
+                "output": None, "ok": None, "seconds": None, "_started": time.perf_counter()}
+        self._tool_runs[run_id] = call
+        self.tool_calls.append(call)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool_run(run_id, _clip(output))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool_run(run_id, repr(error), failed=True)
+
+    def _finish_tool_run(self, run_id: UUID, output: str, failed: bool = False):
+        call = self._tool_runs.pop(run_id, None)
+        if call is None:
+            return
+        call["output"] = output
+        call["ok"] = not failed and not output.startswith(_TOOL_ERROR_PREFIXES)
+        call["seconds"] = round(time.perf_counter() - call.pop("_started"), 4)
+
+
+_current_recorder: ContextVar[Optional[TurnRecorder]] = ContextVar("eval_turn_recorder", default=None)
+register_configure_hook(_current_recorder, inheritable=True)
+
+
+# --- Scripts ---
+
+def load_scripts(paths: List[str]) -> List[Dict[str, Any]]:
+    """Loads conversation scripts from JSON files and from the *.json files of directories, in name order."""
+    files: List[Path] = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+    scripts = []
+    for file in files:
+        script = json.loads(file.read_text(encoding="utf-8"))
+        script.setdefault("name", file.stem)
+        if not script.get("turns"):
+            raise ValueError(f"{file}: a conversation script needs a non-empty 'turns' list")
+        for turn in script["turns"]:
+            if not isinstance(turn, dict) or not turn.get("message"):
+                raise ValueError(f"{file}: every turn needs a 'message'")
+            if turn.get("expect_route") not in (None, "agent", "light"):
+                raise ValueError(f"{file}: 'expect_route' must be \"agent\" or \"light\"")
+            for action in turn.get("before", []):
+                if action not in ACTIONS:
+                    raise ValueError(f"{file}: unknown action {action!r} (known: {', '.join(ACTIONS)})")
+        for action in script.get("setup", []):
+            if action not in ACTIONS:
+                raise ValueError(f"{file}: unknown action {action!r} (known: {', '.join(ACTIONS)})")
+        scripts.append(script)
+    return scripts
+
+
+async def _delete_checklist(user_id: str):
+    from chat.tools import delete_user_checklist
+
+    await delete_user_checklist.ainvoke({"user_id": user_id})
+
+
+async def _compact_history(user_id: str):
+    """
+    Folds what is due into summaries, archives every folded message (zero retention, for every user: only for
+    fake_only scripts) and drops the in-process caches, so the next turn reads back from the database like a
+    fresh process would.
+    """
+    from chat.agent import summary_worker
+    from chat.history_cache import conversation_cache
+    from chat.tools import message_buffer, recall_index
+    from compaction import compact_conversations
+
+    await summary_worker.drain()
+    await asyncio.to_thread(message_buffer.flush)
+    await asyncio.to_thread(compact_conversations, 0)
+    conversation_cache.clear()
+    recall_index.clear()
+
+
+# Actions a script may run before its first turn ("setup") or before a turn ("before")
+ACTIONS = {"delete_checklist": _delete_checklist, "compact_history": _compact_history}
+
+
+# --- Running ---
+
+async def _run_turn(user_id: str, session_id: str, turn: Dict[str, Any], index: int) -> Dict[str, Any]:
+    from chat.agent import ainvoke_agent_turn
+    from chat.intent_router import classify_turn
+
+    for action in turn.get("before", []):
+        await ACTIONS[action](user_id)
+
+    recorder = TurnRecorder()
+    token = _current_recorder.set(recorder)
+    error = None
+    started = time.perf_counter()
+    try:
+        response = await ainvoke_agent_turn(user_id, session_id, turn["message"])
+        if response.startswith(_TURN_ERROR_PREFIXES):
+            error = response
+    except Exception as e:
+        response, error = None, repr(e)
+    finally:
+        latency = time.perf_counter() - started
+        _current_recorder.reset(token)
+
+    called = {call["name"] for call in recorder.tool_calls}
+    missing = [name for name in turn.get("expect_tools", []) if name not in called]
+    missing_text = [text for text in turn.get("expect_in_prompt", []) if not any(text in prompt for prompt in recorder.prompts)]
+    # The router's decision for the message (a cached answer may still skip both paths)
+    route = classify_turn(turn["message"])
+    wrong_route = turn.get("expect_route") not in (None, route.route)
+    return {
+        "index": index,
+        "id": turn.get("id"),
+        "type": turn.get("type"),
+        "message": turn["message"],
+        "response": _clip(response) if response is not None else None,
+        "ok": error is None and not missing and not missing_text and not wrong_route,
+        "error": error,
+        "route": route.route,
+        "route_reason": route.reason,
+        "expected_route": turn.get("expect_route"),
+        "missing_tools": missing,
+        "missing_prompt_text": missing_text,
+        "latency_seconds": round(latency, 4),
+        "usage": dict(recorder.usage),
+        "models": dict(recorder.models),
+        "tool_calls": list(recorder.tool_calls),
+    }
+
+
+async def _run_conversation(script: Dict[str, Any], run_id: str, pool: asyncio.Semaphore) -> Dict[str, Any]:
+    # A fresh user per run, so earlier runs' history and checklist don't leak into this one
+    user_id = script.get("user_id") or f"eval-{script['name']}-{run_id}"
+    session_id = f"{user_id}-session"
+    async with pool:
+        started = time.perf_counter()
+        for action in script.get("setup", []):
+            await ACTIONS[action](user_id)
+        turns = []
+        for index, turn in enumerate(script["turns"]):
+            turns.append(await _run_turn(user_id, session_id, turn, index))
+        elapsed = time.perf_counter() - started
+    return {"name": script["name"], "user_id": user_id, "session_id": session_id, "elapsed_seconds": round(elapsed, 4),
+            "ok": all(turn["ok"] for turn in turns), "turns": turns}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _use_fakes(llm_latency: float, db_latency: float):
+    """Swaps in the offline stand-ins. With zero jitter, every run of the same scripts makes the same calls."""
+    for name, value in (("SUPABASE_URL", "http://localhost:54321"), ("SUPABASE_SERVICE_KEY", "eval-key"), ("OPENAI_API_KEY", "sk-eval")):
+        os.environ.setdefault(name, value)
+    from benchmarks.fake_llm import FakeChatModel
+    from benchmarks.fake_supabase import InMemorySupabase
+    from chat.agent import LIGHT_LLM_MODEL, MAIN_LLM_MODEL, SUMMARIZATION_LLM_MODEL, answer_cache, use_chat_models
+    from chat.tools import use_supabase_client
+
+    use_supabase_client(InMemorySupabase(latency_seconds=db_latency))
+    use_chat_models(
+        main=FakeChatModel(model_name=f"fake-{MAIN_LLM_MODEL}", latency_seconds=llm_latency, jitter_seconds=0),
+        summarizer=FakeChatModel(model_name=f"fake-{SUMMARIZATION_LLM_MODEL}", latency_seconds=llm_latency / 2, jitter_seconds=0, reply_words=30),
+        light=FakeChatModel(model_name=f"fake-{LIGHT_LLM_MODEL}", latency_seconds=llm_latency / 2, jitter_seconds=0, reply_words=25),
+    )
+    answer_cache.clear()
+
+
+async def run_evals(scripts: List[Dict[str, Any]], workers: int = DEFAULT_WORKERS, fake: bool = False,
+                    llm_latency: float = 0.05, db_latency: float = 0.0) -> Dict[str, Any]:
+    """Runs the scripts with at most `workers` conversations in flight and returns the report."""
+    if fake:
+        _use_fakes(llm_latency, db_latency)
+    skipped = [] if fake else [script["name"] for script in scripts if script.get("fake_only")]
+    scripts = [script for script in scripts if script["name"] not in skipped]
+    from chat.agent import summary_worker
+    from chat.tools import message_buffer
+
+    run_id = uuid.uuid4().hex[:8]
+    # Started before any recorder is set, so summary jobs are not attributed to the turn that queued them
+    summary_worker.start()
+    pool = asyncio.Semaphore(workers)
+    started = time.perf_counter()
+    try:
+        conversations = await asyncio.gather(*(_run_conversation(script, run_id, pool) for script in scripts))
+    finally:
+        await summary_worker.stop(drain=True)
+        await asyncio.to_thread(message_buffer.flush)
+    elapsed = time.perf_counter() - started
+
+    turns = [turn for conversation in conversations for turn in conversation["turns"]]
+    latencies = sorted(turn["latency_seconds"] for turn in turns)
+    totals = {key: sum(turn["usage"][key] for turn in turns) for key in ("llm_calls", "input_tokens", "cached_input_tokens", "output_tokens")}
+    models: Dict[str, int] = {}
+    for turn in turns:
+        for model, calls in turn["models"].items():
+            models[model] = models.get(model, 0) + calls
+    return {
+        "run_id": run_id,
+        "mode": "fake" if fake else "live",
+        "workers": workers,
+        "conversations": len(conversations),
+        "skipped": skipped,
+        "turns": len(turns),
+        "failed_turns": sum(1 for turn in turns if not turn["ok"]),
+        "elapsed_seconds": round(elapsed, 4),
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "usage": totals,
+        "models": models,
+        "tool_calls": sum(len(turn["tool_calls"]) for turn in turns),
+        "results": list(conversations),
+    }
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"Eval run {report['run_id']} ({report['mode']}): {report['conversations']} conversations, {report['turns']} turns, "
+          f"{report['failed_turns']} failed, {report['elapsed_seconds']:.2f}s with {report['workers']} workers")
+    if report["skipped"]:
+        print(f"  skipped (fake_only, run with --fake): {', '.join(report['skipped'])}")
+    for conversation in report["results"]:
+        print(f"\n  {conversation['name']} ({conversation['elapsed_seconds']:.2f}s){'' if conversation['ok'] else '  FAILED'}")
+        for turn in conversation["turns"]:
+            label = turn["id"] or f"turn {turn['index'] + 1}"
+            tools = ", ".join(call["name"] for call in turn["tool_calls"]) or "-"
+            print(f"    {label:<38} {turn['latency_seconds'] * 1000:>8.1f} ms  {turn['usage']['input_tokens']:>6} in {turn['usage']['output_tokens']:>5} out  tools: {tools}")
+            if turn["error"]:
+                print(f"      error: {turn['error']}")
+            if turn["missing_tools"]:
+                print(f"      expected tool(s) not called: {', '.join(turn['missing_tools'])}")
+            if turn["expected_route"] not in (None, turn["route"]):
+                print(f"      routed to {turn['route']} ({turn['route_reason']}), expected {turn['expected_route']}")
+            if turn["missing_prompt_text"]:
+                print(f"      expected in the prompt but missing: {', '.join(turn['missing_prompt_text'])}")
+    usage = report["usage"]
+    print(f"\n  latency p50 {report['latency_p50'] * 1000:.1f} ms, p95 {report['latency_p95'] * 1000:.1f} ms, max {report['latency_max'] * 1000:.1f} ms")
+    print(f"  {usage['llm_calls']} LLM calls ({', '.join(f'{model}: {calls}' for model, calls in sorted(report['models'].items())) or 'none'}), "
+          f"{usage['input_tokens']} input tokens ({usage['cached_input_tokens']} cached), {usage['output_tokens']} output tokens, "
+          f"{report['tool_calls']} tool calls")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run scripted conversations through Olivia's agent and report latency, usage and tool calls.")
+    parser.add_argument("scripts", nargs="*", default=[str(DEFAULT_SCRIPTS_DIR)],
+                        help="Conversation scripts (JSON files or directories of them; default: evals/conversations)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Conversations run concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--fake", action="store_true", help="Run offline with the deterministic fake chat model and in-memory Supabase")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Latency of each fake agent LLM call in seconds, with --fake (default: 0.05)")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Latency of each in-memory Supabase request in seconds, with --fake (default: 0)")
+    parser.add_argument("--output", help="Also write the full report (including replies and tool traces) as JSON to this file")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args(argv)
+
+    # The app logs every turn; keep the report readable unless asked for the logs
+    if not args.verbose:
+        set_log_level("WARNING")
+    scripts = load_scripts(args.scripts)
+    report = asyncio.run(run_evals(scripts, args.workers, args.fake, args.llm_latency, args.db_latency))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["failed_turns"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
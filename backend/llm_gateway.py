@@ -0,0 +1,452 @@
+# Shared gateway for every OpenAI call the backend makes (chat agent, summarizer, ranking, embeddings).
+# It owns one pooled pair of HTTP clients, caps the number of in-flight requests per model, gives every
+# call a deadline (queueing + all attempts), retries transient failures with jittered exponential backoff,
+# and keeps per-model queue depth and latency statistics.
+#
+# Create chat models with get_chat_model(); they are ordinary ChatOpenAI models whose generate/stream
+# calls are routed through the gateway, so they work unchanged with chains, tools and AgentExecutor.
+# The OpenAI SDK and langchain_openai are only imported once the first model is created (see llm_models.py),
+# which keeps them out of the app's import time.
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+
+import httpx
+
+import metrics
+from app_logging import get_logger
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Connection pool shared by all models (keep-alive connections are reused across requests)
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("OLIVIA_LLM_MAX_CONNECTIONS", "64"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("OLIVIA_LLM_MAX_KEEPALIVE", "32"))
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+# API the warm-up request opens a pooled connection to (the same host the models call)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# Retries after the first attempt, for rate limits, timeouts, connection errors and 5xx responses
+LLM_MAX_RETRIES = int(os.getenv("OLIVIA_LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = 0.5
+LLM_BACKOFF_MAX_SECONDS = 8.0
+# Latency samples kept per model for the percentiles in stats()
+LLM_LATENCY_WINDOW = 1000
+
+
+class ModelPolicy:
+    """
+    Limits for one model: at most `max_concurrency` requests in flight, `attempt_timeout` seconds per
+    HTTP attempt, and `deadline` seconds for the whole call, including time spent queued and retrying.
+    """
+
+    __slots__ = ("max_concurrency", "attempt_timeout", "deadline")
+
+    def __init__(self, max_concurrency: int, attempt_timeout: float, deadline: float):
+        self.max_concurrency = max_concurrency
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+
+
+# The agent model gets its own budget, so a burst of /rank or summary calls on gpt-4o-mini can't starve /chat
+MODEL_POLICIES: Dict[str, ModelPolicy] = {
+    "gpt-4o": ModelPolicy(max_concurrency=16, attempt_timeout=45.0, deadline=90.0),
+    "gpt-4o-mini": ModelPolicy(max_concurrency=24, attempt_timeout=30.0, deadline=60.0),
+    "text-embedding-3-small": ModelPolicy(max_concurrency=8, attempt_timeout=10.0, deadline=20.0),
+}
+DEFAULT_MODEL_POLICY = ModelPolicy(max_concurrency=8, attempt_timeout=30.0, deadline=60.0)
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    OpenAI errors worth retrying. A function so that `openai` is imported on the first failure rather than
+    with this module (an `except` clause only evaluates its expression once an exception is raised).
+    """
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a call couldn't be completed (queueing and retries included) within its model's deadline."""
+
+
+class _ModelState:
+    """Concurrency limiters and counters for one model."""
+
+    def __init__(self, policy: ModelPolicy):
+        self.policy = policy
+        # The event loop and worker threads get separate limiters: async callers must never block the
+        # loop on a threading primitive. Server traffic is async; sync calls come from scripts and threads.
+        self.async_slots = asyncio.Semaphore(policy.max_concurrency)
+        self.thread_slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self.queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+        self.latencies = deque(maxlen=LLM_LATENCY_WINDOW)
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff; a Retry-After from a 429 is used as the lower bound."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        delay = max(delay, min(float(retry_after), LLM_BACKOFF_MAX_SECONDS))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LLMGateway:
+    """
+    Process-wide entry point for LLM requests. Thread-safe; the async limiters must be used from a
+    single event loop (the app's).
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ModelPolicy]] = None, default_policy: ModelPolicy = DEFAULT_MODEL_POLICY):
+        self._policies = dict(MODEL_POLICIES if policies is None else policies)
+        self._default_policy = default_policy
+        self._models: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+
+    # --- Pooled HTTP clients ---
+
+    def _http_limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=LLM_HTTP_MAX_CONNECTIONS, max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE)
+
+    def _http_timeout(self) -> httpx.Timeout:
+        # Per-attempt read timeouts come from each model's policy (passed as the request timeout)
+        return httpx.Timeout(DEFAULT_MODEL_POLICY.attempt_timeout, connect=LLM_HTTP_CONNECT_TIMEOUT_SECONDS)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http_client is None or self._http_client.is_closed:
+                self._http_client = httpx.Client(limits=self._http_limits(), timeout=self._http_timeout())
+            return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._http_async_client is None or self._http_async_client.is_closed:
+                self._http_async_client = httpx.AsyncClient(limits=self._http_limits(), timeout=self._http_timeout())
+            return self._http_async_client
+
+    async def awarm_up(self, base_url: str = OPENAI_BASE_URL):
+        """
+        Opens a keep-alive connection (DNS, TCP and TLS) to the API on the pooled async client, so the first
+        chat turn doesn't pay for it. Any HTTP response will do; the request uses no tokens.
+        """
+        headers = {}
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        await self.http_async_client.get(f"{base_url.rstrip('/')}/models", headers=headers)
+
+    async def aclose(self):
+        """Closes the pooled HTTP clients at shutdown. Models already created keep referencing the closed clients."""
+        with self._lock:
+            sync_client, async_client = self._http_client, self._http_async_client
+            self._http_client = self._http_async_client = None
+        if async_client is not None:
+            await async_client.aclose()
+        if sync_client is not None:
+            sync_client.close()
+
+    # --- Limits, deadlines and retries ---
+
+    def policy(self, model: str) -> ModelPolicy:
+        return self._policies.get(model, self._default_policy)
+
+    def _state(self, model: str) -> _ModelState:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                state = self._models[model] = _ModelState(self.policy(model))
+            return state
+
+    def _count(self, state: _ModelState, **deltas: int):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(state, name, getattr(state, name) + delta)
+
+    def _deadline_exceeded(self, model: str, state: _ModelState, started: float) -> LLMDeadlineExceeded:
+        self._count(state, deadline_exceeded=1, errors=1)
+        metrics.llm_calls_total.inc(model, "deadline_exceeded")
+        metrics.llm_call_seconds.observe(time.monotonic() - started, model)
+        return LLMDeadlineExceeded(f"LLM call to {model} exceeded its {state.policy.deadline:g}s deadline "
+                                   f"after {time.monotonic() - started:.1f}s.")
+
+    def _record_success(self, model: str, state: _ModelState, started: float):
+        elapsed = time.monotonic() - started
+        with self._lock:
+            state.calls += 1
+            state.latencies.append(elapsed)
+        metrics.llm_calls_total.inc(model, "ok")
+        metrics.llm_call_seconds.observe(elapsed, model)
+
+    def _record_error(self, model: str, state: _ModelState, started: float):
+        self._count(state, errors=1)
+        metrics.llm_calls_total.inc(model, "error")
+        metrics.llm_call_seconds.observe(time.monotonic() - started, model)
+
+    def _record_retry(self, model: str, state: _ModelState):
+        self._count(state, retries=1)
+        metrics.llm_retries_total.inc(model)
+
+    async def _aacquire(self, model: str, state: _ModelState, started: float):
+        self._count(state, queued=1)
+        try:
+            remaining = state.policy.deadline - (time.monotonic() - started)
+            await asyncio.wait_for(state.async_slots.acquire(), timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            raise self._deadline_exceeded(model, state, started) from None
+        finally:
+            self._count(state, queued=-1)
+        self._count(state, in_flight=1)
+
+    def _arelease(self, state: _ModelState):
+        self._count(state, in_flight=-1)
+        state.async_slots.release()
+
+    async def acall(self, model: str, fn: Callable[[], Any]) -> T:
+        """
+        Awaits `fn()` (a coroutine factory, called once per attempt) under the model's concurrency limit,
+        retrying transient OpenAI errors until the model's deadline. Raises LLMDeadlineExceeded on timeout.
+        """
+        state = self._state(model)
+        started = time.monotonic()
+        await self._aacquire(model, state, started)
+        try:
+            attempt = 0
+            while True:
+                remaining = state.policy.deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise self._deadline_exceeded(model, state, started)
+                try:
+                    result = await asyncio.wait_for(fn(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    raise self._deadline_exceeded(model, state, started) from None
+                except retryable_errors() as e:
+                    delay = _backoff_delay(attempt, e)
+                    if attempt >= LLM_MAX_RETRIES or time.monotonic() - started + delay >= state.policy.deadline:
+                        self._record_error(model, state, started)
+                        raise
+                    attempt += 1
+                    self._record_retry(model, state)
+                    logger.warning("[LLMGateway] %s call failed (%s); retry %s/%s in %.2fs.", model, type(e).__name__, attempt, LLM_MAX_RETRIES, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    self._record_error(model, state, started)
+                    raise
+                self._record_success(model, state, started)
+                return result
+        finally:
+            self._arelease(state)
+
+    def call(self, model: str, fn: Callable[[], T]) -> T:
+        """Blocking counterpart of acall(), for calls made outside the event loop."""
+        state = self._state(model)
+        started = time.monotonic()
+        self._count(state, queued=1)
+        try:
+            acquired = state.thread_slots.acquire(timeout=state.policy.deadline)
+        finally:
+            self._count(state, queued=-1)
+        if not acquired:
+            raise self._deadline_exceeded(model, state, started)
+        self._count(state, in_flight=1)
+        try:
+            attempt = 0
+            while True:
+                # A blocking attempt can't be interrupted; its HTTP timeout bounds it instead
+                if time.monotonic() - started >= state.policy.deadline:
+                    raise self._deadline_exceeded(model, state, started)
+                try:
+                    result = fn()
+                except retryable_errors() as e:
+                    delay = _backoff_delay(attempt, e)
+                    if attempt >= LLM_MAX_RETRIES or time.monotonic() - started + delay >= state.policy.deadline:
+                        self._record_error(model, state, started)
+                        raise
+                    attempt += 1
+                    self._record_retry(model, state)
+                    logger.warning("[LLMGateway] %s call failed (%s); retry %s/%s in %.2fs.", model, type(e).__name__, attempt, LLM_MAX_RETRIES, delay)
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    self._record_error(model, state, started)
+                    raise
+                self._record_success(model, state, started)
+                return result
+        finally:
+            self._count(state, in_flight=-1)
+            state.thread_slots.release()
+
+    async def astream(self, model: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Yields from the async iterator returned by `open_stream()` under the model's concurrency limit.
+        A failed attempt is retried only if it failed before its first item (nothing has reached the
+        caller yet). The deadline applies to each wait for the next item as well as to the whole stream.
+        """
+        state = self._state(model)
+        started = time.monotonic()
+        await self._aacquire(model, state, started)
+        try:
+            attempt = 0
+            while True:
+                stream = open_stream()
+                yielded = False
+                try:
+                    while True:
+                        remaining = state.policy.deadline - (time.monotonic() - started)
+                        if remaining <= 0:
+                            raise self._deadline_exceeded(model, state, started)
+                        try:
+                            item = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            raise self._deadline_exceeded(model, state, started) from None
+                        yielded = True
+                        yield item
+                except retryable_errors() as e:
+                    delay = _backoff_delay(attempt, e)
+                    if yielded or attempt >= LLM_MAX_RETRIES or time.monotonic() - started + delay >= state.policy.deadline:
+                        self._record_error(model, state, started)
+                        raise
+                    attempt += 1
+                    self._record_retry(model, state)
+                    logger.warning("[LLMGateway] %s stream failed (%s); retry %s/%s in %.2fs.", model, type(e).__name__, attempt, LLM_MAX_RETRIES, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                except (LLMDeadlineExceeded, GeneratorExit):
+                    raise
+                except Exception:
+                    self._record_error(model, state, started)
+                    raise
+                finally:
+                    aclose = getattr(stream, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+                self._record_success(model, state, started)
+                return
+        finally:
+            self._arelease(state)
+
+    def stream(self, model: str, open_stream: Callable[[], Iterator[T]]) -> Iterator[T]:
+        """Blocking counterpart of astream() (without per-item deadlines, which a blocking read can't honour)."""
+        state = self._state(model)
+        started = time.monotonic()
+        self._count(state, queued=1)
+        try:
+            acquired = state.thread_slots.acquire(timeout=state.policy.deadline)
+        finally:
+            self._count(state, queued=-1)
+        if not acquired:
+            raise self._deadline_exceeded(model, state, started)
+        self._count(state, in_flight=1)
+        try:
+            attempt = 0
+            while True:
+                yielded = False
+                try:
+                    for item in open_stream():
+                        yielded = True
+                        yield item
+                except retryable_errors() as e:
+                    delay = _backoff_delay(attempt, e)
+                    if yielded or attempt >= LLM_MAX_RETRIES or time.monotonic() - started + delay >= state.policy.deadline:
+                        self._record_error(model, state, started)
+                        raise
+                    attempt += 1
+                    self._record_retry(model, state)
+                    time.sleep(delay)
+                    continue
+                except GeneratorExit:
+                    raise
+                except Exception:
+                    self._record_error(model, state, started)
+                    raise
+                self._record_success(model, state, started)
+                return
+        finally:
+            self._count(state, in_flight=-1)
+            state.thread_slots.release()
+
+    # --- Statistics ---
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model snapshot: queue depth, in-flight requests, counters and latency percentiles (seconds)."""
+        snapshot = {}
+        with self._lock:
+            for model, state in self._models.items():
+                latencies = sorted(state.latencies)
+                snapshot[model] = {
+                    "max_concurrency": state.policy.max_concurrency,
+                    "queued": state.queued,
+                    "in_flight": state.in_flight,
+                    "calls": state.calls,
+                    "errors": state.errors,
+                    "retries": state.retries,
+                    "deadline_exceeded": state.deadline_exceeded,
+                    "latency_p50": _percentile(latencies, 0.50),
+                    "latency_p95": _percentile(latencies, 0.95),
+                    "latency_p99": _percentile(latencies, 0.99),
+                }
+        return snapshot
+
+
+llm_gateway = LLMGateway()
+
+
+def get_chat_model(model: str, **kwargs: Any) -> "ChatOpenAI":
+    """Returns a chat model for `model` that uses the gateway's pooled clients, limits and retries."""
+    from llm_models import GatewayChatOpenAI
+
+    policy = llm_gateway.policy(model)
+    return GatewayChatOpenAI(
+        model=model,
+        http_client=llm_gateway.http_client,
+        http_async_client=llm_gateway.http_async_client,
+        request_timeout=httpx.Timeout(policy.attempt_timeout, connect=LLM_HTTP_CONNECT_TIMEOUT_SECONDS),
+        max_retries=0,
+        **kwargs,
+    )
+
+
+def get_embeddings(model: str):
+    """Returns OpenAI embeddings for `model` on the gateway's pooled clients; wrap calls in llm_gateway.call()."""
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(
+        model=model,
+        http_client=llm_gateway.http_client,
+        http_async_client=llm_gateway.http_async_client,
+        request_timeout=llm_gateway.policy(model).attempt_timeout,
+        max_retries=0,
+    )
@@ -0,0 +1,39 @@
+# Chat model classes that route requests through the LLM gateway (llm_gateway.py).
+# Kept apart from the gateway because importing langchain_openai (and the OpenAI SDK) takes a large share of
+# the app's import time; llm_gateway.get_chat_model() imports this module when the first model is created.
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+
+from llm_gateway import llm_gateway
+
+
+class GatewayChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI whose requests go through `llm_gateway`. The OpenAI SDK's own retries are disabled
+    (max_retries=0) so that the gateway's backoff is the only retry policy.
+    """
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        parent = super()._agenerate
+        return await llm_gateway.acall(self.model_name, lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        parent = super()._generate
+        return llm_gateway.call(self.model_name, lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        parent = super()._astream
+        async for chunk in llm_gateway.astream(self.model_name, lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs)):
+            yield chunk
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        parent = super()._stream
+        yield from llm_gateway.stream(self.model_name, lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs))
@@ -1,14 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 # Routers
 from chat.chat_router import router as chat_feature_router
+from chat.agent import answer_cache, summary_worker
+from chat.checklist_cache import checklist_cache
+from chat.history_cache import conversation_cache
+from chat.tools import message_buffer
+from chat.usage import prompt_cache_stats
+from chat.user_locks import user_turn_locks
+from app_logging import dropped_records
+from compaction import COMPACTION_INTERVAL_SECONDS, run_periodically as run_compaction_periodically
+from llm_gateway import llm_gateway
+from metrics import PROMETHEUS_CONTENT_TYPE, registry as metrics_registry
 from ranking.rank_router import router as ranking_router
+from warm_up import WarmUp
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients, models and connections are created in the background; /ready passes once they are
+    app.state.warm_up = WarmUp()
+    warm_up_task = asyncio.create_task(app.state.warm_up.run(), name="warm-up")
+    # Background summarization runs alongside the app; pending jobs are drained on shutdown
+    summary_worker.start()
+    # Optional periodic archival of summarized messages (see compaction.py); off unless an interval is configured
+    compaction_task = asyncio.create_task(run_compaction_periodically(), name="compaction") if COMPACTION_INTERVAL_SECONDS > 0 else None
+    yield
+    warm_up_task.cancel()
+    if compaction_task is not None:
+        compaction_task.cancel()
+    await summary_worker.stop(drain=True)
+    # Write out any buffered conversation messages before the process exits
+    await asyncio.to_thread(message_buffer.close)
+    # Close the pooled LLM connections
+    await llm_gateway.aclose()
 
 app = FastAPI(
     title="Olivia - Social Spark Backend",
     description="API for Olivia, the AI Relocation Assistant and Social Spark features.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -24,9 +59,57 @@ app.add_middleware(
 app.include_router(chat_feature_router, prefix="/chat", tags=["Chat"])
 app.include_router(ranking_router, prefix="/rank", tags=["Ranking"])
 
+# Runtime state kept by the chat components, read when /metrics is scraped
+metrics_registry.counter_callback(
+    "olivia_cache_lookups_total", "Lookups in the in-process caches, by cache and result.",
+    lambda: {
+        (name, "hit"): cache.hits
+        for name, cache in (("conversation", conversation_cache), ("checklist", checklist_cache), ("answer", answer_cache))
+    } | {
+        (name, "miss"): cache.misses
+        for name, cache in (("conversation", conversation_cache), ("checklist", checklist_cache), ("answer", answer_cache))
+    },
+    ("cache", "result"))
+metrics_registry.gauge_callback(
+    "olivia_summary_queue_depth", "Summary maintenance jobs waiting for the background worker.", lambda: summary_worker.queue_depth)
+metrics_registry.counter_callback(
+    "olivia_summary_jobs_coalesced_total", "Summary jobs merged into one already pending for the same session.", lambda: summary_worker.coalesced_jobs)
+metrics_registry.counter_callback(
+    "olivia_message_buffer_rows_total", "Conversation rows written or dropped by the write-behind buffer.",
+    lambda: {("written",): message_buffer.rows_written, ("dropped",): message_buffer.rows_dropped}, ("result",))
+metrics_registry.counter_callback(
+    "olivia_user_lock_contended_total", "Chat turns that waited for the same user's previous turn.", lambda: user_turn_locks.contended_acquisitions)
+metrics_registry.gauge_callback(
+    "olivia_prompt_cache_hit_ratio", "Share of agent input tokens served from the provider's prompt cache.", lambda: prompt_cache_stats.cache_hit_rate)
+
+def _llm_gateway_requests():
+    return {
+        (model, state): stats[state]
+        for model, stats in llm_gateway.stats().items()
+        for state in ("queued", "in_flight")
+    }
+
+metrics_registry.gauge_callback(
+    "olivia_llm_requests", "LLM requests in the gateway, by model and state (queued for a concurrency slot, or in flight).",
+    _llm_gateway_requests, ("model", "state"))
+metrics_registry.counter_callback(
+    "olivia_log_records_dropped_total", "Log records dropped because the logging queue was full.", dropped_records)
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics_endpoint():
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/health", tags=["Health"])
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "llm": llm_gateway.stats()}
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness probe: 503 until the start-up warm-up (warm_up.py) has finished."""
+    warm_up = getattr(app.state, "warm_up", None)
+    if warm_up is None or not warm_up.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **(warm_up.status() if warm_up else {})})
+    return {"status": "ready", **warm_up.status()}
 
 # To run this application (from the project root, e.g., olivia-social-spark/):
 # uvicorn backend.main:app --reload --port 8080 
\ No newline at end of file
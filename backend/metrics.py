@@ -0,0 +1,311 @@
+# In-process metrics for the backend, exposed in the Prometheus text format on /metrics (see main.py).
+# Counters and histograms are plain Python objects updated under a per-metric lock, so recording one
+# observation costs about a microsecond; nothing is formatted until /metrics is scraped.
+# Gauges are read from callbacks at scrape time (cache sizes, queue depths), so they cost nothing in between.
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names; label values are passed positionally."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: Any) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values.items()]
+
+
+class Histogram:
+    """Cumulative histogram (Prometheus semantics) with a fixed set of label names."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {} # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values: Any) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: (list(series[0]), series[1], series[2]) for labels, series in self._series.items()}
+        lines = []
+        for labels, (bucket_counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge (or counter kept elsewhere, e.g. a cache's hit count) whose values are read from `read()` at
+    scrape time. `read` returns a number (no labels) or a dict mapping label-value tuples to numbers.
+    """
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Any], label_names: Sequence[str] = (), type_name: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.type_name = type_name
+        self._read = read
+
+    def samples(self) -> List[str]:
+        values = self._read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values.items()]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing # Re-registration (e.g. a module reloaded) keeps the first metric
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, read: Callable[[], Any], label_names: Sequence[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, read, label_names))
+
+    def counter_callback(self, name: str, documentation: str, read: Callable[[], Any], label_names: Sequence[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, read, label_names, type_name="counter"))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format. A failing callback metric is skipped."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error("[Metrics] Error reading %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Metrics shared by the chat and ranking paths ---
+
+stage_seconds = registry.histogram(
+    "olivia_stage_duration_seconds", "Time spent in each stage of a chat turn or ranking request.", ("path", "stage"))
+requests_total = registry.counter(
+    "olivia_requests_total", "Chat turns and ranking requests handled, by outcome.", ("path", "outcome"))
+llm_calls_total = registry.counter(
+    "olivia_llm_calls_total", "LLM calls made through the gateway, by outcome (ok, error, deadline_exceeded).", ("model", "outcome"))
+llm_call_seconds = registry.histogram(
+    "olivia_llm_call_duration_seconds", "LLM call latency through the gateway, including queueing and retries.", ("model",))
+llm_retries_total = registry.counter(
+    "olivia_llm_retries_total", "LLM call attempts retried after a transient error.", ("model",))
+llm_tokens_total = registry.counter(
+    "olivia_llm_tokens_total", "Tokens used by agent turns (input, cached_input, output).", ("kind",))
+db_calls_total = registry.counter(
+    "olivia_db_calls_total", "Supabase requests, by table or function, operation and outcome.", ("target", "operation", "outcome"))
+db_call_seconds = registry.histogram(
+    "olivia_db_call_duration_seconds", "Supabase request latency.", ("target", "operation"))
+tool_calls_total = registry.counter(
+    "olivia_tool_calls_total", "Agent tool invocations, by tool and outcome.", ("tool", "outcome"))
+tool_call_seconds = registry.histogram(
+    "olivia_tool_call_duration_seconds", "Agent tool invocation latency.", ("tool",))
+summary_folds_total = registry.counter(
+    "olivia_summary_folds_total", "Conversation memory folds (chunk summaries, synopsis merges, synopsis compactions).", ("kind",))
+
+
+@contextmanager
+def time_stage(path: str, stage: str) -> Iterator[None]:
+    """Records the duration of the `with` block in olivia_stage_duration_seconds (also when it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, path, stage)
+
+
+async def atime_stage(path: str, stage: str, awaitable):
+    """Awaits `awaitable` and records its duration as a stage; for timing concurrently gathered work."""
+    with time_stage(path, stage):
+        return await awaitable
+
+
+def timed_stage(path: str, stage: str):
+    """Decorator form of time_stage, for plain functions, coroutine functions and async generators."""
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_agen(*args, **kwargs):
+                generator = fn(*args, **kwargs)
+                with time_stage(path, stage):
+                    try:
+                        async for item in generator:
+                            yield item
+                    finally:
+                        await generator.aclose() # Run its cleanup now if the consumer stopped early
+            return wrapper_agen
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                with time_stage(path, stage):
+                    return await fn(*args, **kwargs)
+            return wrapper_async
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with time_stage(path, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Supabase client instrumentation ---
+
+_QUERY_OPERATIONS = frozenset(("select", "insert", "update", "upsert", "delete"))
+
+
+class _TimedQuery:
+    """Wraps a postgrest query/RPC builder; `execute()` is timed and counted, every other call is chained through."""
+
+    __slots__ = ("_builder", "_target", "_operation")
+
+    def __init__(self, builder, target: str, operation: str):
+        self._builder = builder
+        self._target = target
+        self._operation = operation
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._builder, name)
+        if name == "execute":
+            return self._execute
+        if not callable(attribute):
+            return attribute
+
+        def chained(*args, **kwargs):
+            operation = name if name in _QUERY_OPERATIONS else self._operation
+            return _TimedQuery(attribute(*args, **kwargs), self._target, operation)
+        return chained
+
+    def _execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._builder.execute(*args, **kwargs)
+            outcome = "ok"
+            return response
+        finally:
+            db_call_seconds.observe(time.perf_counter() - started, self._target, self._operation)
+            db_calls_total.inc(self._target, self._operation, outcome)
+
+
+class InstrumentedSupabaseClient:
+    """
+    Supabase client wrapper that records olivia_db_calls_total and olivia_db_call_duration_seconds for
+    every `table(...)...execute()` and `rpc(...).execute()`. Everything else is passed through.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name, "select")
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None, *args, **kwargs):
+        return _TimedQuery(self._client.rpc(function, params, *args, **kwargs), function, "rpc")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def instrument_supabase_client(client):
+    """Returns `client` wrapped for DB call metrics (a client that is already wrapped is returned as is)."""
+    if isinstance(client, InstrumentedSupabaseClient):
+        return client
+    return InstrumentedSupabaseClient(client)
@@ -2,28 +2,29 @@
 import os
 from typing import List, Dict, Any
 from fastapi import HTTPException
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import json
 
-# Attempt to import the supabase_client using an absolute path from backend
-try:
-    from chat.tools import supabase_client
-except ImportError as e:
-    # Log the original error for more context if this also fails
-    print(f"ImportError with 'from backend.chat.tools': {e}")
-    # Fallback or alternative initialization if needed
-    # For now, we'll re-raise the custom error to indicate the primary expectation.
-    raise ImportError("Could not import supabase_client from backend.chat.tools. Ensure it's accessible and PYTHONPATH is correct.")
-
-
 from .schemas import RankedUserProfile
+from app_logging import Truncated, get_logger
+from clients import get_supabase_client
+from llm_gateway import get_chat_model
+from metrics import time_stage, timed_stage
+
+logger = get_logger(__name__)
 
-# Initialize the LLM
+# The LLM is created on first use (or by the warm-up in warm_up.py), not at import time
 # Ensure OPENAI_API_KEY is set in your environment
 RANKING_LLM_MODEL = "gpt-4o-mini"
-llm = ChatOpenAI(model=RANKING_LLM_MODEL, temperature=0.2) # Slight increase in temperature for more natural summaries
+_ranking_llm = None
+
+def get_ranking_llm():
+    """Returns the ranking chat model, creating it on first call."""
+    global _ranking_llm
+    if _ranking_llm is None:
+        _ranking_llm = get_chat_model(RANKING_LLM_MODEL, temperature=0.2) # Slight increase in temperature for more natural summaries
+    return _ranking_llm
 
 # Define the fields to select from the profiles table
 PROFILE_FIELDS_TO_SELECT = [
@@ -49,6 +50,7 @@ def _format_profile_for_llm(profile_data: Dict[str, Any]) -> str:
             parts.append(f"{key.replace('_', ' ').capitalize()}: {profile_data[key]}")
     return "\n".join(parts)
 
+@timed_stage("rank", "total")
 async def get_ranked_users(requesting_user_id: str) -> List[RankedUserProfile]:
     """
     Fetches user profiles, calls an LLM to rank them based on similarity to the requesting user,
@@ -57,11 +59,12 @@ async def get_ranked_users(requesting_user_id: str) -> List[RankedUserProfile]:
 
     # 1. Fetch Requesting User's Profile
     try:
-        requesting_user_response = supabase_client.table("profiles") \
-            .select(", ".join(PROFILE_FIELDS_TO_SELECT)) \
-            .eq("id", requesting_user_id) \
-            .single() \
-            .execute()
+        with time_stage("rank", "profile_read"):
+            requesting_user_response = get_supabase_client().table("profiles") \
+                .select(", ".join(PROFILE_FIELDS_TO_SELECT)) \
+                .eq("id", requesting_user_id) \
+                .single() \
+                .execute()
     except Exception as e:
         # Log the exception e
         raise HTTPException(status_code=500, detail=f"Database error fetching requesting user: {str(e)}")
@@ -78,12 +81,13 @@ async def get_ranked_users(requesting_user_id: str) -> List[RankedUserProfile]:
 
     # 2. Fetch Candidate Users' Profiles
     try:
-        candidate_users_response = supabase_client.table("profiles") \
-            .select(", ".join(PROFILE_FIELDS_TO_SELECT)) \
-            .neq("id", requesting_user_id) \
-            .order("updated_at", desc=True) \
-            .limit(50) \
-            .execute()
+        with time_stage("rank", "candidates_read"):
+            candidate_users_response = get_supabase_client().table("profiles") \
+                .select(", ".join(PROFILE_FIELDS_TO_SELECT)) \
+                .neq("id", requesting_user_id) \
+                .order("updated_at", desc=True) \
+                .limit(50) \
+                .execute()
     except Exception as e:
         # Log the exception e
         raise HTTPException(status_code=500, detail=f"Database error fetching candidate users: {str(e)}")
@@ -141,15 +145,16 @@ Output ONLY the JSON array, with no other text before or after it.
     formatted_candidate_list_str = json.dumps(candidate_profiles_for_llm, indent=2)
 
     # 5. Call LLM
-    chain = prompt_template | llm | StrOutputParser()
+    chain = prompt_template | get_ranking_llm() | StrOutputParser()
     
     llm_response_str = ""
     try:
-        llm_response_str = await chain.ainvoke({
-            "requesting_user_profile_str": requesting_user_llm_str,
-            "candidate_profiles_list_str": formatted_candidate_list_str
-            # requesting_user_name is already part of the f-string in the prompt template
-        })
+        with time_stage("rank", "llm_rank"):
+            llm_response_str = await chain.ainvoke({
+                "requesting_user_profile_str": requesting_user_llm_str,
+                "candidate_profiles_list_str": formatted_candidate_list_str
+                # requesting_user_name is already part of the f-string in the prompt template
+            })
     except Exception as e:
         # Log the exception e
         raise HTTPException(status_code=500, detail=f"LLM call failed: {str(e)}")
@@ -174,8 +179,7 @@ Output ONLY the JSON array, with no other text before or after it.
 
     except (json.JSONDecodeError, ValueError) as e:
         # Log the exception e and llm_response_str for debugging
-        print(f"Error parsing LLM response: {e}")
-        print(f"LLM Raw Response:\n{llm_response_str}")
+        logger.error("Error parsing LLM response: %s. LLM Raw Response: %s", e, Truncated(llm_response_str, 500))
         raise HTTPException(status_code=500, detail=f"Error parsing ranking from LLM: {str(e)}. LLM response: {llm_response_str[:500]}") # Show only first 500 chars
 
     # 7. Combine LLM Output with Full Names
@@ -195,7 +199,7 @@ Output ONLY the JSON array, with no other text before or after it.
             )
         else:
             # Log a warning: LLM mentioned a user_id not in our candidate list or missing summary/full_name
-            print(f"Warning: LLM output item for user_id '{user_id}' could not be fully processed. Full name found: {bool(full_name)}. Summary present: {bool(summary)}")
+            logger.warning("LLM output item for user_id '%s' could not be fully processed. Full name found: %s. Summary present: %s", user_id, bool(full_name), bool(summary))
 
 
     return final_ranked_list 
\ No newline at end of file
@@ -4,6 +4,10 @@ from typing import List
 
 from .schemas import RankRequest, RankResponse, RankedUserProfile
 from .rank_logic import get_ranked_users
+from metrics import requests_total
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
@@ -18,12 +22,15 @@ async def rank_users_endpoint(request: RankRequest):
             raise HTTPException(status_code=400, detail="user_id must be provided in the request body.")
         
         ranked_list: List[RankedUserProfile] = await get_ranked_users(request.user_id)
+        requests_total.inc("rank", "ok")
         return RankResponse(ranking=ranked_list)
     except HTTPException as he:
+        requests_total.inc("rank", "error")
         # Re-raise HTTPExceptions directly as they are already well-formed
         raise he
     except Exception as e:
         # Log the exception e for server-side review
-        print(f"Unexpected error in /rank endpoint: {type(e).__name__} - {e}")
+        logger.error("Unexpected error in /rank endpoint: %s - %s", type(e).__name__, e)
+        requests_total.inc("rank", "error")
         # Return a generic 500 error to the client
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while ranking users. Details: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,91 @@
+# Start-up warm-up, run in the background by the FastAPI lifespan (main.py).
+# Importing the app creates no clients and opens no connections; this builds the clients and models the first
+# request would otherwise build (importing LangChain's agent and OpenAI modules along the way), opens the pooled
+# Supabase and OpenAI connections and loads the tokenizer encodings of every configured model. /ready answers
+# 503 until it has finished.
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Set OLIVIA_WARM_UP=false to skip it (e.g. offline benchmarks); /ready then passes immediately
+WARM_UP_ENABLED = os.getenv("OLIVIA_WARM_UP", "true").lower() in ("1", "true", "yes")
+# A step still running after this long is abandoned (the client it was building is then created by the first request)
+WARM_UP_STEP_TIMEOUT_SECONDS = 20.0
+
+
+def _build_models():
+    from chat.agent import get_agent_executor, get_light_llm, get_summarizer_llm
+    from ranking.rank_logic import get_ranking_llm
+
+    get_agent_executor() # Builds the main LLM too
+    get_summarizer_llm()
+    get_light_llm()
+    get_ranking_llm()
+
+
+def _load_tokenizer():
+    from chat.agent import LIGHT_LLM_MODEL, MAIN_LLM_MODEL, SUMMARIZATION_LLM_MODEL
+    from chat.context_assembler import load_encodings
+    from ranking.rank_logic import RANKING_LLM_MODEL
+
+    # Every chat model the app calls, so no request has to load (or download) an encoding file
+    load_encodings({MAIN_LLM_MODEL, SUMMARIZATION_LLM_MODEL, LIGHT_LLM_MODEL, RANKING_LLM_MODEL})
+
+
+async def _open_supabase_connection():
+    from clients import warm_up_supabase
+
+    await asyncio.to_thread(warm_up_supabase)
+
+
+async def _open_openai_connection():
+    from llm_gateway import llm_gateway
+
+    await llm_gateway.awarm_up()
+
+
+class WarmUp:
+    """Runs the warm-up steps concurrently and records how each one went; `ready` once all have finished."""
+
+    def __init__(self):
+        self.steps: Dict[str, Callable[[], Awaitable[None]]] = {
+            "models": lambda: asyncio.to_thread(_build_models),
+            "tokenizer": lambda: asyncio.to_thread(_load_tokenizer),
+            "supabase": _open_supabase_connection,
+            "openai": _open_openai_connection,
+        }
+        self.results: Dict[str, str] = {}
+        self.duration_seconds: Optional[float] = None
+        self._done = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), WARM_UP_STEP_TIMEOUT_SECONDS)
+            self.results[name] = "ok"
+            logger.info("[WarmUp] %s ready in %.2fs.", name, time.perf_counter() - started)
+        except Exception as e: # A failed step is retried lazily by the first request that needs it
+            self.results[name] = f"error: {type(e).__name__}"
+            logger.warning("[WarmUp] %s failed after %.2fs: %r", name, time.perf_counter() - started, e)
+
+    async def run(self):
+        started = time.perf_counter()
+        if WARM_UP_ENABLED:
+            await asyncio.gather(*(self._run_step(name, step) for name, step in self.steps.items()))
+        else:
+            self.results = {name: "skipped" for name in self.steps}
+        self.duration_seconds = time.perf_counter() - started
+        self._done.set()
+        logger.info("[WarmUp] Finished in %.2fs: %s", self.duration_seconds, self.results)
+
+    def status(self) -> Dict:
+        return {"ready": self.ready, "steps": dict(self.results), "duration_seconds": self.duration_seconds}
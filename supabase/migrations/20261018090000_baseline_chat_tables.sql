@@ -0,0 +1,24 @@
+-- Baseline schema for the tables the Olivia backend (backend/chat/tools.py) reads and writes.
+-- These tables were originally created by hand in the Supabase dashboard; `if not exists` makes this
+-- migration a no-op on existing projects and lets a local database be built from migrations alone.
+
+create table if not exists public.user_conversations (
+    message_id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    session_id text not null,
+    "timestamp" timestamptz default now(),
+    message_type text not null,
+    content text not null,
+    summary_flag boolean default false,
+    constraint user_conversations_message_type_check
+        check (message_type in ('human', 'ai', 'ai_summary'))
+);
+
+create table if not exists public.user_checklists (
+    checklist_id uuid primary key default gen_random_uuid(),
+    user_id text not null unique,
+    title text not null,
+    checklist_data jsonb not null default '{"items": []}'::jsonb,
+    created_at timestamptz default now(),
+    updated_at timestamptz default now()
+);
@@ -0,0 +1,45 @@
+-- Returns a user's conversation context in one round trip: the latest summary plus up to
+-- p_max_messages raw messages newer than it (or the most recent ones if there is no summary).
+-- Replaces the two sequential PostgREST queries in read_conversation_history and selects only
+-- the columns the agent prompt and summarizer use.
+--
+-- Result shape (jsonb):
+--   {"summary": text|null, "summary_timestamp": timestamptz|null,
+--    "messages": [{"message_id", "session_id", "message_type", "content", "timestamp"}, ...]}  -- chronological
+
+create or replace function public.get_conversation_context(p_user_id text, p_max_messages integer default 30)
+returns jsonb
+language sql
+stable
+as $$
+    with latest_summary as (
+        select content, "timestamp"
+        from public.user_conversations
+        where user_id = p_user_id
+          and message_type = 'ai_summary'
+        order by "timestamp" desc
+        limit 1
+    ),
+    recent_messages as (
+        select m.message_id, m.session_id, m.message_type, m.content, m."timestamp"
+        from public.user_conversations m
+        where m.user_id = p_user_id
+          and m.message_type <> 'ai_summary'
+          and (
+              (select "timestamp" from latest_summary) is null
+              or m."timestamp" > (select "timestamp" from latest_summary)
+          )
+        order by m."timestamp" desc
+        limit greatest(p_max_messages, 0)
+    )
+    select jsonb_build_object(
+        'summary', (select content from latest_summary),
+        'summary_timestamp', (select "timestamp" from latest_summary),
+        'messages', coalesce(
+            (select jsonb_agg(to_jsonb(r) order by r."timestamp") from recent_messages r),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+grant execute on function public.get_conversation_context(text, integer) to service_role;
@@ -0,0 +1,61 @@
+-- Item-level patches for user_checklists.checklist_data ({"items": [...]}), applied server-side so the
+-- backend's add/update/toggle checklist tools don't have to send the whole document for one change.
+-- Item IDs and timestamps are generated by the backend (backend/chat/tools.py), not by the LLM.
+
+-- Appends one item, creating the user's checklist if it doesn't exist yet. Returns the item.
+create or replace function public.checklist_add_item(p_user_id text, p_item jsonb, p_title text)
+returns jsonb
+language plpgsql
+as $$
+begin
+    insert into public.user_checklists as c (user_id, title, checklist_data, updated_at)
+    values (p_user_id, p_title, jsonb_build_object('items', jsonb_build_array(p_item)), now())
+    on conflict (user_id) do update
+        set checklist_data = jsonb_set(
+                coalesce(c.checklist_data, '{"items": []}'::jsonb),
+                '{items}',
+                coalesce(c.checklist_data -> 'items', '[]'::jsonb) || jsonb_build_array(p_item)
+            ),
+            updated_at = now();
+    return p_item;
+end;
+$$;
+
+-- Merges p_changes into the item whose "id" is p_item_id. Returns the updated item, or null if the
+-- user has no checklist or no such item.
+create or replace function public.checklist_update_item(p_user_id text, p_item_id text, p_changes jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_index integer;
+    v_item jsonb;
+begin
+    -- Lock the row so concurrent patches to the same checklist apply one after another
+    perform 1 from public.user_checklists where user_id = p_user_id for update;
+
+    select (t.pos - 1)::integer, t.elem
+      into v_index, v_item
+      from public.user_checklists c,
+           jsonb_array_elements(c.checklist_data -> 'items') with ordinality as t(elem, pos)
+     where c.user_id = p_user_id
+       and t.elem ->> 'id' = p_item_id
+     limit 1;
+
+    if v_index is null then
+        return null;
+    end if;
+
+    v_item := v_item || p_changes;
+
+    update public.user_checklists
+       set checklist_data = jsonb_set(checklist_data, array['items', v_index::text], v_item),
+           updated_at = now()
+     where user_id = p_user_id;
+
+    return v_item;
+end;
+$$;
+
+grant execute on function public.checklist_add_item(text, jsonb, text) to service_role;
+grant execute on function public.checklist_update_item(text, text, jsonb) to service_role;
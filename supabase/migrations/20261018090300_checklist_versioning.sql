@@ -0,0 +1,69 @@
+-- Optimistic concurrency for user_checklists.
+-- Every write bumps `version`. The backend's whole-checklist writes are compare-and-swap on it
+-- (update ... where version = <version the agent saw>), so concurrent turns can no longer silently
+-- overwrite each other, and the backend's process-local checklist cache is keyed on it.
+
+alter table public.user_checklists
+    add column if not exists version bigint not null default 1;
+
+-- The item-level patch functions now bump the version too and return it alongside the item:
+--   {"item": <item jsonb>, "version": <new version>}
+
+create or replace function public.checklist_add_item(p_user_id text, p_item jsonb, p_title text)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_version bigint;
+begin
+    insert into public.user_checklists as c (user_id, title, checklist_data, updated_at, version)
+    values (p_user_id, p_title, jsonb_build_object('items', jsonb_build_array(p_item)), now(), 1)
+    on conflict (user_id) do update
+        set checklist_data = jsonb_set(
+                coalesce(c.checklist_data, '{"items": []}'::jsonb),
+                '{items}',
+                coalesce(c.checklist_data -> 'items', '[]'::jsonb) || jsonb_build_array(p_item)
+            ),
+            updated_at = now(),
+            version = c.version + 1
+    returning c.version into v_version;
+    return jsonb_build_object('item', p_item, 'version', v_version);
+end;
+$$;
+
+create or replace function public.checklist_update_item(p_user_id text, p_item_id text, p_changes jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_index integer;
+    v_item jsonb;
+    v_version bigint;
+begin
+    -- Lock the row so concurrent patches to the same checklist apply one after another
+    perform 1 from public.user_checklists where user_id = p_user_id for update;
+
+    select (t.pos - 1)::integer, t.elem
+      into v_index, v_item
+      from public.user_checklists c,
+           jsonb_array_elements(c.checklist_data -> 'items') with ordinality as t(elem, pos)
+     where c.user_id = p_user_id
+       and t.elem ->> 'id' = p_item_id
+     limit 1;
+
+    if v_index is null then
+        return null;
+    end if;
+
+    v_item := v_item || p_changes;
+
+    update public.user_checklists
+       set checklist_data = jsonb_set(checklist_data, array['items', v_index::text], v_item),
+           updated_at = now(),
+           version = version + 1
+     where user_id = p_user_id
+    returning version into v_version;
+
+    return jsonb_build_object('item', v_item, 'version', v_version);
+end;
+$$;
@@ -0,0 +1,73 @@
+-- Tiered conversation memory (see backend/chat/memory.py):
+--   raw messages  ->  chunk summaries ('ai_chunk_summary', one per folded batch of messages)
+--                 ->  one capped synopsis ('ai_summary', chunk summaries are merged into it)
+-- Summary rows are timestamped with the last message (or chunk) they cover, so a summary's timestamp
+-- is the point in the timeline up to which it replaces the raw history. Superseded summary rows
+-- are deleted by the backend when a new synopsis is written.
+
+alter table public.user_conversations
+    drop constraint if exists user_conversations_message_type_check;
+alter table public.user_conversations
+    add constraint user_conversations_message_type_check
+        check (message_type in ('human', 'ai', 'ai_summary', 'ai_chunk_summary'));
+
+-- Result shape (jsonb):
+--   {"summary": text|null,                 -- the synopsis
+--    "summary_timestamp": timestamptz|null, -- everything up to here is covered by the synopsis/chunk summaries
+--    "chunk_summaries": [{"message_id", "content", "timestamp"}, ...],  -- newer than the synopsis, chronological
+--    "messages": [{"message_id", "session_id", "message_type", "content", "timestamp"}, ...]}  -- newer than summary_timestamp, chronological
+
+create or replace function public.get_conversation_context(p_user_id text, p_max_messages integer default 30)
+returns jsonb
+language sql
+stable
+as $$
+    with synopsis as (
+        select content, "timestamp"
+        from public.user_conversations
+        where user_id = p_user_id
+          and message_type = 'ai_summary'
+        order by "timestamp" desc
+        limit 1
+    ),
+    chunk_summaries as (
+        select c.message_id, c.content, c."timestamp"
+        from public.user_conversations c
+        where c.user_id = p_user_id
+          and c.message_type = 'ai_chunk_summary'
+          and (
+              (select "timestamp" from synopsis) is null
+              or c."timestamp" > (select "timestamp" from synopsis)
+          )
+    ),
+    watermark as (
+        -- greatest() ignores nulls
+        select greatest((select "timestamp" from synopsis), (select max("timestamp") from chunk_summaries)) as ts
+    ),
+    recent_messages as (
+        select m.message_id, m.session_id, m.message_type, m.content, m."timestamp"
+        from public.user_conversations m
+        where m.user_id = p_user_id
+          and m.message_type in ('human', 'ai')
+          and (
+              (select ts from watermark) is null
+              or m."timestamp" > (select ts from watermark)
+          )
+        order by m."timestamp" desc
+        limit greatest(p_max_messages, 0)
+    )
+    select jsonb_build_object(
+        'summary', (select content from synopsis),
+        'summary_timestamp', (select ts from watermark),
+        'chunk_summaries', coalesce(
+            (select jsonb_agg(to_jsonb(c) order by c."timestamp") from chunk_summaries c),
+            '[]'::jsonb
+        ),
+        'messages', coalesce(
+            (select jsonb_agg(to_jsonb(r) order by r."timestamp") from recent_messages r),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+grant execute on function public.get_conversation_context(text, integer) to service_role;
@@ -0,0 +1,75 @@
+-- Conversation context is scoped to one session (see read_conversation_history in backend/chat/tools.py):
+-- messages, chunk summaries and the synopsis are all read and written per (user_id, session_id).
+-- Summary rows used to be stored under a synthetic 'summary_for_<user_id>' session; those legacy rows
+-- are no longer read and each session is summarized afresh as it grows past the raw message window.
+
+-- Serves every query in get_conversation_context (latest synopsis, chunk summaries after it, newest
+-- messages after the watermark) as an index range scan, and the per-session summary pruning deletes.
+create index if not exists user_conversations_user_session_timestamp_idx
+    on public.user_conversations (user_id, session_id, "timestamp" desc);
+
+drop function if exists public.get_conversation_context(text, integer);
+
+-- Result shape (jsonb), unchanged apart from the session scope:
+--   {"summary": text|null,                 -- the session's synopsis
+--    "summary_timestamp": timestamptz|null, -- everything up to here is covered by the synopsis/chunk summaries
+--    "chunk_summaries": [{"message_id", "content", "timestamp"}, ...],  -- newer than the synopsis, chronological
+--    "messages": [{"message_id", "session_id", "message_type", "content", "timestamp"}, ...]}  -- newer than summary_timestamp, chronological
+
+create or replace function public.get_conversation_context(p_user_id text, p_session_id text, p_max_messages integer default 30)
+returns jsonb
+language sql
+stable
+as $$
+    with synopsis as (
+        select content, "timestamp"
+        from public.user_conversations
+        where user_id = p_user_id
+          and session_id = p_session_id
+          and message_type = 'ai_summary'
+        order by "timestamp" desc
+        limit 1
+    ),
+    chunk_summaries as (
+        select c.message_id, c.content, c."timestamp"
+        from public.user_conversations c
+        where c.user_id = p_user_id
+          and c.session_id = p_session_id
+          and c.message_type = 'ai_chunk_summary'
+          and (
+              (select "timestamp" from synopsis) is null
+              or c."timestamp" > (select "timestamp" from synopsis)
+          )
+    ),
+    watermark as (
+        -- greatest() ignores nulls
+        select greatest((select "timestamp" from synopsis), (select max("timestamp") from chunk_summaries)) as ts
+    ),
+    recent_messages as (
+        select m.message_id, m.session_id, m.message_type, m.content, m."timestamp"
+        from public.user_conversations m
+        where m.user_id = p_user_id
+          and m.session_id = p_session_id
+          and m.message_type in ('human', 'ai')
+          and (
+              (select ts from watermark) is null
+              or m."timestamp" > (select ts from watermark)
+          )
+        order by m."timestamp" desc
+        limit greatest(p_max_messages, 0)
+    )
+    select jsonb_build_object(
+        'summary', (select content from synopsis),
+        'summary_timestamp', (select ts from watermark),
+        'chunk_summaries', coalesce(
+            (select jsonb_agg(to_jsonb(c) order by c."timestamp") from chunk_summaries c),
+            '[]'::jsonb
+        ),
+        'messages', coalesce(
+            (select jsonb_agg(to_jsonb(r) order by r."timestamp") from recent_messages r),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+grant execute on function public.get_conversation_context(text, text, integer) to service_role;
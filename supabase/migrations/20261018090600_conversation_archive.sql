@@ -0,0 +1,119 @@
+-- Cold storage for conversation rows the backend no longer reads (see backend/compaction.py).
+-- Once a session's messages have been folded into a chunk summary or the synopsis, get_conversation_context
+-- never returns them again; compact_conversation_history moves them (past a retention window) into
+-- user_conversations_archive and deletes superseded summary rows, so the hot table only holds each
+-- session's current summaries and unsummarized tail.
+
+create table if not exists public.user_conversations_archive (
+    message_id uuid primary key,
+    user_id text not null,
+    session_id text not null,
+    "timestamp" timestamptz,
+    message_type text not null,
+    content text not null,
+    summary_flag boolean default false,
+    archived_at timestamptz not null default now()
+);
+
+create index if not exists user_conversations_archive_user_session_timestamp_idx
+    on public.user_conversations_archive (user_id, session_id, "timestamp");
+
+-- Rows eligible for compaction, all older than now() - p_retention:
+--   'archive': human/ai messages at or before the session's summary watermark (newest synopsis or chunk summary)
+--   'prune':   synopses other than the session's newest, chunk summaries at or before the newest synopsis
+--              (normally deleted by the backend when the synopsis is written; left over if that failed),
+--              and summaries in the legacy per-user 'summary_for_<user_id>' sessions, which are no longer read
+create or replace function public.conversation_compaction_candidates(p_retention interval)
+returns table (message_id uuid, action text)
+language sql
+stable
+as $$
+    with watermarks as (
+        select user_id, session_id,
+               max("timestamp") as summarized_until,
+               max("timestamp") filter (where message_type = 'ai_summary') as synopsis_timestamp
+        from public.user_conversations
+        where message_type in ('ai_summary', 'ai_chunk_summary')
+        group by user_id, session_id
+    ),
+    latest_synopses as (
+        select distinct on (user_id, session_id) message_id
+        from public.user_conversations
+        where message_type = 'ai_summary'
+        order by user_id, session_id, "timestamp" desc
+    )
+    select m.message_id, 'archive'
+    from public.user_conversations m
+    join watermarks w using (user_id, session_id)
+    where m.message_type in ('human', 'ai')
+      and m."timestamp" <= w.summarized_until
+      and m."timestamp" < now() - p_retention
+    union all
+    select s.message_id, 'prune'
+    from public.user_conversations s
+    join watermarks w using (user_id, session_id)
+    where s.message_type in ('ai_summary', 'ai_chunk_summary')
+      and s."timestamp" < now() - p_retention
+      and (
+          s.session_id like 'summary\_for\_%'
+          or (s.message_type = 'ai_summary' and s.message_id not in (select message_id from latest_synopses))
+          or (s.message_type = 'ai_chunk_summary' and s."timestamp" <= w.synopsis_timestamp)
+      );
+$$;
+
+-- Result shape (jsonb):
+--   {"dry_run": bool, "archived": int, "pruned": int}  -- with p_dry_run, all rows that would be moved/deleted
+-- Otherwise at most p_max_rows rows of each kind are handled per call; call again until both counts are below it.
+
+create or replace function public.compact_conversation_history(
+    p_retention interval default interval '30 days',
+    p_dry_run boolean default true,
+    p_max_rows integer default 10000
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_archived integer;
+    v_pruned integer;
+begin
+    if p_dry_run then
+        select count(*) filter (where action = 'archive'), count(*) filter (where action = 'prune')
+        into v_archived, v_pruned
+        from public.conversation_compaction_candidates(p_retention);
+        return jsonb_build_object('dry_run', true, 'archived', v_archived, 'pruned', v_pruned);
+    end if;
+
+    with batch as (
+        select message_id from public.conversation_compaction_candidates(p_retention)
+        where action = 'archive'
+        limit p_max_rows
+    ),
+    moved as (
+        delete from public.user_conversations m
+        using batch
+        where m.message_id = batch.message_id
+        returning m.message_id, m.user_id, m.session_id, m."timestamp", m.message_type, m.content, m.summary_flag
+    )
+    insert into public.user_conversations_archive (message_id, user_id, session_id, "timestamp", message_type, content, summary_flag)
+    select message_id, user_id, session_id, "timestamp", message_type, content, summary_flag from moved
+    on conflict (message_id) do nothing;
+    get diagnostics v_archived = row_count;
+
+    with batch as (
+        select message_id from public.conversation_compaction_candidates(p_retention)
+        where action = 'prune'
+        limit p_max_rows
+    )
+    delete from public.user_conversations s
+    using batch
+    where s.message_id = batch.message_id;
+    get diagnostics v_pruned = row_count;
+
+    return jsonb_build_object('dry_run', false, 'archived', v_archived, 'pruned', v_pruned);
+end;
+$$;
+
+grant select, insert on public.user_conversations_archive to service_role;
+grant execute on function public.conversation_compaction_candidates(interval) to service_role;
+grant execute on function public.compact_conversation_history(interval, boolean, integer) to service_role;
@@ -0,0 +1,34 @@
+-- Indexes for the access paths the backend uses (backend/chat/tools.py, backend/ranking/rank_logic.py).
+-- Check the plans on seeded data with backend/benchmarks/explain_queries.py.
+--
+--   query (caller)                                                 served by
+--   get_conversation_context: newest synopsis / chunk summaries    user_conversations_session_summaries_idx
+--     of a session (read_conversation_history)
+--   get_conversation_context: newest messages of a session         user_conversations_user_session_timestamp_idx (20261018090500)
+--   summary pruning delete (_prune_summaries)                      user_conversations_session_summaries_idx
+--   a user's newest human/ai messages (_load_messages_for_recall)  user_conversations_user_messages_timestamp_idx
+--   user_checklists by user_id, upsert on_conflict user_id         the unique constraint on user_id (baseline)
+--   profiles by id                                                 the primary key
+--   profiles ordered by updated_at desc, excluding one id          profiles_updated_at_idx
+--
+-- The message indexes don't include `content`: rows are fetched from the heap anyway for the few dozen
+-- messages returned, and long messages would exceed the btree tuple size limit.
+
+-- Summary rows are a small fraction of the table, so a partial index finds a session's synopsis and
+-- chunk summaries without walking its messages.
+create index if not exists user_conversations_session_summaries_idx
+    on public.user_conversations (user_id, session_id, message_type, "timestamp" desc)
+    where message_type in ('ai_summary', 'ai_chunk_summary');
+
+create index if not exists user_conversations_user_messages_timestamp_idx
+    on public.user_conversations (user_id, "timestamp" desc)
+    where message_type in ('human', 'ai');
+
+-- `profiles` is created by the Supabase project (auth-linked), not by these migrations
+do $$
+begin
+    if to_regclass('public.profiles') is not null then
+        create index if not exists profiles_updated_at_idx on public.profiles (updated_at desc);
+    end if;
+end;
+$$;
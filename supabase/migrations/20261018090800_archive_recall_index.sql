@@ -0,0 +1,5 @@
+-- Recall (backend/chat/tools.py, _load_messages_for_recall) also reads a user's newest archived human/ai
+-- messages, across all their sessions; the archive's (user_id, session_id, "timestamp") index can't
+-- serve that order without a sort.
+create index if not exists user_conversations_archive_user_timestamp_idx
+    on public.user_conversations_archive (user_id, "timestamp" desc);